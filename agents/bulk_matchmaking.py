@@ -0,0 +1,156 @@
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from agents import llm_scheduler
+from agents.feature_store import FEATURE_STORE_DIR, is_request_message
+from agents.matchmaker_agent import MatchmakerAgent, MATCHMAKER_CANDIDATE_K
+from agents.precomputed_matches import PrecomputedMatches
+from agents.scoring import score_rows, top_k_rows
+
+# Message rows per checkpointed chunk and worker processes of the offline bulk matchmaking job
+BULK_CHUNK_SIZE = int(os.environ.get("BULK_CHUNK_SIZE", "2000"))
+BULK_WORKERS = int(os.environ.get("BULK_WORKERS", str(os.cpu_count() or 1)))
+
+
+def match_rows(matchmaker: MatchmakerAgent, rows: np.ndarray,
+               neighbour_ids: Optional[List[List[str]]] = None) -> List[Tuple[str, str, List[Dict]]]:
+    """
+    ``(user_id, message, matches)`` for the messages at feature store ``rows``, each
+    as ``find_matches`` would answer when its own merchant sends it.
+
+    No LLM is called: a row's stored marketing verdict decides whether the marketing
+    bonus applies and the candidates' stored verdicts supply it. ``neighbour_ids``
+    holds the ANN neighbours of each row, or None to scan every merchant. Only the
+    candidate rows are scored.
+    """
+    store, profiles = matchmaker.features, matchmaker.profiles
+    marketing = store.marketing == 1
+    cities: Dict[str, Optional[str]] = {}
+    results = []
+    for n, row in enumerate(rows.tolist()):
+        user_id, message = str(store.merchant_id[row]), store.message(row)
+        if user_id not in cities:
+            cities[user_id] = profiles.get(user_id)['city'] or None
+        if neighbour_ids is None:
+            candidates = store.alive.copy()
+        else:
+            candidates = np.zeros(len(store), dtype=bool)
+            candidates[profiles.rows_for(neighbour_ids[n])] = True
+            candidates &= store.alive
+        candidates[profiles.rows_of(user_id)] = False
+        candidates = np.flatnonzero(candidates)
+
+        scores, city_match = score_rows(store, cities[user_id], store.row_keywords(row),
+                                        is_request_message(message),
+                                        marketing[candidates] if marketing[row] else None, rows=candidates)
+        top_rows = candidates[top_k_rows(scores, city_match, np.arange(len(candidates)))]
+        results.append((user_id, message, [matchmaker.format_match(store, i) for i in top_rows]))
+    return results
+
+
+def compute_chunk(matchmaker: MatchmakerAgent, rows: np.ndarray) -> List[Tuple[str, str, List[Dict]]]:
+    """Matches for one chunk, retrieving the neighbours of all its messages with one batched search."""
+    neighbour_ids = None
+    if matchmaker.candidate_k > 0:
+        messages = matchmaker.features.messages(rows)
+        hits = matchmaker.retrieve_candidates_batch(messages, matchmaker.candidate_k)
+        if hits is not None:
+            neighbour_ids = [[merchant_id for merchant_id, _ in row_hits] for row_hits in hits]
+    return match_rows(matchmaker, rows, neighbour_ids)
+
+
+_worker_matchmaker: Optional[MatchmakerAgent] = None
+
+
+def _init_worker(merchant_data_path: str, feature_store_dir: str, candidate_k: int):
+    # Each worker loads the saved feature store (with the parent's marketing verdicts) and index snapshot
+    global _worker_matchmaker
+    _worker_matchmaker = MatchmakerAgent(merchant_data_path, os.environ.get("PGVECTOR_DSN"),
+                                         feature_store_dir=feature_store_dir, candidate_k=candidate_k,
+                                         build_index=candidate_k > 0, precomputed_path="")
+
+
+def _run_chunk(chunk: int, rows: np.ndarray):
+    return chunk, compute_chunk(_worker_matchmaker, rows)
+
+
+def run_bulk_matchmaking(merchant_data_path: str, output_path: str,
+                         feature_store_dir: str = FEATURE_STORE_DIR, chunk_size: int = BULK_CHUNK_SIZE,
+                         workers: int = BULK_WORKERS, candidate_k: int = MATCHMAKER_CANDIDATE_K) -> Dict:
+    """
+    Precompute partner suggestions for every merchant message into ``output_path`` (SQLite).
+
+    Marketing verdicts are filled once for all unique messages (reusing those already
+    in the feature store and response cache), then chunks of rows are matched in a
+    process pool. Finished chunks are committed as they arrive, so an interrupted
+    run resumes where it stopped; a different CSV or configuration starts over.
+    """
+    start = time.perf_counter()
+    matchmaker = MatchmakerAgent(merchant_data_path, os.environ.get("PGVECTOR_DSN"),
+                                 feature_store_dir=feature_store_dir, candidate_k=candidate_k,
+                                 build_index=candidate_k > 0, precomputed_path="")
+    # Online requests sharing the LLM go first
+    with llm_scheduler.priority("bulk"):
+        classified = asyncio.run(matchmaker.classify_all_marketing())
+    store = matchmaker.features
+    retrieval = matchmaker.vector_backend if candidate_k > 0 and matchmaker.vector_index is not None else "scan"
+    meta = {
+        "fingerprint": store.fingerprint,
+        "marketing_model": store.marketing_model,
+        "retrieval": retrieval,
+        "candidate_k": str(candidate_k),
+        "chunk_size": str(chunk_size),
+    }
+
+    results = PrecomputedMatches(output_path)
+    if results.meta() != meta:
+        results.reset(meta)
+    rows = np.flatnonzero(store.alive)
+    chunks = {i: rows[offset:offset + chunk_size] for i, offset in enumerate(range(0, len(rows), chunk_size))}
+    done = results.done_chunks()
+    todo = [i for i in chunks if i not in done]
+    print(f"Bulk matchmaking: {len(rows)} messages in {len(chunks)} chunks, {len(chunks) - len(todo)} already done, "
+          f"{classified} messages classified, retrieval={retrieval}")
+
+    computed = 0
+    if workers <= 1 or len(todo) <= 1:
+        for i in todo:
+            results.write_chunk(i, compute_chunk(matchmaker, chunks[i]))
+            computed += len(chunks[i])
+    else:
+        # Spawned workers start clean instead of inheriting the parent's threads and connections
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=_init_worker,
+                                 initargs=(merchant_data_path, feature_store_dir, candidate_k)) as pool:
+            futures = [pool.submit(_run_chunk, i, chunks[i]) for i in todo]
+            for future in as_completed(futures):
+                chunk, chunk_results = future.result()
+                results.write_chunk(chunk, chunk_results)
+                computed += len(chunks[chunk])
+                print(f"Chunk {chunk} done ({computed}/{len(rows)} messages)")
+    matchmaker.close()
+
+    seconds = time.perf_counter() - start
+    return {
+        "messages": len(rows),
+        "computed": computed,
+        "resumed_chunks": len(chunks) - len(todo),
+        "classified": classified,
+        "retrieval": retrieval,
+        "seconds": round(seconds, 2),
+        "messages_per_sec": round(computed / seconds, 1) if seconds > 0 else None,
+    }
+
+
+def export_parquet(output_path: str, parquet_path: str):
+    """Write the precomputed matches (matches as JSON text) to a Parquet file; needs pyarrow."""
+    import pandas as pd
+    results = PrecomputedMatches(output_path)
+    df = pd.read_sql_query("SELECT user_id, message, matches FROM precomputed_matches", results.conn)
+    df.to_parquet(parquet_path, index=False)
@@ -0,0 +1,130 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+# On-disk store shared by every backend and process; set to an empty string to keep the cache in memory only
+EMBEDDING_CACHE_PATH = os.environ.get("EMBEDDING_CACHE_PATH", ".embedding_cache.sqlite3")
+EMBEDDING_CACHE_SIZE = int(os.environ.get("EMBEDDING_CACHE_SIZE", "10000"))
+
+
+def normalize_text(text: str) -> str:
+    return unicodedata.normalize("NFC", " ".join(str(text).split()))
+
+
+def cache_key(model: str, text: str) -> str:
+    return hashlib.sha256(f"{model}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Content-addressed embedding cache keyed by (embedding model, normalized text hash).
+
+    An in-process LRU sits in front of a SQLite table of float32 vectors, so repeated
+    messages are embedded once per model across backends and restarts.
+    """
+
+    def __init__(self, path: Optional[str] = EMBEDDING_CACHE_PATH, max_entries: int = EMBEDDING_CACHE_SIZE):
+        self.path = path
+        self.max_entries = max_entries
+        self.memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        """Open the on-disk store on first use, so importing the module creates no files."""
+        if self._conn is None and self.path:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    vector BLOB NOT NULL
+                )
+            """)
+            self._conn.commit()
+        return self._conn
+
+    def get_many(self, model: str, texts: List[str]) -> Dict[str, np.ndarray]:
+        """Cached vectors for the texts that have one, keyed by the original text."""
+        found = {}
+        with self._lock:
+            # Texts that differ only in whitespace or Unicode form share one key
+            texts_by_key: Dict[str, List[str]] = {}
+            for text in dict.fromkeys(texts):
+                texts_by_key.setdefault(cache_key(model, text), []).append(text)
+            missing = {}
+            for key, key_texts in texts_by_key.items():
+                if key in self.memory:
+                    self.memory.move_to_end(key)
+                    found.update(dict.fromkeys(key_texts, self.memory[key]))
+                else:
+                    missing[key] = key_texts
+
+            conn = self._connection()
+            if missing and conn is not None:
+                for chunk in _chunks(list(missing), 500):
+                    rows = conn.execute(
+                        f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                    ).fetchall()
+                    for key, blob in rows:
+                        vector = np.frombuffer(blob, dtype=np.float32)
+                        found.update(dict.fromkeys(missing.pop(key), vector))
+                        self._remember(key, vector)
+                        self.disk_hits += 1
+
+            self.hits += len(found)
+            self.misses += sum(len(key_texts) for key_texts in missing.values())
+        return found
+
+    def put_many(self, model: str, vectors: Dict[str, np.ndarray]):
+        with self._lock:
+            rows = []
+            for text, vector in vectors.items():
+                key = cache_key(model, text)
+                vector = np.asarray(vector, dtype=np.float32)
+                self._remember(key, vector)
+                rows.append((key, model, vector.tobytes()))
+            conn = self._connection()
+            if rows and conn is not None:
+                conn.executemany("INSERT OR REPLACE INTO embeddings (key, model, vector) VALUES (?, ?, ?)", rows)
+                conn.commit()
+
+    def get_or_compute(self, model: str, texts: List[str],
+                       compute: Callable[[List[str]], List[List[float]]]) -> np.ndarray:
+        """Stacked float32 vectors for ``texts``, calling ``compute`` only for uncached unique texts."""
+        vectors = self.get_many(model, texts)
+        missing = [t for t in dict.fromkeys(texts) if t not in vectors]
+        if missing:
+            computed = dict(zip(missing, np.asarray(compute(missing), dtype=np.float32)))
+            self.put_many(model, computed)
+            vectors.update(computed)
+        return np.array([vectors[t] for t in texts], dtype=np.float32).reshape(len(texts), -1)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "disk_hits": self.disk_hits,
+            "memory_entries": len(self.memory),
+        }
+
+    def _remember(self, key: str, vector: np.ndarray):
+        self.memory[key] = vector
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+
+
+def _chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
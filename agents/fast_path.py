@@ -0,0 +1,126 @@
+import json
+import os
+import re
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional, Tuple
+
+# Answer obvious messages with local rules before calling the LLM
+FAST_PATH_ENABLED = os.environ.get("FAST_PATH_ENABLED", "1") == "1"
+# Optional JSONL file where the LLM's own router/moderator answers are appended, to measure
+# the rules against (see benchmarks/bench_fast_path.py)
+FAST_PATH_LABEL_LOG = os.environ.get("FAST_PATH_LABEL_LOG")
+
+# Few-shot examples from the router and moderator prompts answer themselves
+ROUTE_EXAMPLES = {
+    "preciso de ajuda com divulgação no insta": "social_media_promotion",
+    "quero aumentar meus seguidores": "social_media_promotion",
+    "preciso de um fornecedor": "partnership_request",
+    "como faço para vender mais?": "service_request",
+    "seu lixo": "moderation",
+    "como funciona?": "service_request",
+}
+MODERATION_EXAMPLES = {
+    "compre agora! oferta por tempo limitado!": {"action": "flag", "reason": "spam"},
+    "oi": {"action": "warn", "reason": "message too short"},
+    "preciso de ajuda com divulgação no instagram": {"action": "allow"},
+    "faço posts para redes sociais": {"action": "allow"},
+}
+
+SOCIAL_MEDIA_RE = re.compile(
+    r"\b(instagram|insta|facebook|tiktok|seguidores|redes? sociai?s?|divulga\w*|posts?|marketing digital)\b")
+PARTNERSHIP_RE = re.compile(r"\b(fornecedor(es)?|parceri\w+|parceiros?|conectar com outros lojistas)\b")
+SPAM_RE = re.compile(r"\b(compre agora|oferta por tempo limitado|clique aqui|ganhe dinheiro)\b")
+ABUSE_RE = re.compile(r"\b(lixo|idiota|burro|otário|golpe)\b")
+
+fast_path_stats = {"route_hits": 0, "route_misses": 0, "moderation_hits": 0, "moderation_misses": 0}
+
+# Rule lookups of the current request by (kind, message); triage and the router or moderator
+# repeat the same lookup, so counting() adds each one to fast_path_stats only once
+_lookups: ContextVar[Optional[Dict[Tuple[str, str], bool]]] = ContextVar("fast_path_lookups", default=None)
+
+
+def normalize(message: str) -> str:
+    return " ".join(message.lower().split())
+
+
+@contextmanager
+def counting() -> Iterator[None]:
+    """Count every rule lookup made inside once per message, however many agents repeat it."""
+    if _lookups.get() is not None:
+        yield  # nested in a batch that already counts
+        return
+    lookups: Dict[Tuple[str, str], bool] = {}
+    token = _lookups.set(lookups)
+    try:
+        yield
+    finally:
+        _lookups.reset(token)
+        for (kind, _), hit in lookups.items():
+            fast_path_stats[f"{kind}_hits" if hit else f"{kind}_misses"] += 1
+
+
+def _record(kind: str, text: str, hit: bool):
+    lookups = _lookups.get()
+    if lookups is None:
+        fast_path_stats[f"{kind}_hits" if hit else f"{kind}_misses"] += 1
+    else:
+        lookups[(kind, text)] = lookups.get((kind, text), False) or hit
+
+
+def fast_route(message: str) -> Optional[str]:
+    """Routing label for messages the rules are confident about, otherwise None."""
+    text = normalize(message)
+    label = _route(text) if FAST_PATH_ENABLED else None
+    _record("route", text, label is not None)
+    return label
+
+
+def fast_moderate(message: str) -> Optional[dict]:
+    """Moderation verdict for messages the rules are confident about, otherwise None."""
+    text = normalize(message)
+    verdict = _moderate(text) if FAST_PATH_ENABLED else None
+    _record("moderation", text, verdict is not None)
+    return dict(verdict) if verdict else None
+
+
+def rule_route(message: str) -> str:
+    """Routing label from the rules alone, for when the LLM cannot be asked; unclear messages escalate."""
+    return _route(normalize(message)) or "fallback"
+
+
+def log_llm_label(agent: str, message: str, label):
+    """Append an LLM answer to FAST_PATH_LABEL_LOG so the rules can be evaluated against it."""
+    if FAST_PATH_LABEL_LOG:
+        with open(FAST_PATH_LABEL_LOG, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"agent": agent, "message": message, "label": label}, ensure_ascii=False) + "\n")
+
+
+def _route(text: str) -> Optional[str]:
+    if text in ROUTE_EXAMPLES:
+        return ROUTE_EXAMPLES[text]
+    if SPAM_RE.search(text) or ABUSE_RE.search(text):
+        return "moderation"
+    social = bool(SOCIAL_MEDIA_RE.search(text))
+    partnership = bool(PARTNERSHIP_RE.search(text))
+    # Only one clear signal counts; mixed messages go to the LLM
+    if social and not partnership:
+        return "social_media_promotion"
+    if partnership and not social:
+        return "partnership_request"
+    return None
+
+
+def _moderate(text: str) -> Optional[dict]:
+    if text in MODERATION_EXAMPLES:
+        return MODERATION_EXAMPLES[text]
+    if SPAM_RE.search(text):
+        return {"action": "flag", "reason": "spam"}
+    if ABUSE_RE.search(text):
+        return None  # abusive wording needs the LLM's judgement and reason
+    # Only near-empty messages; greetings and one-word questions are left to the LLM
+    if len(text.strip("?!. ")) <= 3:
+        return {"action": "warn", "reason": "message too short"}
+    if len(text.split()) >= 3 and (SOCIAL_MEDIA_RE.search(text) or PARTNERSHIP_RE.search(text)):
+        return {"action": "allow"}
+    return None
@@ -0,0 +1,318 @@
+import hashlib
+import os
+import threading
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+FEATURE_STORE_VERSION = 2
+FEATURE_STORE_DIR = os.environ.get("FEATURE_STORE_DIR", ".feature_store")
+
+# Words ignored when counting shared keywords between two messages
+STOPWORDS = ['com', 'para', 'como', 'mais', 'muito']
+REQUEST_INDICATORS = ['preciso', 'busco', 'procurando', 'quero', 'precisamos', 'precisava']
+OFFER_INDICATORS = ['ofereço', 'faço', 'presto', 'vendo', 'trabalho com', 'sou', 'sou de', 'atendo']
+
+# Serializes verdict writes from this process's threads; a later write always holds newer verdicts
+_marketing_write_lock = threading.Lock()
+
+# Marketing verdicts are filled lazily by the LLM; -1 means "not classified yet"
+MARKETING_UNKNOWN = -1
+
+
+def keyword_tokens(text: str) -> set:
+    """Lowercased words of a message that count towards keyword overlap."""
+    return {w for w in set(text.lower().split()) if len(w) > 3 and w not in STOPWORDS}
+
+
+def is_request_message(text: str) -> bool:
+    text = text.lower()
+    return any(ind in text for ind in REQUEST_INDICATORS)
+
+
+def is_offer_message(text: str) -> bool:
+    text = text.lower()
+    return any(ind in text for ind in OFFER_INDICATORS)
+
+
+def file_fingerprint(path: str) -> str:
+    digest = hashlib.sha256(f"v{FEATURE_STORE_VERSION}".encode())
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class MerchantFeatureStore:
+    """
+    Per-row matchmaking features computed once from the merchant DataFrame.
+
+    Everything is stored column-wise: one array entry per CSV row, plus the keyword
+    tokens of every row in CSR form (row -> token ids) and the matching inverted
+    lists (token id -> row positions), so scoring a request never touches strings.
+
+    Message texts are kept as one UTF-8 buffer with offsets, as in the profile store.
+    Marketing verdicts are saved to their own small file (see ``save_marketing``), so
+    recording new verdicts never rewrites the whole store.
+
+    Incremental merchant updates never move existing rows: removed rows are marked
+    dead in ``alive`` and new rows are appended (see ``with_changes``).
+    """
+
+    def __init__(self, merchant_id, city, message_offsets, message_data, is_offer, marketing,
+                 vocab, row_indptr, row_tokens, token_indptr, token_rows,
+                 fingerprint: str = "", marketing_model: str = "", alive=None):
+        self.merchant_id = merchant_id
+        self.city = city
+        self.message_offsets = message_offsets
+        self.message_data = message_data
+        self.is_offer = is_offer
+        self.marketing = marketing
+        self.vocab = vocab
+        self.token_index = {token: i for i, token in enumerate(vocab)}
+        self.row_indptr = row_indptr
+        self.row_tokens = row_tokens
+        self.token_indptr = token_indptr
+        self.token_rows = token_rows
+        self.fingerprint = fingerprint
+        self.marketing_model = marketing_model
+        self.alive = np.ones(len(merchant_id), dtype=bool) if alive is None else alive
+
+    def __len__(self):
+        return len(self.merchant_id)
+
+    @classmethod
+    def build(cls, df: pd.DataFrame, fingerprint: str = "", marketing_model: str = "") -> "MerchantFeatureStore":
+        merchant_id = df['merchant_id'].astype(str).to_numpy(dtype=str)
+        city = df['city'].fillna("").astype(str).to_numpy(dtype=str)
+        messages = [str(m) for m in df['message']]
+        message_lower = [m.lower() for m in messages]
+        message_offsets, message_data = _pack(messages)
+
+        token_index: Dict[str, int] = {}
+        row_indptr, row_tokens = _tokenize(message_lower, token_index)
+        token_indptr, token_rows = _invert(row_indptr, row_tokens, len(token_index))
+        vocab = np.array(sorted(token_index, key=token_index.get), dtype=str)
+
+        return cls(
+            merchant_id=merchant_id,
+            city=city,
+            message_offsets=message_offsets,
+            message_data=message_data,
+            is_offer=np.array([is_offer_message(m) for m in message_lower], dtype=bool),
+            marketing=np.full(len(messages), MARKETING_UNKNOWN, dtype=np.int8),
+            vocab=vocab,
+            row_indptr=row_indptr,
+            row_tokens=row_tokens,
+            token_indptr=token_indptr,
+            token_rows=token_rows,
+            fingerprint=fingerprint,
+            marketing_model=marketing_model,
+        )
+
+    @classmethod
+    def load_or_build(cls, df: pd.DataFrame, csv_path: str, store_dir: str = FEATURE_STORE_DIR,
+                      marketing_model: str = "") -> "MerchantFeatureStore":
+        """Load the saved store for this exact CSV content, or build and save a new one."""
+        fingerprint = file_fingerprint(csv_path)
+        path = cls.path_for(csv_path, fingerprint, store_dir)
+        if os.path.exists(path):
+            try:
+                store = cls.load(path)
+                if len(store) == len(df):
+                    store.reset_marketing_if_model_changed(marketing_model)
+                    return store
+            except Exception as e:
+                print(f"Ignoring unreadable feature store {path}: {e}")
+
+        store = cls.build(df, fingerprint=fingerprint, marketing_model=marketing_model)
+        store.path = path
+        try:
+            store.save()
+        except OSError as e:
+            # Another worker may be writing the same store; this one still has it in memory
+            print(f"Error saving feature store {path}: {e}")
+        return store
+
+    @staticmethod
+    def path_for(csv_path: str, fingerprint: str, store_dir: str = FEATURE_STORE_DIR) -> str:
+        name = os.path.splitext(os.path.basename(csv_path))[0]
+        return os.path.join(store_dir, f"{name}-{fingerprint[:16]}.npz")
+
+    @staticmethod
+    def marketing_path_for(path: str) -> str:
+        return f"{os.path.splitext(path)[0]}-marketing.npz"
+
+    @staticmethod
+    def _tmp_path_for(path: str) -> str:
+        # One temp file per writer, so processes saving the same store never replace each other's file
+        return f"{path}.tmp{os.getpid()}-{threading.get_ident()}.npz"
+
+    def save(self, path: Optional[str] = None):
+        """Write the whole store (without marketing verdicts) to ``path``."""
+        path = path or getattr(self, "path", None)
+        if not path:
+            return
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = self._tmp_path_for(path)
+        np.savez(
+            tmp_path,
+            merchant_id=self.merchant_id, city=self.city, message_offsets=self.message_offsets,
+            message_data=np.frombuffer(self.message_data, dtype=np.uint8), is_offer=self.is_offer,
+            vocab=self.vocab, row_indptr=self.row_indptr, row_tokens=self.row_tokens,
+            token_indptr=self.token_indptr, token_rows=self.token_rows,
+            fingerprint=np.array(self.fingerprint),
+        )
+        os.replace(tmp_path, path)
+        self.path = path
+
+    def save_marketing(self):
+        """Write only the marketing verdicts (one byte per row) next to the saved store."""
+        path = getattr(self, "path", None)
+        if not path:
+            return
+        path = self.marketing_path_for(path)
+        tmp_path = self._tmp_path_for(path)
+        with _marketing_write_lock:
+            np.savez(tmp_path, marketing=self.marketing.copy(), marketing_model=np.array(self.marketing_model))
+            os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "MerchantFeatureStore":
+        with np.load(path, allow_pickle=False) as data:
+            arrays = {key: data[key] for key in data.files if key not in ("fingerprint", "message_data")}
+            message_data = data["message_data"].tobytes()
+            fingerprint = str(data["fingerprint"])
+        marketing = np.full(len(arrays["merchant_id"]), MARKETING_UNKNOWN, dtype=np.int8)
+        marketing_model = ""
+        marketing_path = cls.marketing_path_for(path)
+        if os.path.exists(marketing_path):
+            try:
+                with np.load(marketing_path, allow_pickle=False) as data:
+                    if len(data["marketing"]) == len(marketing):
+                        marketing, marketing_model = data["marketing"], str(data["marketing_model"])
+            except Exception as e:
+                print(f"Ignoring unreadable marketing verdicts {marketing_path}: {e}")
+        store = cls(**arrays, message_data=message_data, marketing=marketing,
+                    fingerprint=fingerprint, marketing_model=marketing_model)
+        store.path = path
+        return store
+
+    def with_changes(self, dead_rows: Iterable[int], merchant_id: List[str], city: List[str],
+                     messages: List[str]) -> "MerchantFeatureStore":
+        """
+        A new store with ``dead_rows`` marked dead and one row appended per new message.
+
+        Only the new messages are tokenized; they are appended to the end of every
+        inverted list, which keeps the lists sorted because new rows get the highest
+        positions. The result is not saved: it no longer matches any CSV fingerprint.
+        """
+        n, n_tokens = len(self), len(self.vocab)
+        message_lower = [m.lower() for m in messages]
+        message_offsets, message_data = _pack(messages)
+        token_index = dict(self.token_index)
+        new_indptr, new_tokens = _tokenize(message_lower, token_index)
+        vocab = np.concatenate([self.vocab, np.array(list(token_index)[n_tokens:], dtype=str)])
+
+        new_rows = np.repeat(np.arange(n, n + len(messages), dtype=np.int32), np.diff(new_indptr))
+        order = np.argsort(new_tokens, kind="stable")
+        token_indptr = np.concatenate([self.token_indptr,
+                                       np.full(len(vocab) - n_tokens, self.token_indptr[-1], dtype=np.int64)])
+        token_rows = np.insert(self.token_rows, token_indptr[new_tokens[order] + 1], new_rows[order])
+        token_indptr[1:] += np.cumsum(np.bincount(new_tokens, minlength=len(vocab)))
+
+        alive = np.concatenate([self.alive, np.ones(len(messages), dtype=bool)])
+        alive[np.asarray(list(dead_rows), dtype=np.int64)] = False
+        return MerchantFeatureStore(
+            merchant_id=np.concatenate([self.merchant_id, np.array(merchant_id, dtype=str)]),
+            city=np.concatenate([self.city, np.array(city, dtype=str)]),
+            message_offsets=np.concatenate([self.message_offsets, self.message_offsets[-1] + message_offsets[1:]]),
+            message_data=self.message_data + message_data,
+            is_offer=np.concatenate([self.is_offer, [is_offer_message(m) for m in message_lower]]).astype(bool),
+            marketing=np.concatenate([self.marketing, np.full(len(messages), MARKETING_UNKNOWN, dtype=np.int8)]),
+            vocab=vocab,
+            row_indptr=np.concatenate([self.row_indptr, self.row_indptr[-1] + new_indptr[1:]]),
+            row_tokens=np.concatenate([self.row_tokens, new_tokens]),
+            token_indptr=token_indptr,
+            token_rows=token_rows,
+            fingerprint=self.fingerprint,
+            marketing_model=self.marketing_model,
+            alive=alive,
+        )
+
+    def reset_marketing_if_model_changed(self, marketing_model: str):
+        if marketing_model and marketing_model != self.marketing_model:
+            self.marketing[:] = MARKETING_UNKNOWN
+            self.marketing_model = marketing_model
+
+    def message(self, row: int) -> str:
+        """Message text of ``row``."""
+        return self.message_data[self.message_offsets[row]:self.message_offsets[row + 1]].decode("utf-8")
+
+    def messages(self, rows: Iterable[int]) -> List[str]:
+        """Message texts of several rows."""
+        return [self.message(row) for row in rows]
+
+    def row_keywords(self, row: int) -> np.ndarray:
+        return self.row_tokens[self.row_indptr[row]:self.row_indptr[row + 1]]
+
+    def query_token_ids(self, tokens: Iterable[str]) -> np.ndarray:
+        """Token ids of the query words that occur anywhere in the store."""
+        ids = [self.token_index[t] for t in tokens if t in self.token_index]
+        return np.asarray(sorted(ids), dtype=np.int32)
+
+    def postings(self, token_id: int) -> np.ndarray:
+        return self.token_rows[self.token_indptr[token_id]:self.token_indptr[token_id + 1]]
+
+    def keyword_overlap(self, token_ids: np.ndarray) -> np.ndarray:
+        """Number of query keywords shared with every row, read from the inverted lists."""
+        if len(token_ids) == 0:
+            return np.zeros(len(self), dtype=np.int64)
+        rows = np.concatenate([self.postings(t) for t in token_ids])
+        return np.bincount(rows, minlength=len(self))
+
+    def keyword_overlap_rows(self, token_ids: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        """Number of query keywords shared with each of ``rows``, read from the rows' own tokens."""
+        starts = self.row_indptr[rows]
+        lengths = self.row_indptr[rows + 1] - starts
+        owner = np.repeat(np.arange(len(rows)), lengths)
+        positions = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(len(owner))
+        shared = np.isin(self.row_tokens[positions], token_ids)
+        return np.bincount(owner[shared], minlength=len(rows))
+
+    def set_marketing(self, rows: np.ndarray, verdicts: Dict[str, bool]):
+        """Fill in LLM marketing verdicts for ``rows`` from a {message: verdict} map."""
+        for row in rows:
+            verdict = verdicts.get(self.message(row))
+            if verdict is not None:
+                self.marketing[row] = int(verdict)
+
+
+def _pack(messages: List[str]):
+    """Offsets and one UTF-8 buffer holding every message."""
+    encoded = [m.encode("utf-8") for m in messages]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(m) for m in encoded], out=offsets[1:])
+    return offsets, b"".join(encoded)
+
+
+def _tokenize(message_lower: List[str], token_index: Dict[str, int]):
+    """Keyword token ids of every message in CSR form, adding unseen tokens to ``token_index``."""
+    row_indptr = np.zeros(len(message_lower) + 1, dtype=np.int64)
+    row_tokens: List[int] = []
+    for i, text in enumerate(message_lower):
+        ids = sorted(token_index.setdefault(t, len(token_index)) for t in keyword_tokens(text))
+        row_tokens.extend(ids)
+        row_indptr[i + 1] = len(row_tokens)
+    return row_indptr, np.asarray(row_tokens, dtype=np.int32)
+
+
+def _invert(row_indptr: np.ndarray, row_tokens: np.ndarray, n_tokens: int):
+    """Turn row -> tokens CSR arrays into token -> rows inverted lists."""
+    rows = np.repeat(np.arange(len(row_indptr) - 1, dtype=np.int32), np.diff(row_indptr))
+    order = np.argsort(row_tokens, kind="stable")
+    token_rows = rows[order]
+    token_indptr = np.zeros(n_tokens + 1, dtype=np.int64)
+    np.cumsum(np.bincount(row_tokens, minlength=n_tokens), out=token_indptr[1:])
+    return token_indptr, token_rows
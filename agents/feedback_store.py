@@ -0,0 +1,161 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from typing import Any, Dict, List, Optional, Set
+
+# SQLite append-only log of all feedback; empty keeps only the in-memory buffers
+FEEDBACK_STORE_PATH = os.environ.get("FEEDBACK_STORE_PATH", "")
+# Most recent entries kept in memory, overall and per user
+FEEDBACK_MEMORY_SIZE = int(os.environ.get("FEEDBACK_MEMORY_SIZE", "1000"))
+FEEDBACK_PER_USER = int(os.environ.get("FEEDBACK_PER_USER", "10"))
+# Users indexed in memory; the least recently active ones are dropped beyond this
+FEEDBACK_MAX_USERS = int(os.environ.get("FEEDBACK_MAX_USERS", "10000"))
+
+NEGATIVE_FEEDBACK = {"thumbs-down", "thumbs_down", "down", "👎"}
+
+
+class FeedbackStore:
+    """
+    Bounded record of user feedback.
+
+    Every entry is appended to SQLite (when a path is given) with its metadata and
+    history. Memory keeps a ring buffer of the most recent entries without those
+    payloads and, per user, the verdict and suggested partners of their last few, so
+    a merchant's feedback is found in O(1). Counts by feedback value are kept as
+    entries arrive. ``append_async`` writes to SQLite in a worker thread, for callers
+    on the event loop.
+    """
+
+    def __init__(self, path: str = FEEDBACK_STORE_PATH, memory_size: int = FEEDBACK_MEMORY_SIZE,
+                 per_user: int = FEEDBACK_PER_USER, max_users: int = FEEDBACK_MAX_USERS):
+        self.path = path
+        self.recent: deque = deque(maxlen=memory_size)
+        self.per_user = per_user
+        self.max_users = max_users
+        self.users: "OrderedDict[str, deque]" = OrderedDict()
+        self.counts: Counter = Counter()
+        self.conn = None
+        self._lock = threading.Lock()
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self.conn = sqlite3.connect(path, check_same_thread=False)
+            # Appends are small and frequent; WAL avoids a full sync per commit
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS feedback (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    created_at REAL NOT NULL,
+                    user_id TEXT NOT NULL,
+                    message TEXT NOT NULL,
+                    feedback TEXT NOT NULL,
+                    match_ids TEXT NOT NULL,
+                    metadata TEXT,
+                    history TEXT
+                )
+            """)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS feedback_user_id ON feedback (user_id, id)")
+            self.conn.commit()
+            self._load()
+
+    def _load(self):
+        # Warm the memory buffers and counts from the log of a previous run
+        self.counts.update(dict(self.conn.execute("SELECT feedback, COUNT(*) FROM feedback GROUP BY feedback")))
+        rows = self.conn.execute(
+            "SELECT id, created_at, user_id, message, feedback, match_ids FROM feedback ORDER BY id DESC LIMIT ?",
+            (self.recent.maxlen,)).fetchall()
+        for row in reversed(rows):
+            self._remember(self._entry(row))
+
+    @staticmethod
+    def _entry(row) -> Dict[str, Any]:
+        id, created_at, user_id, message, feedback, match_ids = row
+        return {"id": id, "created_at": created_at, "user_id": user_id, "message": message,
+                "feedback": feedback, "match_ids": json.loads(match_ids)}
+
+    def _remember(self, entry: Dict[str, Any]):
+        self.recent.append(entry)
+        user = self.users.get(entry["user_id"])
+        if user is None:
+            user = self.users[entry["user_id"]] = deque(maxlen=self.per_user)
+        self.users.move_to_end(entry["user_id"])
+        user.append((entry["id"], entry["feedback"], tuple(entry["match_ids"])))
+        while len(self.users) > self.max_users:
+            self.users.popitem(last=False)
+
+    def append(self, user_id: str, message: str, feedback: str, match_ids: Optional[List[str]] = None,
+               metadata: Optional[Dict] = None, history: Optional[List[Dict]] = None) -> Dict[str, Any]:
+        """Record one piece of feedback; ``match_ids`` are the partners suggested in the rated answer."""
+        entry = self._new_entry(user_id, message, feedback, match_ids)
+        entry["id"] = self._insert(entry, metadata, history)
+        return self._add(entry)
+
+    async def append_async(self, user_id: str, message: str, feedback: str, match_ids: Optional[List[str]] = None,
+                           metadata: Optional[Dict] = None, history: Optional[List[Dict]] = None) -> Dict[str, Any]:
+        """``append`` with the SQLite write in a worker thread; memory is updated on the caller's loop."""
+        entry = self._new_entry(user_id, message, feedback, match_ids)
+        if self.conn is not None:
+            entry["id"] = await asyncio.to_thread(self._insert, entry, metadata, history)
+        return self._add(entry)
+
+    @staticmethod
+    def _new_entry(user_id: str, message: str, feedback: str, match_ids: Optional[List[str]]) -> Dict[str, Any]:
+        return {"id": None, "created_at": time.time(), "user_id": user_id, "message": message,
+                "feedback": feedback, "match_ids": list(match_ids or [])}
+
+    def _insert(self, entry: Dict[str, Any], metadata: Optional[Dict], history: Optional[List[Dict]]) -> Optional[int]:
+        if self.conn is None:
+            return None
+        with self._lock, self.conn:
+            cursor = self.conn.execute(
+                "INSERT INTO feedback (created_at, user_id, message, feedback, match_ids, metadata, history) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (entry["created_at"], entry["user_id"], entry["message"], entry["feedback"],
+                 json.dumps(entry["match_ids"]),
+                 json.dumps(metadata, ensure_ascii=False) if metadata is not None else None,
+                 json.dumps(history, ensure_ascii=False) if history is not None else None))
+        return cursor.lastrowid
+
+    def _add(self, entry: Dict[str, Any]) -> Dict[str, Any]:
+        if entry["id"] is None:
+            entry["id"] = sum(self.counts.values()) + 1
+        self.counts[entry["feedback"]] += 1
+        self._remember(entry)
+        return entry
+
+    def for_user(self, user_id: str) -> List[Dict[str, Any]]:
+        """``id``, ``feedback`` and ``match_ids`` of the user's most recent entries, oldest first."""
+        return [{"id": id, "feedback": feedback, "match_ids": list(match_ids)}
+                for id, feedback, match_ids in self.users.get(user_id, ())]
+
+    def rejected_partners(self, user_id: str) -> Set[str]:
+        """Partners suggested in answers the user gave negative feedback to."""
+        return {match_id for _, feedback, match_ids in self.users.get(user_id, ())
+                if feedback.strip().lower() in NEGATIVE_FEEDBACK for match_id in match_ids}
+
+    def page(self, limit: int = 20, offset: int = 0) -> List[Dict[str, Any]]:
+        """Entries newest first; beyond the memory buffer only the SQLite log can serve them."""
+        if self.conn is None or offset + limit <= len(self.recent):
+            entries = list(reversed(self.recent))
+            return entries[offset:offset + limit]
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT id, created_at, user_id, message, feedback, match_ids FROM feedback "
+                "ORDER BY id DESC LIMIT ? OFFSET ?", (limit, offset)).fetchall()
+        return [self._entry(row) for row in rows]
+
+    def __len__(self):
+        return sum(self.counts.values())
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "total": len(self),
+            "by_feedback": dict(self.counts),
+            "in_memory": len(self.recent),
+            "users_in_memory": len(self.users),
+            "path": self.path or None,
+        }
@@ -0,0 +1,189 @@
+import asyncio
+import heapq
+import itertools
+import os
+import time
+from collections import Counter
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+from agents import metrics
+
+# Calls waiting for one of the in-flight slots; beyond this the lowest priority waiter is shed
+LLM_QUEUE_SIZE = int(os.environ.get("LLM_QUEUE_SIZE", "64"))
+# Milliseconds an orchestrator run may spend on LLM calls by default (0: no deadline)
+LLM_REQUEST_DEADLINE_MS = float(os.environ.get("LLM_REQUEST_DEADLINE_MS", "0"))
+
+# Lower runs first: moderation keeps unsafe content out, bulk jobs can always wait
+PRIORITIES = {"moderation": 0, "routing": 1, "matchmaking": 2, "bulk": 3}
+
+
+class LLMUnavailable(RuntimeError):
+    """The scheduler did not let the call reach the LLM; callers fall back to their rules."""
+
+
+class LLMOverloaded(LLMUnavailable):
+    """The queue was full and the call was shed."""
+
+
+class LLMDeadlineExceeded(LLMUnavailable):
+    """The request deadline passed before the call got a slot."""
+
+
+# Set around a request or job; asyncio tasks started inside inherit both
+_priority: ContextVar[Optional[str]] = ContextVar("llm_priority", default=None)
+_deadline: ContextVar[Optional[float]] = ContextVar("llm_deadline", default=None)
+
+
+@contextmanager
+def priority(name: str) -> Iterator[None]:
+    """Run every LLM call inside the block at priority ``name``, whatever the agent's own."""
+    if name not in PRIORITIES:
+        raise ValueError(f"unknown LLM priority {name!r}")
+    token = _priority.set(name)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+@contextmanager
+def deadline(ms: Optional[float]) -> Iterator[None]:
+    """LLM calls inside the block fail with LLMDeadlineExceeded ``ms`` from now (None or 0: no deadline)."""
+    if not ms:
+        yield
+        return
+    at = time.monotonic() + ms / 1000
+    outer = _deadline.get()
+    token = _deadline.set(at if outer is None else min(at, outer))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def current_priority(default: str) -> str:
+    return _priority.get() or default
+
+
+def remaining(timeout: float) -> float:
+    """``timeout`` capped by the time left before the current deadline."""
+    at = _deadline.get()
+    return timeout if at is None else min(timeout, at - time.monotonic())
+
+
+class LLMScheduler:
+    """
+    Admission control in front of Ollama.
+
+    At most ``max_in_flight`` calls run at once. The others wait in a priority queue
+    (FIFO within a priority) of at most ``max_queue`` entries; when it is full, a
+    newcomer evicts the lowest priority waiter if it outranks it and is shed itself
+    otherwise. Waiters whose deadline passes leave the queue. Shed calls raise
+    LLMUnavailable so the agents can answer with their degraded fallbacks.
+    """
+
+    def __init__(self, max_in_flight: int, max_queue: int = LLM_QUEUE_SIZE):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.in_flight = 0
+        # (priority, arrival, future); entries of cancelled or evicted waiters are dropped lazily
+        self.queue: List[Tuple[int, int, asyncio.Future]] = []
+        self._arrivals = itertools.count()
+        self.admitted: Counter = Counter()
+        self.shed: Counter = Counter()
+        self.expired: Counter = Counter()
+        self.max_queue_depth = 0
+
+    def queue_depth(self) -> int:
+        return sum(1 for _, _, future in self.queue if not future.done())
+
+    def _prune(self):
+        self.queue = [entry for entry in self.queue if not entry[2].done()]
+        heapq.heapify(self.queue)
+
+    def _shed(self, counter: Counter, name: str, error: LLMUnavailable) -> LLMUnavailable:
+        # Counted in the context of the shed call, so its own pipeline step records it
+        counter[name] += 1
+        metrics.record_llm_shed()
+        return error
+
+    async def acquire(self, name: str, deadline_at: Optional[float] = None):
+        """Wait for an in-flight slot at priority ``name``; pair with release()."""
+        rank = PRIORITIES[name]
+        if deadline_at is not None and time.monotonic() >= deadline_at:
+            raise self._shed(self.expired, name, LLMDeadlineExceeded(f"{name} call past its deadline"))
+        if self.in_flight < self.max_in_flight and not self.queue_depth():
+            self.in_flight += 1
+            self.admitted[name] += 1
+            return
+
+        if self.queue_depth() >= self.max_queue:
+            self._prune()
+            worst = max(self.queue) if self.queue else None
+            if worst is None or worst[0] <= rank:
+                raise self._shed(self.shed, name, LLMOverloaded(f"LLM queue full, {name} call shed"))
+            self.queue.remove(worst)
+            heapq.heapify(self.queue)
+            worst[2].set_exception(LLMOverloaded(f"LLM queue full, evicted by a {name} call"))
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.queue, (rank, next(self._arrivals), future))
+        self.max_queue_depth = max(self.max_queue_depth, self.queue_depth())
+        timeout = None if deadline_at is None else max(deadline_at - time.monotonic(), 0)
+        try:
+            # release() hands its slot straight to the future, in_flight is unchanged
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            raise self._shed(self.expired, name, LLMDeadlineExceeded(f"{name} call expired in the LLM queue"))
+        except LLMOverloaded as e:
+            raise self._shed(self.shed, name, e)
+        except BaseException:
+            # Cancelled right after being handed a slot: pass it on
+            if future.done() and not future.cancelled() and future.exception() is None:
+                self.release()
+            raise
+        self.admitted[name] += 1
+
+    def release(self):
+        while self.queue:
+            _, _, future = heapq.heappop(self.queue)
+            if not future.done():
+                future.set_result(None)
+                return
+        self.in_flight -= 1
+
+    @asynccontextmanager
+    async def slot(self, name: str) -> AsyncIterator[None]:
+        """Hold an in-flight slot at ``name`` (or the priority set by priority()) under the current deadline."""
+        await self.acquire(current_priority(name), _deadline.get())
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth(),
+            "max_queue_depth": self.max_queue_depth,
+            "admitted": dict(self.admitted),
+            "shed": dict(self.shed),
+            "expired": dict(self.expired),
+        }
+
+
+def merge_stats(schedulers) -> Dict[str, Any]:
+    """Stats of the schedulers of every event loop added up."""
+    merged: Dict[str, Any] = {"max_in_flight": 0, "max_queue": 0, "in_flight": 0, "queue_depth": 0,
+                              "max_queue_depth": 0, "admitted": Counter(), "shed": Counter(), "expired": Counter()}
+    for scheduler in schedulers:
+        for key, value in scheduler.stats().items():
+            if key in ("max_in_flight", "max_queue", "max_queue_depth"):
+                merged[key] = max(merged[key], value)
+            else:
+                merged[key] += Counter(value) if isinstance(value, dict) else value
+    return {key: dict(value) if isinstance(value, Counter) else value for key, value in merged.items()}
@@ -1,182 +1,585 @@
+import asyncio
+import random
+import re
+import threading
 import pandas as pd
-from typing import List, Dict
-from agents.ollama_client import OllamaClient
+from typing import List, Dict, Iterable, Optional, Tuple
+from agents.ollama_client import OllamaClient, DEFAULT_MODEL
+from agents.llm_scheduler import LLMUnavailable
+from agents.model_cascade import ModelCascade, OLLAMA_FAST_MODEL
 import numpy as np
-import psycopg2
-from pgvector.psycopg2 import register_vector
 import os
-from agents.vector_backends import get_embedding, FaissIndex, ChromaDBIndex
+import time
+from agents import vector_backends
+from agents.vector_backends import VectorIndex, FaissIndex, ChromaDBIndex, PgVectorIndex, FAISS_INDEX_TYPE
+from agents.feature_store import (
+    MerchantFeatureStore, MARKETING_UNKNOWN, FEATURE_STORE_DIR,
+    keyword_tokens, is_request_message,
+)
+from agents.scoring import score_rows, top_k_rows
+from agents.profile_store import MerchantProfileStore
+from agents.precomputed_matches import PrecomputedMatches, PRECOMPUTED_MATCHES_PATH
+from agents.feedback_store import FeedbackStore
+from agents.response_cache import response_cache, prompt_version
+
+MARKETING_PROMPT = """
+        Analyze if the following text in Portuguese is related to marketing, advertising, promotion, 
+        social media, or digital services. Respond with only 'yes' or 'no'.
+        
+        Text: {text}
+        
+        Response (yes/no): """
 
 SYSTEM_PROMPT = """
 You are a merchant matchmaker for a smart social network. Given a merchant profile and a list of candidate merchants, suggest up to 5 relevant merchant IDs for networking or partnership. Only return a comma-separated list of merchant IDs from the candidate list.
 """
 
-# Simple embedding function (replace with real model in production)
-def get_embedding(text: str) -> np.ndarray:
-    np.random.seed(abs(hash(text)) % (2**32))
-    return np.random.rand(384)
+MARKETING_BATCH_PROMPT = """
+Analyze each of the following numbered texts in Portuguese and decide if it is related to marketing, advertising, promotion,
+social media, or digital services. Respond with one line per text in the format '<number>: yes' or '<number>: no'.
+"""
+# Single and batch prompts ask the same question, so they share cached verdicts
+MARKETING_PROMPT_VERSION = prompt_version(MARKETING_PROMPT, MARKETING_BATCH_PROMPT)
+
+# How candidate messages are classified as marketing-related inside find_matches:
+# - 'prompt': many candidates per LLM call (MARKETING_BATCH_SIZE per prompt)
+# - 'concurrent': one LLM call per unique candidate, at most MARKETING_MAX_CONCURRENCY in flight
+# - 'sequential': one LLM call per candidate row, one after the other (legacy behaviour)
+MARKETING_BATCH_MODE = os.environ.get("MARKETING_BATCH_MODE", "prompt").lower()
+MARKETING_BATCH_SIZE = int(os.environ.get("MARKETING_BATCH_SIZE", "25"))
+MARKETING_MAX_CONCURRENCY = int(os.environ.get("MARKETING_MAX_CONCURRENCY", "4"))
+# Marketing classification model and the smaller one asked first for single texts (see model_cascade.py);
+# batch prompts always use MARKETING_MODEL
+MARKETING_MODEL = os.environ.get("MARKETING_MODEL", DEFAULT_MODEL)
+MARKETING_FAST_MODEL = os.environ.get("MARKETING_FAST_MODEL", OLLAMA_FAST_MODEL)
+
+# Number of nearest neighbours fetched from the vector backend before reranking; 0 scans every merchant
+MATCHMAKER_CANDIDATE_K = int(os.environ.get("MATCHMAKER_CANDIDATE_K", "200"))
+
+# Seconds new marketing verdicts are collected before they are written to disk in a worker thread
+MARKETING_SAVE_DELAY = float(os.environ.get("MARKETING_SAVE_DELAY", "1.0"))
+
+# Fraction of find_matches calls that print the score breakdown of their matches; 0 disables it
+MATCHMAKER_DEBUG_SAMPLE_RATE = float(os.environ.get("MATCHMAKER_DEBUG_SAMPLE_RATE", "0"))
+
+# Greedy yes/no answers: a single verdict is a JSON string, a numbered batch gets a few
+# tokens per line
+GENERATION_OPTIONS = {"temperature": 0, "num_predict": 4}
+OUTPUT_FORMAT = {"type": "string", "enum": ["yes", "no"]}
+BATCH_TOKENS_PER_TEXT = 8
+
+_BATCH_VERDICT_RE = re.compile(r"^\s*(\d+)\s*[:.)\-]\s*(yes|no|sim|não|nao)\b", re.IGNORECASE | re.MULTILINE)
+
+
+def parse_yes_no(response: str) -> Optional[bool]:
+    """True or False for an answer starting with yes/sim or no/não, otherwise None."""
+    words = response.strip().split()
+    word = words[0].strip("'\"`*.,:;").lower() if words else ""
+    if word in ("yes", "sim"):
+        return True
+    if word in ("no", "não", "nao"):
+        return False
+    return None
 
 class MatchmakerAgent:
-    def __init__(self, merchant_data_path: str, pgvector_dsn: str = None):
+    def __init__(self, merchant_data_path: str, pgvector_dsn: str = None,
+                 marketing_batch_mode: str = MARKETING_BATCH_MODE,
+                 feature_store_dir: str = FEATURE_STORE_DIR,
+                 candidate_k: int = MATCHMAKER_CANDIDATE_K, build_index: bool = True,
+                 precomputed_path: str = PRECOMPUTED_MATCHES_PATH,
+                 marketing_model: str = MARKETING_MODEL, marketing_fast_model: str = MARKETING_FAST_MODEL):
         self.df = pd.read_csv(merchant_data_path, dtype={'merchant_id': str})
-        self.llm = OllamaClient()
+        self.llm = OllamaClient(marketing_model)
+        self.cascade = ModelCascade("marketing", self.llm, marketing_fast_model)
+        # One record per merchant for O(1) lookups by id
+        self.profiles = MerchantProfileStore.build(self.df)
+        self.features = MerchantFeatureStore.load_or_build(
+            self.df, merchant_data_path, feature_store_dir, marketing_model=self.cascade.cache_key
+        )
+        self.precomputed = PrecomputedMatches.open(precomputed_path, self.features.fingerprint)
+        self.marketing_batch_mode = marketing_batch_mode
+        self.candidate_k = candidate_k
+        self.pgvector_index = None
+        self.faiss_index = None
+        self.chromadb_index = None
+        self.ingestion_stats = None
+        self.update_stats = {"batches": 0, "merchants": 0, "rows_added": 0, "rows_removed": 0, "last_seconds": None}
+        self._changes_lock = asyncio.Lock()
+        self._marketing_save: Optional[asyncio.Task] = None
+        self._marketing_dirty = False
         self.pgvector_dsn = pgvector_dsn
         self.vector_backend = os.environ.get("VECTOR_BACKEND", "pgvector").lower()
-        if self.vector_backend == "pgvector" and pgvector_dsn:
-            self._init_pgvector()
-        elif self.vector_backend == "faiss":
-            self._init_faiss()
-        elif self.vector_backend == "chromadb":
-            self._init_chromadb()
+        # Merchant changes applied before the index is published, replayed onto it by init_index;
+        # None when no index will be built
+        self._index_lock = threading.Lock()
+        expects_index = self.vector_backend in ("faiss", "chromadb") or \
+            (self.vector_backend == "pgvector" and bool(pgvector_dsn))
+        self._pending_index_changes: Optional[List[tuple]] = [] if expects_index else None
+        if build_index:
+            self.init_index()
 
-    def _init_pgvector(self):
-        self.conn = psycopg2.connect(self.pgvector_dsn)
-        register_vector(self.conn)
+    def init_index(self):
+        """
+        Build the index of the configured vector backend (slow: embeds every merchant message).
+
+        The index is built from the CSV; merchant changes applied in the meantime are
+        replayed onto it before it is published.
+        """
         try:
-            with self.conn.cursor() as cur:
-                cur.execute("""
-                    CREATE TABLE IF NOT EXISTS merchant_embeddings (
-                        merchant_id TEXT PRIMARY KEY,
-                        embedding vector(384)
-                    )
-                """)
-                for _, row in self.df.iterrows():
-                    emb = get_embedding(row['message']).tolist()
-                    cur.execute("""
-                        INSERT INTO merchant_embeddings (merchant_id, embedding)
-                        VALUES (%s, %s)
-                        ON CONFLICT (merchant_id) DO UPDATE SET embedding = EXCLUDED.embedding
-                    """, (row['merchant_id'], emb))
-                self.conn.commit()
-        except Exception as e:
-            self.conn.rollback()
-            raise e
+            if self.vector_backend == "pgvector" and self.pgvector_dsn:
+                self._init_pgvector()
+            elif self.vector_backend == "faiss":
+                self._init_faiss()
+            elif self.vector_backend == "chromadb":
+                self._init_chromadb()
+        except Exception:
+            # Matching scans every merchant without an index, so there is nothing to replay onto
+            with self._index_lock:
+                self._pending_index_changes = None
+            raise
 
+    def _publish_index(self, attribute: str, index: VectorIndex):
+        with self._index_lock:
+            for change in self._pending_index_changes or ():
+                self._write_vector_backend(index, *change)
+            self._pending_index_changes = None
+            setattr(self, attribute, index)
+
+    def _init_pgvector(self):
+        start = time.perf_counter()
+        index = PgVectorIndex(self.pgvector_dsn)
+        # One upsert cannot touch the same merchant twice; the last message wins as before
+        index.write(dict(zip(self.df['merchant_id'], self._messages())))
+        self._publish_index("pgvector_index", index)
+        self._report_ingestion("pgvector", len(self.df), start)
+
+    # Indexes are only published once fully built, so searches during a background build
+    # fall back to scanning every merchant instead of seeing a partial index
     def _init_faiss(self):
-        self.faiss_index = FaissIndex()
-        for _, row in self.df.iterrows():
-            self.faiss_index.add(row['merchant_id'], row['message'])
+        start = time.perf_counter()
+        path = self._faiss_snapshot_path()
+        index = self._load_faiss_snapshot(path)
+        if index is not None:
+            self._publish_index("faiss_index", index)
+            self._report_ingestion("faiss snapshot", len(self.df), start)
+            return
+        index = FaissIndex()
+        index.add_batch(self.df['merchant_id'].tolist(), self._messages())
+        if path:
+            try:
+                index.save(path)
+            except Exception as e:
+                print(f"Error saving FAISS snapshot {path}: {e}")
+        self._publish_index("faiss_index", index)
+        self._report_ingestion("faiss", len(self.df), start)
+
+    def _faiss_snapshot_path(self) -> Optional[str]:
+        """Snapshot next to the feature store, keyed by CSV content, embedding model and index type."""
+        store_path = getattr(self.features, "path", None)
+        if not store_path:
+            return None
+        model = re.sub(r"[^A-Za-z0-9_.-]", "_", vector_backends.ollama_client.embedding_model)
+        return f"{os.path.splitext(store_path)[0]}-{model}-{FAISS_INDEX_TYPE}.faiss"
+
+    def _load_faiss_snapshot(self, path: Optional[str]) -> Optional[FaissIndex]:
+        if not path or not os.path.exists(path):
+            return None
+        try:
+            index = FaissIndex.load(path)
+        except Exception as e:
+            print(f"Ignoring unreadable FAISS snapshot {path}: {e}")
+            return None
+        return index if len(index.ids) == len(self.df) else None
 
     def _init_chromadb(self):
-        self.chromadb_index = ChromaDBIndex()
-        for _, row in self.df.iterrows():
-            self.chromadb_index.add(row['merchant_id'], row['message'])
+        start = time.perf_counter()
+        index = ChromaDBIndex()
+        index.add_batch(self.df['merchant_id'].tolist(), self._messages())
+        self._publish_index("chromadb_index", index)
+        self._report_ingestion("chromadb", len(self.df), start)
+
+    def _messages(self) -> List[str]:
+        return [str(m) for m in self.df['message']]
+
+    def _report_ingestion(self, backend: str, rows: int, start: float):
+        seconds = time.perf_counter() - start
+        self.ingestion_stats = {
+            "backend": backend,
+            "rows": rows,
+            "seconds": round(seconds, 3),
+            "rows_per_sec": round(rows / seconds, 1) if seconds > 0 else None,
+        }
+        print(f"Indexed {rows} merchant rows into {backend} in {seconds:.2f}s "
+              f"({self.ingestion_stats['rows_per_sec']} rows/sec)")
+
+    @property
+    def vector_index(self) -> Optional[VectorIndex]:
+        """Index of the configured vector backend, or None while it is not built."""
+        return {
+            "faiss": self.faiss_index,
+            "chromadb": self.chromadb_index,
+            "pgvector": self.pgvector_index,
+        }.get(self.vector_backend)
+
+    def retrieve_candidates(self, message: str, k: int) -> Optional[List[str]]:
+        """
+        Merchant ids of the ``k`` nearest neighbours of ``message`` in the active vector backend.
+
+        Returns None when no backend index is available, meaning every merchant is a candidate.
+        """
+        index = self.vector_index
+        return None if index is None else index.search(message, k)
+
+    def retrieve_candidates_batch(self, messages: List[str], k: int) -> Optional[List[List[Tuple[str, float]]]]:
+        """``(merchant_id, distance)`` neighbours of many messages with one embedding batch and one search."""
+        index = self.vector_index
+        return None if index is None else index.search_batch(messages, k)
+
+    def close(self):
+        if self.pgvector_index is not None:
+            self.pgvector_index.close()
+
+    async def apply_changes(self, upserts: Iterable[Dict] = (), deletes: Iterable[str] = ()) -> Dict:
+        """
+        Add, replace or delete merchants without rebuilding anything.
+
+        Each upsert is a full merchant record (``merchant_id``, ``city``, ``mcc_code``,
+        ``mcc_description`` and the list of ``messages``); a record without messages
+        deletes the merchant. Rows whose text and city are unchanged are kept, so only
+        new messages are tokenized and embedded. Vector backends are written in a worker
+        thread, then the new feature store and profiles are swapped in on the event loop.
+        """
+        async with self._changes_lock:
+            start = time.perf_counter()
+            changes = {str(m): None for m in deletes}
+            for record in upserts:
+                messages = [str(m) for m in record.get("messages") or []]
+                changes[str(record["merchant_id"])] = {**record, "messages": messages} if messages else None
+
+            features, profiles = self.features, self.profiles
+            next_row = len(features)
+            dead, new_rows, new_ids, new_cities, new_messages, plans = [], [], [], [], [], {}
+            for merchant_id, record in changes.items():
+                old = profiles.get(merchant_id)
+                old_rows = profiles.rows_of(merchant_id).tolist()
+                if record is None:
+                    dead.extend(old_rows)
+                    plans[merchant_id] = None
+                    continue
+                city = str(record.get("city") or "")
+                # Rows carry the city, so they can only be kept while it is unchanged
+                reusable = {}
+                if old is not None and old["city"] == city:
+                    for row, text in zip(old_rows, old["messages"]):
+                        reusable.setdefault(text, []).append(row)
+                rows = []
+                for text in record["messages"]:
+                    if reusable.get(text):
+                        rows.append(reusable[text].pop(0))
+                    else:
+                        rows.append(next_row)
+                        new_rows.append(next_row)
+                        new_ids.append(merchant_id)
+                        new_cities.append(city)
+                        new_messages.append(text)
+                        next_row += 1
+                kept = set(rows)
+                dead.extend(row for row in old_rows if row not in kept)
+                plans[merchant_id] = rows
+
+            await asyncio.to_thread(self._apply_to_vector_backend, changes, dead, new_rows, new_ids, new_messages)
+
+            self.features = features.with_changes(dead, new_ids, new_cities, new_messages)
+            # Any merchant change can alter every merchant's suggestions
+            self.precomputed = None
+            for merchant_id, rows in plans.items():
+                if rows is None:
+                    profiles.delete(merchant_id)
+                else:
+                    profiles.upsert(merchant_id, changes[merchant_id], rows)
+
+            seconds = time.perf_counter() - start
+            stats = self.update_stats
+            stats["batches"] += 1
+            stats["merchants"] += len(changes)
+            stats["rows_added"] += len(new_rows)
+            stats["rows_removed"] += len(dead)
+            stats["last_seconds"] = round(seconds, 4)
+            return {"merchants": len(changes), "rows_added": len(new_rows), "rows_removed": len(dead),
+                    "seconds": round(seconds, 4)}
+
+    def _apply_to_vector_backend(self, changes: Dict[str, Optional[Dict]], dead: List[int],
+                                 new_rows: List[int], new_ids: List[str], new_messages: List[str]):
+        change = (changes, dead, new_rows, new_ids, new_messages)
+        with self._index_lock:
+            index = self.vector_index
+            if index is None:
+                if self._pending_index_changes is not None:
+                    self._pending_index_changes.append(change)
+                return
+            self._write_vector_backend(index, *change)
+
+    @staticmethod
+    def _write_vector_backend(index: VectorIndex, changes: Dict[str, Optional[Dict]], dead: List[int],
+                              new_rows: List[int], new_ids: List[str], new_messages: List[str]):
+        deleted = [m for m, record in changes.items() if record is None]
+        changed = {m: record["messages"] for m, record in changes.items() if record is not None}
+        if isinstance(index, FaissIndex):
+            # FAISS holds one vector per row, addressed by feature store row position
+            index.remove(dead)
+            index.add_batch(new_ids, new_messages, new_rows)
+        elif isinstance(index, ChromaDBIndex):
+            # ChromaDB and pgvector hold one vector per merchant (first and last message)
+            index.delete(deleted)
+            index.upsert_batch(list(changed), [m[0] for m in changed.values()])
+        elif isinstance(index, PgVectorIndex):
+            index.write({m: messages[-1] for m, messages in changed.items()}, deleted)
+
+    async def add_message(self, merchant_id: str, message: str) -> Dict:
+        profile = self.profiles.get(merchant_id)
+        if profile is None:
+            raise KeyError(merchant_id)
+        profile["messages"].append(message)
+        return await self.apply_changes(upserts=[profile])
+
+    async def delete_message(self, merchant_id: str, position: int) -> Dict:
+        profile = self.profiles.get(merchant_id)
+        if profile is None or not 0 <= position < len(profile["messages"]):
+            raise KeyError(f"{merchant_id}/{position}")
+        del profile["messages"][position]
+        return await self.apply_changes(upserts=[profile])
 
     def get_merchant_name(self, merchant_id: str) -> str:
-        row = self.df[self.df['merchant_id'] == merchant_id]
-        if not row.empty:
-            return row.iloc[0].get('mcc_description', merchant_id)
-        return merchant_id
+        return self.profiles.name(merchant_id)
 
     async def is_marketing_related(self, text: str) -> bool:
         """Use LLM to determine if text is related to marketing or promotion."""
-        prompt = """
-        Analyze if the following text in Portuguese is related to marketing, advertising, promotion, 
-        social media, or digital services. Respond with only 'yes' or 'no'.
-        
-        Text: """ + text + """
-        
-        Response (yes/no): """
-        
         try:
-            response = await self.llm.generate(prompt, max_tokens=10)
-            return 'sim' in response.lower() or 'yes' in response.lower()
+            return await response_cache.get_or_compute(
+                "marketing", MARKETING_PROMPT_VERSION, self.cascade.cache_key, text, lambda: self._marketing_llm(text))
+        except LLMUnavailable:
+            raise  # the caller decides how to match without the LLM
         except Exception as e:
             print(f"Error in LLM classification: {e}")
             return False
 
-    async def find_matches(self, user_id: str, message: str, feedback_memory=None) -> List[Dict]:
+    async def _marketing_llm(self, text: str) -> bool:
+        verdict, response = await self.cascade.classify(MARKETING_PROMPT.format(text=text), parse_yes_no,
+                                                        GENERATION_OPTIONS, OUTPUT_FORMAT)
+        if verdict is None:
+            return 'sim' in response.lower() or 'yes' in response.lower()
+        return verdict
+
+    async def is_marketing_related_batch(self, texts: Iterable[str]) -> Dict[str, bool]:
+        """Classify many texts at once and return a {text: is_marketing} verdict map.
+
+        Duplicate and previously cached texts are classified only once. Depending on ``marketing_batch_mode``
+        the unique texts are either packed into numbered prompts or fanned out as
+        individual calls, with at most MARKETING_MAX_CONCURRENCY LLM calls in flight.
+        Texts whose call was shed by the LLM scheduler are left out of the map.
+        """
+        verdicts = {}
+        unique_texts = []
+        for text in dict.fromkeys(str(t) for t in texts):
+            found, verdict = await response_cache.get("marketing", MARKETING_PROMPT_VERSION, self.cascade.cache_key, text)
+            if found:
+                verdicts[text] = verdict
+            else:
+                unique_texts.append(text)
+        semaphore = asyncio.Semaphore(MARKETING_MAX_CONCURRENCY)
+
+        if self.marketing_batch_mode == "prompt":
+            chunks = [unique_texts[i:i + MARKETING_BATCH_SIZE]
+                      for i in range(0, len(unique_texts), MARKETING_BATCH_SIZE)]
+
+            async def run_chunk(chunk):
+                async with semaphore:
+                    start = time.perf_counter()
+                    chunk_verdicts = await self._classify_marketing_chunk(chunk)
+                    elapsed = (time.perf_counter() - start) / len(chunk)
+                for text, verdict in chunk_verdicts.items():
+                    await response_cache.set("marketing", MARKETING_PROMPT_VERSION, self.cascade.cache_key,
+                                             text, verdict, elapsed)
+                return chunk_verdicts
+
+            for chunk_verdicts in await asyncio.gather(*(run_chunk(c) for c in chunks)):
+                verdicts.update(chunk_verdicts)
+
+            # Anything the model skipped or answered ambiguously is classified on its own
+            missing = [t for t in unique_texts if t not in verdicts]
+        else:
+            missing = unique_texts
+
+        async def run_single(text):
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    verdict = await self._marketing_llm(text)
+                except LLMUnavailable:
+                    return text, None  # shed: left unclassified, so it is asked again later
+                except Exception as e:
+                    print(f"Error in LLM classification: {e}")
+                    return text, False
+            await response_cache.set("marketing", MARKETING_PROMPT_VERSION, self.cascade.cache_key,
+                                     text, verdict, time.perf_counter() - start)
+            return text, verdict
+
+        verdicts.update((text, verdict) for text, verdict in await asyncio.gather(*(run_single(t) for t in missing))
+                        if verdict is not None)
+        return verdicts
+
+    async def _classify_marketing_chunk(self, texts: List[str]) -> Dict[str, bool]:
+        """Classify a chunk of texts with a single numbered prompt."""
+        numbered = "\n".join(f"{i}. {' '.join(t.split())}" for i, t in enumerate(texts, start=1))
+        prompt = f"{MARKETING_BATCH_PROMPT}\n{numbered}\n\nResponse:"
+        options = {**GENERATION_OPTIONS, "num_predict": BATCH_TOKENS_PER_TEXT * len(texts)}
+        try:
+            response = await self.llm.generate(prompt, options=options)
+        except Exception as e:
+            print(f"Error in LLM batch classification: {e}")
+            return {}
+
+        verdicts = {}
+        for number, answer in _BATCH_VERDICT_RE.findall(response):
+            index = int(number) - 1
+            if 0 <= index < len(texts):
+                verdicts[texts[index]] = answer.lower() in ("yes", "sim")
+        return verdicts
+
+    async def classify_all_marketing(self) -> int:
+        """Classify every live message the store has no marketing verdict for yet; returns how many."""
+        store = self.features
+        rows = np.flatnonzero(store.alive & (store.marketing == MARKETING_UNKNOWN))
+        if len(rows):
+            await self._marketing_flags(store, rows)
+            await self.flush_marketing()
+        return len(rows)
+
+    async def _marketing_flags(self, store: MerchantFeatureStore, rows: np.ndarray) -> np.ndarray:
+        """Marketing verdicts for ``rows``, classifying only rows the store has not seen yet."""
+        unknown = rows[store.marketing[rows] == MARKETING_UNKNOWN]
+        if len(unknown):
+            verdicts = await self.is_marketing_related_batch(store.messages(unknown))
+            store.set_marketing(unknown, verdicts)
+            if self.features is not store:
+                # Rows keep their position across updates, so the verdicts carry over
+                self.features.set_marketing(unknown, verdicts)
+            self._schedule_marketing_save()
+        return store.marketing[rows] == 1
+
+    def _schedule_marketing_save(self):
+        """Persist the marketing verdicts soon, off the event loop; one writer at a time."""
+        self._marketing_dirty = True
+        task = self._marketing_save
+        if task is None or task.done() or task.get_loop() is not asyncio.get_running_loop():
+            self._marketing_save = asyncio.create_task(self._save_marketing(MARKETING_SAVE_DELAY))
+
+    async def _save_marketing(self, delay: float):
+        # Verdicts recorded while a write is in progress are picked up by the next round
+        while self._marketing_dirty:
+            await asyncio.sleep(delay)
+            self._marketing_dirty = False
+            try:
+                await asyncio.to_thread(self.features.save_marketing)
+            except Exception as e:
+                print(f"Error saving marketing verdicts: {e}")
+
+    async def flush_marketing(self):
+        """Write pending marketing verdicts now."""
+        task, self._marketing_save = self._marketing_save, None
+        if task is not None and not task.done() and task.get_loop() is asyncio.get_running_loop():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            # A write the task had started may still be running; ours is serialized after it
+            self._marketing_dirty = True
+        if self._marketing_dirty:
+            self._marketing_dirty = False
+            await asyncio.to_thread(self.features.save_marketing)
+
+    async def find_matches(self, user_id: str, message: str,
+                           feedback_memory: Optional[FeedbackStore] = None) -> List[Dict]:
+        # Suggestions computed offline by bulk_matchmaking.py need no LLM call or scoring
+        if self.precomputed is not None:
+            matches = self.precomputed.get(user_id, message)
+            if matches is not None:
+                return matches
+
         # Get user information
-        user_row = self.df[self.df['merchant_id'] == user_id]
-        if user_row.empty:
+        profile = self.profiles.get(user_id)
+        if profile is None:
             return []
-            
-        user_city = user_row.iloc[0]['city']
-        
-        # Check if the message is marketing-related using LLM
-        is_marketing_related = await self.is_marketing_related(message)
-        
-        # Find potential matches
-        matches = []
-        for _, row in self.df.iterrows():
-            # Skip the user themselves
-            if row['merchant_id'] == user_id:
-                continue
-                
-            merchant_message = str(row['message'])
-            merchant_message_lower = merchant_message.lower()
-            
-            # Calculate match score
-            score = 0
-            
-            # 1. Check if both messages are marketing-related using LLM
-            if is_marketing_related:
-                merchant_is_marketing = await self.is_marketing_related(merchant_message)
-                if merchant_is_marketing:
-                    score += 10  # Strong match if both are marketing-related
-            
-            # 2. Check for same city
-            if row['city'] == user_city:
-                score += 3
-                
-            # 3. Check for common keywords (as fallback)
-            message_words = set(message.lower().split())
-            merchant_words = set(merchant_message_lower.split())
-            common_words = message_words & merchant_words
-            
-            # Filter out common words
-            common_words = {w for w in common_words if len(w) > 3 and w not in ['com', 'para', 'como', 'mais', 'muito']}
-            score += len(common_words) * 2
-            
-            # 4. Check for service request/offer patterns
-            request_indicators = ['preciso', 'busco', 'procurando', 'quero', 'precisamos', 'precisava']
-            offer_indicators = ['ofereço', 'faço', 'presto', 'vendo', 'trabalho com', 'sou', 'sou de', 'atendo']
-            
-            is_request = any(ind in message.lower() for ind in request_indicators)
-            is_offer = any(ind in merchant_message_lower for ind in offer_indicators)
-            
-            if is_request and is_offer:
-                score += 5  # Strong match for request-offer pairs
-                
-            # Debug info
-            debug_info = {
-                'merchant_id': row['merchant_id'],
-                'message': merchant_message,
-                'score': score,
-                'is_marketing_related': is_marketing_related,
-                'common_words': list(common_words),
-                'city_match': row['city'] == user_city
-            }
-            print(f"Debug - Merchant {row['merchant_id']} - Score: {score} - {debug_info}")
-            
-            # Only include matches with a minimum score
-            if score >= 5:  # Adjusted threshold for LLM-based matching
-                matches.append({
-                    'merchant_id': row['merchant_id'],
-                    'name': self.get_merchant_name(row['merchant_id']),
-                    'city': row['city'],
-                    'message': merchant_message,
-                    'score': score
-                })
-        
-        # Sort matches by score (highest first) and then by city (same city first)
-        matches.sort(key=lambda x: (-x['score'], 0 if x['city'] == user_city else 1))
-        
-        # Get top 5 matches
-        top_matches = matches[:5]
-        
+
+        user_city = profile['city'] or None  # a merchant without a city matches no city
+
+        # Check if the message is marketing-related using LLM; when the LLM is overloaded
+        # the matches are ranked on keywords and city alone
+        try:
+            is_marketing_related = await self.is_marketing_related(message)
+        except LLMUnavailable as e:
+            print(f"Heuristic-only matching: {e}")
+            is_marketing_related = False
+
+        # Updates swap in a new store; this request keeps working on the current one
+        store = self.features
+
+        # Everything about the candidates is precomputed, only the query is tokenized here
+        query_token_ids = store.query_token_ids(keyword_tokens(message))
+        candidates = store.alive.copy()
+        candidates[self.profiles.rows_of(user_id)] = False
+
+        # Stage 1: narrow the candidates down to the nearest neighbours in the vector index
+        if self.candidate_k > 0:
+            try:
+                neighbour_ids = await asyncio.to_thread(self.retrieve_candidates, message, self.candidate_k)
+            except Exception as e:
+                print(f"Error in vector retrieval, scanning all merchants: {e}")
+                neighbour_ids = None
+            if neighbour_ids is not None:
+                neighbours = np.zeros(len(store), dtype=bool)
+                rows = self.profiles.rows_for(neighbour_ids)
+                # Rows appended by an update after this request started are not in its store
+                neighbours[rows[rows < len(store)]] = True
+                candidates &= neighbours
+        candidates = np.flatnonzero(candidates)
+
+        # Stage 2: heuristic and LLM rerank of the remaining candidates
+        # Marketing bonus applies to candidates that are marketing-related too
+        marketing = None
+        if is_marketing_related:
+            marketing = np.zeros(len(store), dtype=bool)
+            if self.marketing_batch_mode == "sequential":
+                for i in candidates:
+                    try:
+                        marketing[i] = await self.is_marketing_related(store.message(i))
+                    except LLMUnavailable:
+                        pass
+            else:
+                marketing[candidates] = await self._marketing_flags(store, candidates)
+
+        # Score all merchants at once and keep the top 5 (same city first on ties)
+        scores, city_match = score_rows(store, user_city, query_token_ids,
+                                        is_request_message(message), marketing)
+        top_rows = top_k_rows(scores, city_match, candidates)
+
         # If no matches found, return empty list
-        if not top_matches:
+        if len(top_rows) == 0:
             return []
             
+        # The score breakdown is only worked out for a sample of the calls
+        if MATCHMAKER_DEBUG_SAMPLE_RATE > 0 and random.random() < MATCHMAKER_DEBUG_SAMPLE_RATE:
+            for i in top_rows:
+                common_words = [str(store.vocab[t]) for t in np.intersect1d(store.row_keywords(i), query_token_ids)]
+                print(f"Debug - Merchant {store.merchant_id[i]} - Score: {scores[i]} - "
+                      f"common_words={common_words} city_match={bool(city_match[i])}")
+
         # Format the matches for the response
-        formatted_matches = []
-        for match in top_matches:
-            formatted_matches.append({
-                'id': match['merchant_id'],
-                'name': match['name'],
-                'city': match['city'],
-                'message': match['message']
-            })
-            
-        return formatted_matches 
\ No newline at end of file
+        return [self.format_match(store, i) for i in top_rows]
+
+    def format_match(self, store: MerchantFeatureStore, row: int) -> Dict:
+        merchant_id = str(store.merchant_id[row])
+        return {
+            'id': merchant_id,
+            'name': self.get_merchant_name(merchant_id),
+            'city': str(store.city[row]),
+            'message': store.message(row)
+        }
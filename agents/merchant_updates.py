@@ -0,0 +1,91 @@
+import asyncio
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# Poll the merchant CSV and apply edits incrementally while the API runs
+MERCHANT_WATCH = os.environ.get("MERCHANT_WATCH", "0") == "1"
+MERCHANT_WATCH_INTERVAL = float(os.environ.get("MERCHANT_WATCH_INTERVAL", "2"))
+
+RECORD_COLUMNS = ["merchant_id", "city", "mcc_code", "mcc_description", "message"]
+
+
+def merchant_digests(df: pd.DataFrame) -> Dict[str, int]:
+    """
+    One 64-bit content hash per merchant over its rows, in order.
+
+    Row hashes are computed column-wise by pandas and combined per merchant with
+    position-dependent odd multipliers, so no Python code runs per row.
+    """
+    columns = df.reindex(columns=RECORD_COLUMNS).fillna("").astype(str)
+    row_hash = pd.util.hash_pandas_object(columns, index=False).to_numpy(dtype=np.uint64)
+    codes, merchant_ids = pd.factorize(columns['merchant_id'])
+    if len(codes) == 0:
+        return {}
+    order = np.argsort(codes, kind="stable")
+    grouped = codes[order]
+    starts = np.flatnonzero(np.r_[True, grouped[1:] != grouped[:-1]])
+    position = np.arange(len(grouped)) - np.repeat(starts, np.diff(np.r_[starts, len(grouped)]))
+    mixed = row_hash[order] * (position.astype(np.uint64) * np.uint64(2) + np.uint64(1))
+    digests = np.add.reduceat(mixed, starts)
+    return dict(zip(np.asarray(merchant_ids)[grouped[starts]].tolist(), digests.tolist()))
+
+
+def merchant_records(df: pd.DataFrame, merchant_ids) -> List[Dict]:
+    """Full merchant records (profile fields from the first row, all messages) for ``merchant_ids``."""
+    wanted = df[df['merchant_id'].astype(str).isin(set(merchant_ids))]
+    records = []
+    for merchant_id, group in wanted.groupby(wanted['merchant_id'].astype(str), sort=False):
+        first = group.iloc[0]
+        record = {k: "" if pd.isna(first.get(k)) else str(first.get(k)) for k in ("city", "mcc_code", "mcc_description")}
+        records.append({"merchant_id": merchant_id, **record, "messages": [str(m) for m in group['message']]})
+    return records
+
+
+class MerchantFileWatcher:
+    """
+    Polls the merchant CSV and applies the merchants that changed since the last read.
+
+    The whole file is re-read on change (there is no cheaper way to see a CSV edit),
+    but only merchants whose content hash differs are sent to ``apply_changes``, so
+    untouched rows are neither re-tokenized nor re-embedded.
+    """
+
+    def __init__(self, matchmaker, path: str, interval: float = MERCHANT_WATCH_INTERVAL):
+        self.matchmaker = matchmaker
+        self.path = path
+        self.interval = interval
+        self.digests = merchant_digests(matchmaker.df)
+        self.signature = self._signature()
+
+    def _signature(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    async def poll_once(self) -> Optional[Dict]:
+        """Apply the file's changes if it was modified since the last poll; returns the change stats."""
+        signature = self._signature()
+        if signature is None or signature == self.signature:
+            return None
+        df = await asyncio.to_thread(pd.read_csv, self.path, dtype={'merchant_id': str})
+        digests = await asyncio.to_thread(merchant_digests, df)
+        changed = [m for m, digest in digests.items() if self.digests.get(m) != digest]
+        deleted = [m for m in self.digests if m not in digests]
+        result = await self.matchmaker.apply_changes(upserts=merchant_records(df, changed), deletes=deleted)
+        self.digests, self.signature = digests, signature
+        return result
+
+    async def run(self):
+        while True:
+            try:
+                result = await self.poll_once()
+                if result and result["merchants"]:
+                    print(f"Applied merchant file changes: {result}")
+            except Exception as e:
+                print(f"Error applying merchant file changes: {e}")
+            await asyncio.sleep(self.interval)
@@ -0,0 +1,178 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional, Sequence, Tuple
+
+COUNTERS = ("llm_calls", "prompt_tokens", "completion_tokens", "cache_hits", "llm_shed")
+
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+CALL_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50)
+TOKEN_BUCKETS = (0, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class StepMetrics:
+    """Wall time and LLM usage of one pipeline step."""
+    __slots__ = ("start", "ms") + COUNTERS
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.ms = None
+        for name in COUNTERS:
+            setattr(self, name, 0)
+
+    def elapsed_ms(self) -> float:
+        return round((time.perf_counter() - self.start) * 1000, 2)
+
+    def as_dict(self) -> Dict[str, float]:
+        return {"ms": self.ms if self.ms is not None else self.elapsed_ms(),
+                **{name: getattr(self, name) for name in COUNTERS}}
+
+
+# The step being measured and the per-run collection of finished steps; asyncio tasks
+# inherit both, so concurrent steps and requests are counted separately
+_current_step: ContextVar[Optional[StepMetrics]] = ContextVar("agent_step", default=None)
+_current_trace: ContextVar[Optional[Dict[str, StepMetrics]]] = ContextVar("agent_trace", default=None)
+
+
+def current_trace() -> Optional[Dict[str, StepMetrics]]:
+    return _current_trace.get()
+
+
+def record_llm_call(prompt_tokens: int = 0, completion_tokens: int = 0):
+    step = _current_step.get()
+    if step is not None:
+        step.llm_calls += 1
+        step.prompt_tokens += prompt_tokens
+        step.completion_tokens += completion_tokens
+
+
+def record_cache_hit():
+    step = _current_step.get()
+    if step is not None:
+        step.cache_hits += 1
+
+
+def record_llm_shed():
+    """An LLM call of the current step was shed by the scheduler and answered by a fallback."""
+    step = _current_step.get()
+    if step is not None:
+        step.llm_shed += 1
+
+
+@contextmanager
+def step(name: str) -> Iterator[StepMetrics]:
+    """Measure one step; it joins the current trace and, when it succeeds, the /metrics histograms."""
+    metrics = StepMetrics()
+    token = _current_step.set(metrics)
+    succeeded = False
+    try:
+        yield metrics
+        succeeded = True
+    finally:
+        _current_step.reset(token)
+        if metrics.ms is None:
+            metrics.ms = metrics.elapsed_ms()
+        trace = _current_trace.get()
+        if trace is not None:
+            trace[name] = metrics
+        if succeeded:
+            registry.observe_step(name, metrics)
+
+
+@contextmanager
+def trace() -> Iterator[Dict[str, StepMetrics]]:
+    """Collect the steps measured inside the block (and in the tasks it starts) by name."""
+    steps: Dict[str, StepMetrics] = {}
+    token = _current_trace.set(steps)
+    try:
+        yield steps
+    finally:
+        _current_trace.reset(token)
+
+
+class Histogram:
+    """Cumulative Prometheus histogram with one label."""
+
+    def __init__(self, name: str, help: str, buckets: Sequence[float], label: str = "step"):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.label = label
+        # label value -> (bucket counts, sum, count)
+        self.series: Dict[str, Tuple[list, float, int]] = {}
+
+    def observe(self, label_value: str, value: float):
+        counts, total, count = self.series.get(label_value) or ([0] * len(self.buckets), 0.0, 0)
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(counts):
+            counts[index] += 1
+        self.series[label_value] = (counts, total + value, count + 1)
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for label_value, (counts, total, count) in sorted(self.series.items()):
+            label = f'{self.label}="{label_value}"'
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                lines.append(f'{self.name}_bucket{{{label},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{label},le="+Inf"}} {count}')
+            lines.append(f"{self.name}_sum{{{label}}} {total}")
+            lines.append(f"{self.name}_count{{{label}}} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Per-step histograms and counters served in the Prometheus text format on /metrics."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.duration = Histogram("agent_step_duration_seconds", "Wall time of each pipeline step.",
+                                  DURATION_BUCKETS)
+        self.llm_calls = Histogram("agent_step_llm_calls", "LLM generate calls per step.", CALL_BUCKETS)
+        self.prompt_tokens = Histogram("agent_step_prompt_tokens", "Prompt tokens per step.", TOKEN_BUCKETS)
+        self.completion_tokens = Histogram("agent_step_completion_tokens", "Completion tokens per step.",
+                                           TOKEN_BUCKETS)
+        self.cache_hits: Dict[str, int] = {}
+        self.llm_shed: Dict[str, int] = {}
+
+    def observe_step(self, name: str, metrics: StepMetrics):
+        with self._lock:
+            self.duration.observe(name, metrics.ms / 1000)
+            self.llm_calls.observe(name, metrics.llm_calls)
+            self.prompt_tokens.observe(name, metrics.prompt_tokens)
+            self.completion_tokens.observe(name, metrics.completion_tokens)
+            self.cache_hits[name] = self.cache_hits.get(name, 0) + metrics.cache_hits
+            self.llm_shed[name] = self.llm_shed.get(name, 0) + metrics.llm_shed
+
+    def render(self, scheduler: Optional[Dict] = None) -> str:
+        """Text exposition; ``scheduler`` adds the LLM queue gauges and shed counters."""
+        with self._lock:
+            lines = []
+            for histogram in (self.duration, self.llm_calls, self.prompt_tokens, self.completion_tokens):
+                lines.extend(histogram.render())
+            for metric, help, values in (
+                    ("agent_step_cache_hits_total", "Response cache hits per step.", self.cache_hits),
+                    ("agent_step_llm_shed_total", "LLM calls shed by the scheduler per step.", self.llm_shed)):
+                lines.append(f"# HELP {metric} {help}")
+                lines.append(f"# TYPE {metric} counter")
+                for name, value in sorted(values.items()):
+                    lines.append(f'{metric}{{step="{name}"}} {value}')
+        if scheduler is not None:
+            for metric, help in (("llm_queue_depth", "LLM calls waiting for a slot."),
+                                 ("llm_in_flight", "LLM calls running.")):
+                lines.append(f"# HELP {metric} {help}")
+                lines.append(f"# TYPE {metric} gauge")
+                lines.append(f"{metric} {scheduler[metric[4:]]}")
+            for metric, key, help in (("llm_shed_total", "shed", "LLM calls shed because the queue was full."),
+                                      ("llm_expired_total", "expired", "LLM calls dropped past their deadline.")):
+                lines.append(f"# HELP {metric} {help}")
+                lines.append(f"# TYPE {metric} counter")
+                for name, value in sorted(scheduler[key].items()):
+                    lines.append(f'{metric}{{priority="{name}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
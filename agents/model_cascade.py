@@ -0,0 +1,61 @@
+import os
+from collections import Counter
+from typing import Callable, Dict, Optional, Tuple, TypeVar
+
+from agents.ollama_client import OllamaClient
+
+# Small model every classification agent asks first, unless its <AGENT>_FAST_MODEL
+# overrides it; empty sends everything to the agent's own model
+OLLAMA_FAST_MODEL = os.environ.get("OLLAMA_FAST_MODEL", "")
+# Probability of the small model's first answer token below which the agent's model is asked
+CASCADE_MIN_CONFIDENCE = float(os.environ.get("CASCADE_MIN_CONFIDENCE", "0.8"))
+
+# Per agent: answers kept from the small model, escalations by cause and large model calls
+cascade_stats: Dict[str, Counter] = {}
+
+T = TypeVar("T")
+
+
+class ModelCascade:
+    """
+    Small model first, the agent's own (larger) model only when needed.
+
+    The small model's answer is kept when it parses into a known label and, if Ollama
+    reports logprobs, its first token is at least ``min_confidence`` likely. Otherwise
+    the prompt is sent again to ``llm.model``. Without a ``fast_model`` every prompt
+    goes straight to ``llm.model``.
+    """
+
+    def __init__(self, name: str, llm: OllamaClient, fast_model: str = OLLAMA_FAST_MODEL,
+                 min_confidence: float = CASCADE_MIN_CONFIDENCE):
+        self.llm = llm
+        # Asking the large model anyway gains nothing
+        self.fast_model = fast_model if fast_model != llm.model else ""
+        self.min_confidence = min_confidence
+        self.stats = cascade_stats.setdefault(name, Counter())
+
+    @property
+    def cache_key(self) -> str:
+        """Model name for response cache keys: the answer depends on both models."""
+        return f"{self.fast_model}>{self.llm.model}" if self.fast_model else self.llm.model
+
+    async def classify(self, prompt: str, parse: Callable[[str], Optional[T]], options: Optional[dict] = None,
+                       format=None) -> Tuple[Optional[T], str]:
+        """
+        ``(parse(answer), answer)`` of the model that answered; parse returns None for
+        unknown labels. ``options`` and ``format`` go to both models (see OllamaClient.generate).
+        """
+        if self.fast_model:
+            answer, confidence = await self.llm.generate_scored(prompt, model=self.fast_model, options=options,
+                                                                format=format)
+            label = parse(answer)
+            if label is None:
+                self.stats["escalated_unparsed"] += 1
+            elif confidence is not None and confidence < self.min_confidence:
+                self.stats["escalated_low_confidence"] += 1
+            else:
+                self.stats["fast"] += 1
+                return label, answer
+        answer = await self.llm.generate(prompt, options=options, format=format)
+        self.stats["large"] += 1
+        return parse(answer), answer
@@ -1,4 +1,14 @@
-from agents.ollama_client import OllamaClient
+import os
+from typing import Optional
+from agents.ollama_client import OllamaClient, DEFAULT_MODEL
+from agents.fast_path import fast_moderate, log_llm_label
+from agents.response_cache import response_cache, prompt_version
+from agents.llm_scheduler import LLMUnavailable
+from agents.model_cascade import ModelCascade, OLLAMA_FAST_MODEL
+
+# Moderator model and the smaller one asked first (see model_cascade.py)
+MODERATOR_MODEL = os.environ.get("MODERATOR_MODEL", DEFAULT_MODEL)
+MODERATOR_FAST_MODEL = os.environ.get("MODERATOR_FAST_MODEL", OLLAMA_FAST_MODEL)
 
 SYSTEM_PROMPT = """
 You are a conversation moderator for a smart social network. Your role is to moderate merchant messages while allowing legitimate business-related discussions.
@@ -13,17 +23,46 @@ Examples:
 - "preciso de ajuda com divulgação no instagram" -> allow
 - "faço posts para redes sociais" -> allow
 """
+PROMPT_VERSION = prompt_version(SYSTEM_PROMPT)
+
+# A greedy one-line verdict; the reason is free text, so the action is validated after parsing
+GENERATION_OPTIONS = {"temperature": 0, "num_predict": 16, "stop": ["\n"]}
 
 class ModeratorAgent:
     """
     Analyzes messages for spam, inappropriate content, or low-quality interactions.
     """
-    def __init__(self):
-        self.llm = OllamaClient()
+    def __init__(self, model: str = MODERATOR_MODEL, fast_model: str = MODERATOR_FAST_MODEL):
+        self.llm = OllamaClient(model, priority="moderation")
+        self.cascade = ModelCascade("moderator", self.llm, fast_model)
+
+    async def moderate(self, message: str) -> dict:
+        verdict = fast_moderate(message)
+        if verdict:
+            return verdict
+        try:
+            verdict = await response_cache.get_or_compute(
+                "moderator", PROMPT_VERSION, self.cascade.cache_key, message, lambda: self._moderate_llm(message))
+        except LLMUnavailable as e:
+            # The LLM is overloaded: let the message through, marked so it can be reviewed later
+            print(f"Moderator allowing unverified message: {e}")
+            return {"action": "allow", "unverified": True, "reason": "unverified: LLM unavailable"}
+        return dict(verdict)  # callers may annotate the verdict, keep the cached one intact
 
-    def moderate(self, message: str) -> dict:
+    async def _moderate_llm(self, message: str) -> dict:
         prompt = f"{SYSTEM_PROMPT}\nMessage: {message}\nModeration:"
-        result = self.llm.generate(prompt).strip().lower()
+        verdict, result = await self.cascade.classify(prompt, self._parse_known, GENERATION_OPTIONS)
+        if verdict is None:
+            verdict = self._parse(result.strip().lower())
+        log_llm_label("moderator", message, verdict)
+        return verdict
+
+    def _parse_known(self, result: str) -> Optional[dict]:
+        """Verdict of an answer starting with flag, warn or allow, otherwise None."""
+        result = result.strip().lower()
+        return self._parse(result) if result.startswith(("flag", "warn", "allow")) else None
+
+    def _parse(self, result: str) -> dict:
         if result.startswith("flag"):
             reason = result[4:].strip(": ") or "inappropriate or abusive content"
             return {"action": "flag", "reason": reason}
@@ -1,27 +1,219 @@
-import requests
+import asyncio
+import json
+import math
 import os
+import random
+import time
+import weakref
+from typing import AsyncIterator, List, Optional, Tuple
 
-OLLAMA_URL = os.environ.get("OLLAMA_HOST", "http://localhost:11434") + "/api/generate"
+import httpx
+
+from agents import metrics
+from agents import llm_scheduler
+from agents.llm_scheduler import LLMScheduler, merge_stats, remaining, LLMDeadlineExceeded
+
+OLLAMA_HOST = os.environ.get("OLLAMA_HOST", "http://localhost:11434")
+OLLAMA_URL = OLLAMA_HOST + "/api/generate"
 DEFAULT_MODEL = os.environ.get("OLLAMA_MODEL", "llama3.2")
 
+# Seconds a single Ollama call may take before it is aborted (and retried)
+OLLAMA_TIMEOUT = float(os.environ.get("OLLAMA_TIMEOUT", "60"))
+OLLAMA_MAX_RETRIES = int(os.environ.get("OLLAMA_MAX_RETRIES", "2"))
+OLLAMA_RETRY_BACKOFF = float(os.environ.get("OLLAMA_RETRY_BACKOFF", "0.5"))
+# Calls in flight against Ollama per process (shared by every agent, queued by priority
+# beyond that, see llm_scheduler.py) and keep-alive pool size
+OLLAMA_MAX_CONCURRENCY = int(os.environ.get("OLLAMA_MAX_CONCURRENCY", "8"))
+OLLAMA_POOL_SIZE = int(os.environ.get("OLLAMA_POOL_SIZE", "16"))
+
+# Send the output length limits, stop sequences and format schemas the agents ask for;
+# 0 for Ollama versions without structured outputs (format schemas need 0.5 or later)
+OLLAMA_CONSTRAINED_OUTPUT = os.environ.get("OLLAMA_CONSTRAINED_OUTPUT", "1") == "1"
+
+_RETRY_STATUS = {429, 500, 502, 503, 504}
+
+# One pooled async client and LLM scheduler per event loop, shared by all OllamaClient instances
+_loop_state = weakref.WeakKeyDictionary()
+_sync_client = None
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(max_connections=OLLAMA_POOL_SIZE, max_keepalive_connections=OLLAMA_POOL_SIZE)
+
+
+def _async_state():
+    loop = asyncio.get_running_loop()
+    state = _loop_state.get(loop)
+    if state is None:
+        state = (httpx.AsyncClient(limits=_limits(), timeout=OLLAMA_TIMEOUT),
+                 LLMScheduler(OLLAMA_MAX_CONCURRENCY, llm_scheduler.LLM_QUEUE_SIZE))
+        _loop_state[loop] = state
+    return state
+
+
+def _blocking_client() -> httpx.Client:
+    global _sync_client
+    if _sync_client is None:
+        _sync_client = httpx.Client(limits=_limits(), timeout=OLLAMA_TIMEOUT)
+    return _sync_client
+
+
+def scheduler_stats():
+    """Queue depth, in-flight calls and admitted, shed and expired calls by priority."""
+    return merge_stats(state[1] for state in list(_loop_state.values()))
+
+
+async def aclose():
+    """Close the pooled client of the running event loop (call on application shutdown)."""
+    state = _loop_state.pop(asyncio.get_running_loop(), None)
+    if state is not None:
+        await state[0].aclose()
+
+
 class OllamaClient:
-    def __init__(self, model=DEFAULT_MODEL):
+    def __init__(self, model=DEFAULT_MODEL, host: str = OLLAMA_HOST, timeout: float = OLLAMA_TIMEOUT,
+                 max_retries: int = OLLAMA_MAX_RETRIES, priority: str = "matchmaking"):
         self.model = model
+        # Scheduler priority of this client's calls (see llm_scheduler.PRIORITIES)
+        self.priority = priority
         self.embedding_model = os.environ.get("OLLAMA_EMBEDDING_MODEL", "all-minilm")
+        self.host = host.rstrip("/")
+        self.timeout = timeout
+        self.max_retries = max_retries
+        # Cumulative generation usage as reported by Ollama
+        self.usage = {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0}
+
+    async def generate(self, prompt: str, timeout: Optional[float] = None, options: Optional[dict] = None,
+                       format=None) -> str:
+        """
+        Generate a complete answer. ``options`` are Ollama model options such as
+        ``num_predict``, ``stop`` and ``temperature``; ``format`` is ``"json"`` or a JSON
+        schema the answer must follow.
+        """
+        data = await self._post("/api/generate", _generate_payload(self.model, prompt, False, options, format), timeout)
+        self._record_usage(data)
+        return data["response"].strip()
+
+    async def generate_scored(self, prompt: str, model: Optional[str] = None, timeout: Optional[float] = None,
+                              options: Optional[dict] = None, format=None) -> Tuple[str, Optional[float]]:
+        """
+        Generate with ``model`` (default: this client's) and return the answer with the
+        probability of its first token, or None when Ollama reports no logprobs.
+        """
+        payload = _generate_payload(model or self.model, prompt, False, options, format)
+        payload["logprobs"] = True
+        data = await self._post("/api/generate", payload, timeout)
+        self._record_usage(data)
+        return data["response"].strip(), _first_token_probability(data.get("logprobs"))
+
+    async def stream(self, prompt: str, timeout: Optional[float] = None,
+                     options: Optional[dict] = None) -> AsyncIterator[str]:
+        """Yield response tokens as Ollama produces them."""
+        client, scheduler = _async_state()
+        payload = _generate_payload(self.model, prompt, True, options, None)
+        async with scheduler.slot(self.priority):
+            async with client.stream("POST", self.host + "/api/generate", json=payload,
+                                     timeout=_call_timeout(timeout or self.timeout)) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get("response"):
+                        yield chunk["response"]
+                    if chunk.get("done"):
+                        self._record_usage(chunk)
+                        break
+
+    async def embed(self, text: str, timeout: Optional[float] = None) -> List[float]:
+        data = await self._post("/api/embeddings", {"model": self.embedding_model, "prompt": text}, timeout)
+        return data["embedding"]
+
+    async def embed_batch(self, texts, timeout: Optional[float] = None) -> List[List[float]]:
+        """Embed several texts with a single /api/embed request."""
+        data = await self._post("/api/embed", {"model": self.embedding_model, "input": list(texts)}, timeout)
+        return data["embeddings"]
+
+    # Blocking variants for startup ingestion and worker threads, sharing a keep-alive pool
+    def embed_sync(self, text: str) -> List[float]:
+        return self._post_sync("/api/embeddings", {"model": self.embedding_model, "prompt": text})["embedding"]
+
+    def embed_batch_sync(self, texts) -> List[List[float]]:
+        """Embed several texts with a single /api/embed request."""
+        return self._post_sync("/api/embed", {"model": self.embedding_model, "input": list(texts)})["embeddings"]
+
+    def _record_usage(self, data: dict):
+        self.usage["calls"] += 1
+        self.usage["prompt_tokens"] += data.get("prompt_eval_count", 0)
+        self.usage["completion_tokens"] += data.get("eval_count", 0)
+        metrics.record_llm_call(data.get("prompt_eval_count", 0), data.get("eval_count", 0))
+
+    async def _post(self, path: str, payload: dict, timeout: Optional[float] = None) -> dict:
+        client, scheduler = _async_state()
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with scheduler.slot(self.priority):
+                    response = await client.post(self.host + path, json=payload,
+                                                 timeout=_call_timeout(timeout or self.timeout))
+                response.raise_for_status()
+                return response.json()
+            except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                if not _should_retry(e) or attempt >= self.max_retries:
+                    raise
+            delay = _backoff(attempt)
+            if remaining(delay) < delay:
+                raise LLMDeadlineExceeded("request deadline passes before the retry")
+            await asyncio.sleep(delay)
+
+    def _post_sync(self, path: str, payload: dict) -> dict:
+        client = _blocking_client()
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = client.post(self.host + path, json=payload, timeout=self.timeout)
+                response.raise_for_status()
+                return response.json()
+            except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                if not _should_retry(e) or attempt >= self.max_retries:
+                    raise
+            time.sleep(_backoff(attempt))
+
+
+def _generate_payload(model: str, prompt: str, stream: bool, options: Optional[dict], format) -> dict:
+    payload = {"model": model, "prompt": prompt, "stream": stream}
+    options = dict(options or {})
+    if not OLLAMA_CONSTRAINED_OUTPUT:
+        options.pop("num_predict", None)
+        options.pop("stop", None)
+        format = None
+    if options:
+        payload["options"] = options
+    if format is not None:
+        payload["format"] = format
+    return payload
+
+
+def _first_token_probability(logprobs) -> Optional[float]:
+    # Quotes and braces of a format-constrained answer are certain, the label's first word is not
+    for entry in logprobs or ():
+        if any(c.isalnum() for c in str(entry.get("token", ""))):
+            return math.exp(entry["logprob"])
+    return None
+
+
+def _call_timeout(timeout: float) -> float:
+    """The call's own timeout, cut short by the request deadline."""
+    left = remaining(timeout)
+    if left <= 0:
+        raise LLMDeadlineExceeded("request deadline passed")
+    return left
+
+
+def _should_retry(error: Exception) -> bool:
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code in _RETRY_STATUS
+    return True
+
 
-    def generate(self, prompt: str) -> str:
-        response = requests.post(
-            OLLAMA_URL,
-            json={"model": self.model, "prompt": prompt, "stream": False}
-        )
-        response.raise_for_status()
-        return response.json()["response"].strip()
-
-    def embed(self, text: str):
-        url = OLLAMA_URL.replace("/api/generate", "/api/embeddings")
-        response = requests.post(
-            url,
-            json={"model": self.embedding_model, "prompt": text}
-        )
-        response.raise_for_status()
-        return response.json()["embedding"] 
\ No newline at end of file
+def _backoff(attempt: int) -> float:
+    """Exponential backoff with jitter."""
+    return OLLAMA_RETRY_BACKOFF * (2 ** attempt) * (0.5 + random.random())
@@ -1,10 +1,32 @@
+import asyncio
+import time
 from pydantic import BaseModel
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Tuple, AsyncIterator, Awaitable, Callable
 from agents.router_agent import RouterAgent
 from agents.matchmaker_agent import MatchmakerAgent
 from agents.moderator_agent import ModeratorAgent
+from agents.triage_agent import TriageAgent, TriageParseError
+from agents.response_cache import normalize_message
+from agents.feedback_store import FeedbackStore
+from agents import metrics, llm_scheduler, fast_path
+from agents.llm_scheduler import LLMUnavailable, LLM_REQUEST_DEADLINE_MS
 import os
 
+# Run the router and moderator at the same time instead of one after the other
+ORCHESTRATOR_PARALLEL = os.environ.get("ORCHESTRATOR_PARALLEL", "1") == "1"
+# Start matchmaking as soon as the router asks for it, before moderation has finished.
+# A non-allow moderation verdict cancels the speculative matchmaking.
+ORCHESTRATOR_SPECULATIVE_MATCHING = os.environ.get("ORCHESTRATOR_SPECULATIVE_MATCHING", "1") == "1"
+
+# 'split' sends separate router and moderator prompts, 'combined' asks for both in one
+# TriageAgent call and falls back to 'split' when the answer cannot be parsed
+ORCHESTRATOR_TRIAGE_MODE = os.environ.get("ORCHESTRATOR_TRIAGE_MODE", "split").lower()
+
+# Unique messages of one run_batch call processed at the same time
+ORCHESTRATOR_BATCH_CONCURRENCY = int(os.environ.get("ORCHESTRATOR_BATCH_CONCURRENCY", "8"))
+
+MATCHMAKING_LABELS = {"partnership_request", "service_request", "social_media_promotion"}
+
 # Human Escalation Agent
 class HumanEscalationAgent:
     def escalate(self, message: str, user_id: str) -> Dict:
@@ -19,8 +41,13 @@ class AgentInput(BaseModel):
     message: str
     user_id: str
     feedback: Optional[str] = None  # thumbs-up or thumbs-down
+    # Partners suggested in the earlier answer the feedback rates, as the client received them
+    match_ids: Optional[List[str]] = None
     metadata: Optional[Dict[str, Any]] = None
     history: Optional[List[Dict[str, Any]]] = None
+    # LLM calls still queued this long after the run started are dropped and answered by
+    # the agents' fallbacks (default LLM_REQUEST_DEADLINE_MS)
+    deadline_ms: Optional[float] = None
 
 class MatchInfo(BaseModel):
     id: str
@@ -43,37 +70,240 @@ class AgentOutput(BaseModel):
     source_agent_response: str
     agent_workflow: List[AgentStep]
     feedback: Optional[str] = None
+    timings: Optional[Dict[str, float]] = None  # milliseconds per agent step and "total"
+    # Per step and "total": ms, llm_calls, prompt_tokens, completion_tokens and cache_hits
+    metrics: Optional[Dict[str, Dict[str, float]]] = None
 
 class AgentOrchestrator:
-    def __init__(self, merchant_data_path: str):
+    def __init__(self, merchant_data_path: str, parallel: bool = ORCHESTRATOR_PARALLEL,
+                 speculative_matching: bool = ORCHESTRATOR_SPECULATIVE_MATCHING,
+                 triage_mode: str = ORCHESTRATOR_TRIAGE_MODE, matchmaker: Optional[MatchmakerAgent] = None,
+                 feedback_store: Optional[FeedbackStore] = None):
         self.router = RouterAgent()
-        self.matchmaker = MatchmakerAgent(merchant_data_path, os.environ.get("PGVECTOR_DSN"))
+        self.triage_agent = TriageAgent()
+        # An already built matchmaker can be shared instead of loading the merchant data again
+        self.matchmaker = matchmaker or MatchmakerAgent(merchant_data_path, os.environ.get("PGVECTOR_DSN"))
         self.moderator = ModeratorAgent()
         self.human_escalation = HumanEscalationAgent()
-        self.feedback_memory = []  # Store feedback for learning
+        self.feedback_memory = feedback_store or FeedbackStore()  # Store feedback for learning
+        self.parallel = parallel
+        self.speculative_matching = parallel and speculative_matching
+        self.triage_mode = triage_mode
+
+    async def _timed(self, name: str, timings: Dict[str, float], func, *args):
+        with metrics.step(name) as step:
+            try:
+                return await func(*args)
+            finally:
+                timings[name] = step.ms = step.elapsed_ms()
+
+    async def _triage(self, input: AgentInput, timings: Dict[str, float],
+                      on_route: Callable[[str], Awaitable[None]], triage: Optional[Tuple[str, dict]] = None):
+        """
+        Route and moderate the message, calling ``on_route`` as soon as the route is known.
+
+        Returns ``(classification, mod_result, match_task)``. In parallel mode both LLM
+        calls run concurrently and, when speculative matching is on, matchmaking starts
+        as soon as the router asks for it; it is cancelled if moderation does not allow
+        the message. In combined mode a single TriageAgent call answers both. A
+        ``triage`` answer already computed by run_batch is used as is.
+        """
+        if triage is not None:
+            classification, mod_result = triage
+            await on_route(classification)
+            return classification, dict(mod_result), None
+        if self.triage_mode == "combined":
+            try:
+                classification, mod_result = await self._timed(
+                    "TriageAgent", timings, self.triage_agent.triage, input.message)
+                await on_route(classification)
+                return classification, mod_result, None
+            except (TriageParseError, LLMUnavailable) as e:
+                print(f"Combined triage failed, falling back to router and moderator: {e}")
+
+        if not self.parallel:
+            classification = await self._timed("RouterAgent", timings, self.router.classify, input.message)
+            await on_route(classification)
+            mod_result = await self._timed("ModeratorAgent", timings, self.moderator.moderate, input.message)
+            return classification, mod_result, None
+
+        router_task = asyncio.create_task(
+            self._timed("RouterAgent", timings, self.router.classify, input.message))
+        moderator_task = asyncio.create_task(
+            self._timed("ModeratorAgent", timings, self.moderator.moderate, input.message))
+        match_task = None
+        try:
+            classification = await router_task
+            if self.speculative_matching and classification in MATCHMAKING_LABELS:
+                match_task = asyncio.create_task(self._timed(
+                    "MatchmakerAgent", timings, self.matchmaker.find_matches,
+                    input.user_id, input.message, self.feedback_memory))
+            await on_route(classification)
+            mod_result = await moderator_task
+        except BaseException:
+            for task in (router_task, moderator_task, match_task):
+                if task is not None:
+                    task.cancel()
+            raise
+
+        if match_task is not None and mod_result["action"] != "allow":
+            match_task.cancel()
+            await asyncio.gather(match_task, return_exceptions=True)
+            timings.pop("MatchmakerAgent", None)
+            trace = metrics.current_trace()
+            if trace is not None:
+                trace.pop("MatchmakerAgent", None)
+            match_task = None
+        return classification, mod_result, match_task
+
+    async def _find_matches(self, input: AgentInput, match_task, timings: Dict[str, float]):
+        if match_task is not None:
+            return await match_task
+        return await self._timed(
+            "MatchmakerAgent", timings, self.matchmaker.find_matches,
+            input.user_id, input.message, self.feedback_memory)
+
+    async def _record_feedback(self, input: AgentInput):
+        if input.feedback:
+            # The feedback arrives before this message's answer, so it rates an earlier one
+            await self.feedback_memory.append_async(input.user_id, input.message, input.feedback, input.match_ids,
+                                                    input.metadata, input.history)
+
+    async def run_batch(self, inputs: List[AgentInput], return_exceptions: bool = False) -> List[AgentOutput]:
+        """
+        Process many inputs and return one output per input, in the same order.
 
-    async def run(self, input: AgentInput) -> AgentOutput:
-        """Process the input through the agent workflow."""
+        Identical messages (after normalization) from the same user run once. All unique
+        messages are routed and moderated up front with batched TriageAgent prompts;
+        the ones the batch could not triage go through the usual router and moderator.
+        An input that fails does not stop the others: with ``return_exceptions`` its
+        exception takes its place in the result, otherwise the first one is raised once
+        every input has finished.
+        """
+        unique: Dict[tuple, AgentInput] = {}
+        for item in inputs:
+            unique.setdefault((item.user_id, normalize_message(item.message)), item)
+
+        # The batch triage and the runs repeat the same rule lookups, counted once per message
+        with fast_path.counting():
+            start = time.perf_counter()
+            # A single message gains nothing from a batch prompt and takes the usual path
+            with metrics.step("TriageBatch") as triage_metrics:
+                triaged = {} if len(unique) < 2 else \
+                    await self.triage_agent.triage_batch(item.message for item in unique.values())
+            triage_ms = round((time.perf_counter() - start) * 1000, 2)
+            semaphore = asyncio.Semaphore(ORCHESTRATOR_BATCH_CONCURRENCY)
+
+            async def run_one(item: AgentInput) -> AgentOutput:
+                triage = triaged.get(item.message)
+                async with semaphore:
+                    # Feedback is recorded below for every input, duplicates included
+                    output = await self.run(item.model_copy(update={"feedback": None}), triage)
+                if triage is not None:
+                    output.timings["TriageAgent"] = triage_ms
+                    # Shared by every item of the batch, so not part of the item's "total"
+                    output.metrics["TriageBatch"] = triage_metrics.as_dict()
+                return output
+
+            outputs = dict(zip(unique, await asyncio.gather(*(run_one(item) for item in unique.values()),
+                                                            return_exceptions=True)))
+        results = []
+        for item in inputs:
+            output = outputs[(item.user_id, normalize_message(item.message))]
+            if isinstance(output, BaseException):
+                if not return_exceptions or not isinstance(output, Exception):
+                    raise output
+                results.append(output)
+                continue
+            await self._record_feedback(item)
+            results.append(output.model_copy(update={"feedback": item.feedback}))
+        return results
+
+    async def run_stream(self, input: AgentInput) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Process the input and yield workflow events as they happen.
+
+        Each AgentStep is yielded as ``{"event": "step", "step": ..., "elapsed_ms": ...}``
+        as soon as it completes (the router label before moderation has finished), then
+        ``{"event": "done", "output": ...}`` whose timings add ``first_event``, the
+        milliseconds until the first step.
+        """
+        start = time.perf_counter()
+        queue: asyncio.Queue = asyncio.Queue()
+
+        async def on_step(step: AgentStep):
+            queue.put_nowait(step)
+
+        async def produce() -> AgentOutput:
+            try:
+                return await self.run(input, on_step=on_step)
+            finally:
+                queue.put_nowait(None)
+
+        task = asyncio.create_task(produce())
+        first_event = None
+        try:
+            while (step := await queue.get()) is not None:
+                elapsed = round((time.perf_counter() - start) * 1000, 2)
+                if first_event is None:
+                    first_event = elapsed
+                yield {"event": "step", "step": step.dict(), "elapsed_ms": elapsed}
+            output = await task
+            output.timings["first_event"] = first_event
+            yield {"event": "done", "output": output.dict()}
+        finally:
+            # A consumer that stops early (e.g. a closed socket) cancels the remaining work
+            if not task.done():
+                task.cancel()
+
+    async def run(self, input: AgentInput, triage: Optional[Tuple[str, dict]] = None,
+                  on_step: Optional[Callable[[AgentStep], Awaitable[None]]] = None) -> AgentOutput:
+        """Process the input through the agent workflow, passing each completed step to ``on_step``."""
+        with metrics.trace() as steps, llm_scheduler.deadline(input.deadline_ms or LLM_REQUEST_DEADLINE_MS), \
+                fast_path.counting():
+            with metrics.step("total") as total:
+                output = await self._run(input, triage, on_step)
+                total.ms = output.timings["total"]
+                for name in metrics.COUNTERS:
+                    setattr(total, name, sum(getattr(step, name) for step in steps.values()))
+        output.metrics = {name: step.as_dict() for name, step in steps.items()}
+        return output
+
+    async def _run(self, input: AgentInput, triage: Optional[Tuple[str, dict]],
+                   on_step: Optional[Callable[[AgentStep], Awaitable[None]]]) -> AgentOutput:
         workflow = []
         response = ""
         source_agent_response = ""
         classification = None
+        timings = {}
+        start = time.perf_counter()
+
+        async def add_step(step: AgentStep):
+            workflow.append(step)
+            if on_step is not None:
+                await on_step(step)
+
+        async def on_route(classification: str):
+            await add_step(AgentStep(agent_name="RouterAgent", classification=classification))
         
-        # Step 1: Route the message
-        classification = self.router.classify(input.message)
-        workflow.append(AgentStep(agent_name="RouterAgent", classification=classification))
+        # Step 1 and 2: Route the message and check for moderation needs
+        classification, mod_result, match_task = await self._triage(input, timings, on_route, triage)
+
+        # The moderator could not reach the LLM and let the message through unchecked
+        if mod_result.get("unverified"):
+            await add_step(AgentStep(agent_name="ModeratorAgent",
+                                     moderation_action=mod_result["action"],
+                                     moderation_reason=mod_result["reason"]))
         
-        # Step 2: Check for moderation needs
-        mod_result = self.moderator.moderate(input.message)
         if mod_result["action"] != "allow":
-            workflow.append(AgentStep(agent_name="ModeratorAgent", 
+            await add_step(AgentStep(agent_name="ModeratorAgent", 
                                    moderation_action=mod_result["action"],
                                    moderation_reason=mod_result["reason"]))
             
             if mod_result["action"] == "escalate":
                 # Escalate to human
                 escalation = self.human_escalation.escalate(input.message, input.user_id)
-                workflow.append(AgentStep(
+                await add_step(AgentStep(
                     agent_name="HumanEscalationAgent",
                     escalation_action=escalation["action"],
                     escalation_reason=escalation["reason"],
@@ -89,9 +319,9 @@ class AgentOrchestrator:
                 source_agent_response = "Mensagem permitida."
         # Step 3: Partnership request if needed
         elif classification == "partnership_request":
-            matches = await self.matchmaker.find_matches(input.user_id, input.message, self.feedback_memory)
+            matches = await self._find_matches(input, match_task, timings)
             if matches:
-                workflow.append(AgentStep(agent_name="MatchmakerAgent", matches=matches))
+                await add_step(AgentStep(agent_name="MatchmakerAgent", matches=matches))
                 # Format the matches with their details
                 match_descriptions = []
                 for match in matches:
@@ -107,7 +337,7 @@ class AgentOrchestrator:
                 match_ids = [m.get('id', '') for m in matches]
                 source_agent_response = f"Suggested partner connections: {', '.join(match_ids)}"
             else:
-                workflow.append(AgentStep(agent_name="MatchmakerAgent", matches=[]))
+                await add_step(AgentStep(agent_name="MatchmakerAgent", matches=[]))
                 response = "No momento não encontrei parceiros disponíveis, mas posso te avisar quando surgir alguém."
                 source_agent_response = "No suggestions."
         # Step 4: Handle service requests (including social media promotion)
@@ -125,10 +355,10 @@ class AgentOrchestrator:
                 base_response = ""
                 
             # Use matchmaker to find relevant connections for any service request
-            matches = await self.matchmaker.find_matches(input.user_id, input.message, self.feedback_memory)
+            matches = await self._find_matches(input, match_task, timings)
             
             if matches:
-                workflow.append(AgentStep(agent_name="MatchmakerAgent", matches=matches))
+                await add_step(AgentStep(agent_name="MatchmakerAgent", matches=matches))
                 match_list = "\n".join([
                     f"- {m.get('name', 'Alguém')} ({m.get('city', '')}): {m.get('message', '')}"
                     for m in matches[:3]  # Show top 3 matches
@@ -141,7 +371,7 @@ class AgentOrchestrator:
                 )
                 source_agent_response = f"Found {len(matches)} potential service providers"
             else:
-                workflow.append(AgentStep(agent_name="MatchmakerAgent", matches=[]))
+                await add_step(AgentStep(agent_name="MatchmakerAgent", matches=[]))
                 response = (
                     f"{base_response}"
                     "No momento não encontrei parceiros disponíveis, mas posso te avisar quando surgir alguém. "
@@ -152,7 +382,7 @@ class AgentOrchestrator:
         else:
             # Escalate to human if fallback
             escalation = self.human_escalation.escalate(input.message, input.user_id)
-            workflow.append(AgentStep(
+            await add_step(AgentStep(
                 agent_name="HumanEscalationAgent",
                 escalation_action=escalation["action"],
                 escalation_reason=escalation["reason"],
@@ -161,17 +391,12 @@ class AgentOrchestrator:
             response = "Sorry, your request was escalated to a human operator."
             source_agent_response = escalation["reason"]
         # Feedback loop: store feedback
-        if input.feedback:
-            self.feedback_memory.append({
-                "user_id": input.user_id,
-                "message": input.message,
-                "feedback": input.feedback,
-                "metadata": input.metadata,
-                "history": input.history
-            })
+        await self._record_feedback(input)
+        timings["total"] = round((time.perf_counter() - start) * 1000, 2)
         return AgentOutput(
             response=response,
             source_agent_response=source_agent_response,
             agent_workflow=workflow,
-            feedback=input.feedback
+            feedback=input.feedback,
+            timings=timings
         ) 
\ No newline at end of file
@@ -0,0 +1,96 @@
+import json
+import os
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from agents.response_cache import normalize_message
+
+# SQLite file written by bulk_matchmaking.py; when set, find_matches answers from it first
+PRECOMPUTED_MATCHES_PATH = os.environ.get("PRECOMPUTED_MATCHES_PATH", "")
+
+
+class PrecomputedMatches:
+    """
+    Partner suggestions computed offline, keyed by (user_id, normalized message).
+
+    The same SQLite file holds the bulk job's checkpoint: ``bulk_meta`` describes the
+    run (the CSV fingerprint among others) and ``bulk_chunks`` lists the finished
+    chunks, whose rows are committed in the same transaction as the chunk itself.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS bulk_meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS bulk_chunks (chunk INTEGER PRIMARY KEY, rows INTEGER NOT NULL);
+            CREATE TABLE IF NOT EXISTS precomputed_matches (
+                user_id TEXT NOT NULL,
+                message_key TEXT NOT NULL,
+                message TEXT NOT NULL,
+                matches TEXT NOT NULL,
+                PRIMARY KEY (user_id, message_key)
+            );
+        """)
+        self.conn.commit()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def open(cls, path: str, fingerprint: str) -> Optional["PrecomputedMatches"]:
+        """The results at ``path`` if they were computed from the CSV with ``fingerprint``, else None."""
+        if not path or not os.path.exists(path):
+            return None
+        try:
+            matches = cls(path)
+            meta = matches.meta()
+        except sqlite3.Error as e:
+            print(f"Ignoring unreadable precomputed matches {path}: {e}")
+            return None
+        if meta.get("fingerprint") != fingerprint:
+            print(f"Ignoring precomputed matches {path}: computed from a different merchant file")
+            return None
+        return matches
+
+    def meta(self) -> Dict[str, str]:
+        return dict(self.conn.execute("SELECT key, value FROM bulk_meta").fetchall())
+
+    def reset(self, meta: Dict[str, str]):
+        """Drop every result and checkpoint and start a run described by ``meta``."""
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM precomputed_matches")
+            self.conn.execute("DELETE FROM bulk_chunks")
+            self.conn.execute("DELETE FROM bulk_meta")
+            self.conn.executemany("INSERT INTO bulk_meta VALUES (?, ?)", list(meta.items()))
+
+    def done_chunks(self) -> set:
+        return {chunk for chunk, in self.conn.execute("SELECT chunk FROM bulk_chunks")}
+
+    def write_chunk(self, chunk: int, results: Iterable[Tuple[str, str, List[Dict]]]):
+        """Store one chunk's ``(user_id, message, matches)`` results and mark it done, atomically."""
+        rows = [(user_id, normalize_message(message), message, json.dumps(matches, ensure_ascii=False))
+                for user_id, message, matches in results]
+        with self._lock, self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO precomputed_matches VALUES (?, ?, ?, ?)", rows)
+            self.conn.execute("INSERT OR REPLACE INTO bulk_chunks VALUES (?, ?)", (chunk, len(rows)))
+
+    def get(self, user_id: str, message: str) -> Optional[List[Dict]]:
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT matches FROM precomputed_matches WHERE user_id = ? AND message_key = ?",
+                (user_id, normalize_message(message)),
+            ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(row[0])
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM precomputed_matches").fetchone()[0]
+
+    def stats(self) -> Dict:
+        return {"path": self.path, "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,143 @@
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+
+# Profile fields besides the id and the messages
+RECORD_FIELDS = ("city", "mcc_code", "mcc_description")
+
+
+def _categorical(df: pd.DataFrame, name: str, rows: np.ndarray):
+    """Integer codes and labels of a low-cardinality column at ``rows`` (missing values become "")."""
+    if name not in df:
+        return np.zeros(len(rows), dtype=np.int32), np.array([""], dtype=str)
+    codes, labels = pd.factorize(df[name].iloc[rows].fillna("").astype(str))
+    return codes.astype(np.int32), np.asarray(labels, dtype=str)
+
+
+class MerchantProfileStore:
+    """
+    One record per merchant, indexed by merchant id.
+
+    The CSV has one row per message, so profile fields come from a merchant's first
+    row and its messages are kept grouped in CSR form (merchant -> message rows).
+    ``rows`` maps every grouped message back to its position in the CSV, which is
+    how the matchmaker addresses the feature store. City and MCC are stored as
+    integer codes into small label arrays, and message texts as one UTF-8 buffer
+    with offsets, so a million rows take a fraction of the DataFrame's memory.
+
+    Merchants changed after the build are kept as plain records in ``updated`` and
+    take precedence over the packed arrays; deleted merchants leave the index.
+    """
+
+    def __init__(self, merchant_id, city_code, cities, mcc_code, mcc_codes, description_code, mcc_descriptions,
+                 indptr, rows, message_offsets, message_data):
+        self.merchant_id = merchant_id
+        self.city_code = city_code
+        self.cities = cities
+        self.mcc_code = mcc_code
+        self.mcc_codes = mcc_codes
+        self.description_code = description_code
+        self.mcc_descriptions = mcc_descriptions
+        self.indptr = indptr
+        self.rows = rows
+        self.message_offsets = message_offsets
+        self.message_data = message_data
+        self.index: Dict[str, int] = {m: i for i, m in enumerate(merchant_id.tolist())}
+        self.updated: Dict[int, Dict] = {}
+        self.next_position = len(merchant_id)
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, merchant_id: str) -> bool:
+        return merchant_id in self.index
+
+    @classmethod
+    def build(cls, df: pd.DataFrame) -> "MerchantProfileStore":
+        codes, merchant_id = pd.factorize(df['merchant_id'].astype(str))
+        order = np.argsort(codes, kind="stable")
+        indptr = np.zeros(len(merchant_id) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(codes, minlength=len(merchant_id)), out=indptr[1:])
+        first = order[indptr[:-1]]
+        city_code, cities = _categorical(df, 'city', first)
+        mcc_code, mcc_codes = _categorical(df, 'mcc_code', first)
+        description_code, mcc_descriptions = _categorical(df, 'mcc_description', first)
+
+        encoded = [str(m).encode("utf-8") for m in df['message'].to_numpy()[order]]
+        message_offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(m) for m in encoded], out=message_offsets[1:])
+        return cls(
+            merchant_id=np.asarray(merchant_id, dtype=str),
+            city_code=city_code,
+            cities=cities,
+            mcc_code=mcc_code,
+            mcc_codes=mcc_codes,
+            description_code=description_code,
+            mcc_descriptions=mcc_descriptions,
+            indptr=indptr,
+            rows=order.astype(np.int64),
+            message_offsets=message_offsets,
+            message_data=b"".join(encoded),
+        )
+
+    def get(self, merchant_id: str) -> Optional[Dict]:
+        i = self.index.get(merchant_id)
+        if i is None:
+            return None
+        if i in self.updated:
+            record = self.updated[i]
+            return {"merchant_id": merchant_id, **{k: record[k] for k in RECORD_FIELDS},
+                    "messages": list(record["messages"])}
+        return {
+            "merchant_id": merchant_id,
+            "city": str(self.cities[self.city_code[i]]),
+            "mcc_code": str(self.mcc_codes[self.mcc_code[i]]),
+            "mcc_description": str(self.mcc_descriptions[self.description_code[i]]),
+            "messages": self.messages(i),
+        }
+
+    def messages(self, i: int) -> List[str]:
+        """Message texts of the merchant at position ``i``."""
+        offsets = self.message_offsets[self.indptr[i]:self.indptr[i + 1] + 1].tolist()
+        return [self.message_data[a:b].decode("utf-8") for a, b in zip(offsets, offsets[1:])]
+
+    def name(self, merchant_id: str) -> str:
+        """Display name of a merchant (its MCC description), or the id itself when unknown."""
+        i = self.index.get(merchant_id)
+        if i in self.updated:
+            return self.updated[i]["mcc_description"] or merchant_id
+        if i is None or not self.mcc_descriptions[self.description_code[i]]:
+            return merchant_id
+        return str(self.mcc_descriptions[self.description_code[i]])
+
+    def rows_of(self, merchant_id: str) -> np.ndarray:
+        """CSV row positions of a merchant's messages (empty when unknown)."""
+        i = self.index.get(merchant_id)
+        if i is None:
+            return self.rows[:0]
+        if i in self.updated:
+            return self.updated[i]["rows"]
+        return self.rows[self.indptr[i]:self.indptr[i + 1]]
+
+    def rows_for(self, merchant_ids: Iterable[str]) -> np.ndarray:
+        """CSV row positions of the messages of several merchants."""
+        rows = [self.rows_of(m) for m in merchant_ids if m in self.index]
+        if not rows:
+            return self.rows[:0]
+        return np.concatenate(rows)
+
+    def upsert(self, merchant_id: str, record: Dict, rows: Iterable[int]):
+        """Replace (or add) a merchant; ``rows`` are the feature store rows of its messages, in order."""
+        i = self.index.get(merchant_id)
+        if i is None:
+            i = self.index[merchant_id] = self.next_position
+            self.next_position += 1
+        self.updated[i] = {**{k: str(record.get(k) or "") for k in RECORD_FIELDS},
+                           "messages": [str(m) for m in record["messages"]],
+                           "rows": np.asarray(list(rows), dtype=np.int64)}
+
+    def delete(self, merchant_id: str):
+        i = self.index.pop(merchant_id, None)
+        self.updated.pop(i, None)
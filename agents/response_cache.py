@@ -0,0 +1,135 @@
+import asyncio
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+import numpy as np
+
+from agents import metrics
+
+RESPONSE_CACHE_TTL = float(os.environ.get("RESPONSE_CACHE_TTL", "3600"))
+# Maximum cached answers; 0 disables the cache
+RESPONSE_CACHE_SIZE = int(os.environ.get("RESPONSE_CACHE_SIZE", "5000"))
+# Cosine similarity above which a near-duplicate message reuses a cached answer; 0 disables the lookup
+RESPONSE_CACHE_SIMILARITY = float(os.environ.get("RESPONSE_CACHE_SIMILARITY", "0"))
+
+
+def prompt_version(*prompts: str) -> str:
+    """Short hash of the system prompt(s); part of every key, so editing a prompt invalidates its entries."""
+    return hashlib.sha256("\0".join(prompts).encode("utf-8")).hexdigest()[:12]
+
+
+def normalize_message(message: str) -> str:
+    return " ".join(str(message).lower().split())
+
+
+def _default_embed(text: str) -> np.ndarray:
+    from agents.vector_backends import get_embedding
+    return get_embedding(text)
+
+
+class ResponseCache:
+    """
+    TTL + LRU cache of LLM answers keyed by (agent, prompt version, model, normalized message).
+
+    With a similarity threshold, an exact miss falls back to the most similar cached
+    message of the same agent/prompt/model, so near-duplicate phrasings also hit.
+    """
+
+    def __init__(self, ttl: float = RESPONSE_CACHE_TTL, max_entries: int = RESPONSE_CACHE_SIZE,
+                 similarity_threshold: float = RESPONSE_CACHE_SIMILARITY,
+                 embed: Callable[[str], np.ndarray] = _default_embed):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.similarity_threshold = similarity_threshold
+        self.embed = embed
+        # key -> (value, expires_at, compute_seconds, unit embedding or None)
+        self.entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.latency_saved = 0.0
+
+    async def get(self, agent: str, version: str, model: str, message: str) -> Tuple[bool, Any]:
+        """``(True, answer)`` for a cached message, ``(False, None)`` on a miss."""
+        key = (agent, version, model, normalize_message(message))
+        entry = self._get(key)
+        if entry is None and self.similarity_threshold > 0:
+            entry = self._similar(key[:3], await self._embed(key[3]))
+            if entry is not None:
+                self.semantic_hits += 1
+        if entry is None:
+            self.misses += 1
+            return False, None
+        self.hits += 1
+        self.latency_saved += entry[2]
+        metrics.record_cache_hit()
+        return True, entry[0]
+
+    async def set(self, agent: str, version: str, model: str, message: str, value: Any,
+                  compute_seconds: float = 0.0):
+        """Cache an answer; ``compute_seconds`` is what a later hit is credited as saving."""
+        key = (agent, version, model, normalize_message(message))
+        embedding = await self._embed(key[3]) if self.similarity_threshold > 0 else None
+        self.entries[key] = (value, time.monotonic() + self.ttl, compute_seconds, embedding)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    async def get_or_compute(self, agent: str, version: str, model: str, message: str,
+                             compute: Callable[[], Awaitable[Any]]) -> Any:
+        """Cached answer for the message, or ``await compute()`` and cache it. Exceptions are not cached."""
+        found, value = await self.get(agent, version, model, message)
+        if found:
+            return value
+        start = time.perf_counter()
+        value = await compute()
+        await self.set(agent, version, model, message, value, time.perf_counter() - start)
+        return value
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "latency_saved_ms": round(self.latency_saved * 1000, 1),
+            "entries": len(self.entries),
+        }
+
+    def _get(self, key: tuple):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry[1] < time.monotonic():
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return entry
+
+    def _similar(self, namespace: tuple, embedding: np.ndarray):
+        now = time.monotonic()
+        best, best_score = None, self.similarity_threshold
+        for key, entry in self.entries.items():
+            if key[:3] != namespace or entry[3] is None or entry[1] < now:
+                continue
+            score = float(np.dot(entry[3], embedding))
+            if score >= best_score:
+                best, best_score = key, score
+        return self._get(best) if best is not None else None
+
+    async def _embed(self, text: str) -> np.ndarray:
+        # get_embedding is itself backed by the embedding cache, so re-embedding a text is cheap
+        vector = np.asarray(await asyncio.to_thread(self.embed, text), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+
+# Shared by the router, moderator and matchmaker
+response_cache = ResponseCache()
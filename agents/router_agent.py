@@ -1,4 +1,16 @@
-from agents.ollama_client import OllamaClient
+import os
+from typing import Optional
+from agents.ollama_client import OllamaClient, DEFAULT_MODEL
+from agents.fast_path import fast_route, rule_route, log_llm_label
+from agents.response_cache import response_cache, prompt_version
+from agents.llm_scheduler import LLMUnavailable
+from agents.model_cascade import ModelCascade, OLLAMA_FAST_MODEL
+
+# Router model and the smaller one asked first (see model_cascade.py)
+ROUTER_MODEL = os.environ.get("ROUTER_MODEL", DEFAULT_MODEL)
+ROUTER_FAST_MODEL = os.environ.get("ROUTER_FAST_MODEL", OLLAMA_FAST_MODEL)
+
+LABELS = ["partnership_request", "social_media_promotion", "service_request", "moderation", "fallback"]
 
 SYSTEM_PROMPT = """
 You are a conversation router for a merchant social network. Classify merchant messages into one of these categories:
@@ -17,15 +29,42 @@ Examples:
 
 Respond with only the classification label in lowercase.
 """
+PROMPT_VERSION = prompt_version(SYSTEM_PROMPT)
+
+# A greedy answer of a few tokens, constrained to one of LABELS (a JSON string)
+GENERATION_OPTIONS = {"temperature": 0, "num_predict": 12, "stop": ["\n"]}
+OUTPUT_FORMAT = {"type": "string", "enum": LABELS}
+
+
+def parse_label(result: str) -> Optional[str]:
+    """The routing label the answer starts with, or None when it is not one of LABELS."""
+    words = result.strip().split()
+    label = words[0].strip("'\"`*.,:;").lower() if words else ""
+    return label if label in LABELS else None
 
 class RouterAgent:
     """
     Classifies merchant messages and determines which agent should handle them.
     """
-    def __init__(self):
-        self.llm = OllamaClient()
+    def __init__(self, model: str = ROUTER_MODEL, fast_model: str = ROUTER_FAST_MODEL):
+        self.llm = OllamaClient(model, priority="routing")
+        self.cascade = ModelCascade("router", self.llm, fast_model)
+
+    async def classify(self, message: str) -> str:
+        label = fast_route(message)
+        if label:
+            return label
+        try:
+            return await response_cache.get_or_compute(
+                "router", PROMPT_VERSION, self.cascade.cache_key, message, lambda: self._classify_llm(message))
+        except LLMUnavailable as e:
+            # The LLM is overloaded: the rules decide and the answer is not cached
+            print(f"Router falling back to rules: {e}")
+            return rule_route(message)
 
-    def classify(self, message: str) -> str:
+    async def _classify_llm(self, message: str) -> str:
         prompt = f"{SYSTEM_PROMPT}\nMessage: {message}\nClassification:"
-        result = self.llm.generate(prompt)
-        return result.strip().split()[0].lower()  # Always return the first word as label 
\ No newline at end of file
+        label, _ = await self.cascade.classify(prompt, parse_label, GENERATION_OPTIONS, OUTPUT_FORMAT)
+        label = label or "fallback"  # an answer that is not a known label escalates
+        log_llm_label("router", message, label)
+        return label 
\ No newline at end of file
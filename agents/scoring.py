@@ -0,0 +1,59 @@
+import numpy as np
+
+from agents.feature_store import MerchantFeatureStore
+
+# Score contributions, see MatchmakerAgent.find_matches
+MARKETING_BONUS = 10
+CITY_BONUS = 3
+KEYWORD_WEIGHT = 2
+REQUEST_OFFER_BONUS = 5
+
+MIN_MATCH_SCORE = 5
+TOP_K = 5
+
+
+def score_rows(store: MerchantFeatureStore, user_city: str, query_token_ids: np.ndarray,
+               is_request: bool, marketing: np.ndarray = None, rows: np.ndarray = None):
+    """
+    Score every row of the store against one query at once.
+
+    Returns ``(scores, city_match)``. ``marketing`` is a per-row boolean mask of
+    candidates that earn the marketing bonus (None when the query itself is not
+    marketing-related). With ``rows``, only those rows are scored and the returned
+    arrays (and ``marketing``) are aligned with ``rows`` instead of the whole store.
+    """
+    city = store.city if rows is None else store.city[rows]
+    city_match = city == user_city
+    scores = CITY_BONUS * city_match.astype(np.int64)
+    if rows is None:
+        # Sparse token incidence (stored as inverted lists) times the query's token indicator vector
+        scores += KEYWORD_WEIGHT * store.keyword_overlap(query_token_ids)
+    else:
+        scores += KEYWORD_WEIGHT * store.keyword_overlap_rows(query_token_ids, rows)
+    if is_request:
+        scores += REQUEST_OFFER_BONUS * (store.is_offer if rows is None else store.is_offer[rows])
+    if marketing is not None:
+        scores += MARKETING_BONUS * marketing
+    return scores, city_match
+
+
+def top_k_rows(scores: np.ndarray, city_match: np.ndarray, candidates: np.ndarray,
+               k: int = TOP_K, min_score: int = MIN_MATCH_SCORE) -> np.ndarray:
+    """
+    Positions of the best ``k`` candidate rows, best first.
+
+    Ranking is by score, then same-city first, then original row order, which is
+    exactly what a stable sort of the row-ordered matches produced before.
+    """
+    eligible = candidates[scores[candidates] >= min_score]
+    if len(eligible) == 0:
+        return eligible
+
+    n = len(scores)
+    top_score = int(scores[eligible].max())
+    # Single integer key: lower is better, unique per row
+    keys = ((top_score - scores[eligible]) * 2 + (~city_match[eligible])) * n + eligible
+    if len(eligible) > k:
+        part = np.argpartition(keys, k - 1)[:k]
+        eligible, keys = eligible[part], keys[part]
+    return eligible[np.argsort(keys)]
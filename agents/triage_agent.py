@@ -0,0 +1,186 @@
+import asyncio
+import json
+import os
+import re
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+from agents.ollama_client import OllamaClient, DEFAULT_MODEL
+from agents.router_agent import LABELS
+from agents.fast_path import fast_route, fast_moderate
+from agents.response_cache import response_cache, prompt_version
+from agents.model_cascade import ModelCascade, OLLAMA_FAST_MODEL
+
+# Messages per numbered batch triage prompt and how many of those prompts run at once
+TRIAGE_BATCH_SIZE = int(os.environ.get("TRIAGE_BATCH_SIZE", "10"))
+TRIAGE_MAX_CONCURRENCY = int(os.environ.get("TRIAGE_MAX_CONCURRENCY", "4"))
+# Triage model and the smaller one asked first for single messages (see model_cascade.py)
+TRIAGE_MODEL = os.environ.get("TRIAGE_MODEL", DEFAULT_MODEL)
+TRIAGE_FAST_MODEL = os.environ.get("TRIAGE_FAST_MODEL", OLLAMA_FAST_MODEL)
+
+TRIAGE_RULES = """
+You are the triage step of a merchant social network. For each merchant message decide both its route and its moderation verdict.
+
+Routes:
+- 'partnership_request': business partnerships, collaborations, suppliers or joint ventures
+- 'social_media_promotion': help with social media marketing, Instagram, Facebook or other platform promotion
+- 'service_request': other requests for services, help, or information
+- 'moderation': inappropriate, abusive, or spam content
+- 'fallback': only if the message fits no other route
+
+Moderation:
+- 'flag' for clear spam, scams, or abuse
+- 'warn' for very short or unclear messages that need more context
+- 'allow' for everything else, especially legitimate business discussions
+
+Examples:
+- "preciso de ajuda com divulgação no insta" -> {"route": "social_media_promotion", "moderation": "allow", "reason": ""}
+- "preciso de um fornecedor" -> {"route": "partnership_request", "moderation": "allow", "reason": ""}
+- "como faço para vender mais?" -> {"route": "service_request", "moderation": "allow", "reason": ""}
+- "compre agora! oferta por tempo limitado!" -> {"route": "moderation", "moderation": "flag", "reason": "spam"}
+- "oi" -> {"route": "fallback", "moderation": "warn", "reason": "message too short"}
+"""
+
+SYSTEM_PROMPT = TRIAGE_RULES + """
+Respond with only one JSON object with the keys "route", "moderation" and "reason".
+"""
+
+BATCH_PROMPT = TRIAGE_RULES + """
+The messages below are numbered. Respond with one line per message in the format
+'<number>: <JSON object>', where each JSON object has the keys "route", "moderation" and "reason".
+"""
+# Batch answers are cached per message under this version
+BATCH_PROMPT_VERSION = prompt_version(BATCH_PROMPT)
+
+MODERATION_ACTIONS = ["allow", "warn", "flag"]
+DEFAULT_REASONS = {"flag": "inappropriate or abusive content", "warn": "message too short"}
+
+# Greedy answers; a single triage must be a JSON object with a known route and action, and
+# batch answers get enough tokens for one line per message
+GENERATION_OPTIONS = {"temperature": 0, "num_predict": 64}
+BATCH_TOKENS_PER_MESSAGE = 48
+OUTPUT_FORMAT = {
+    "type": "object",
+    "properties": {
+        "route": {"type": "string", "enum": LABELS},
+        "moderation": {"type": "string", "enum": MODERATION_ACTIONS},
+        "reason": {"type": "string"},
+    },
+    "required": ["route", "moderation", "reason"],
+}
+
+_JSON_DECODER = json.JSONDecoder()
+_BATCH_LINE_RE = re.compile(r"^\s*(\d+)\s*[:.)\-]\s*(\{.*\})\s*$", re.MULTILINE)
+
+
+class TriageParseError(ValueError):
+    """The combined triage answer was not a valid route and moderation verdict."""
+
+
+def parse_triage(result: str):
+    """Strictly parse a triage answer into ``(route, mod_result)``."""
+    start = result.find("{")
+    if start < 0:
+        raise TriageParseError(f"no JSON object in triage answer: {result!r}")
+    try:
+        # raw_decode reads exactly one object, braces inside its strings included
+        data, _ = _JSON_DECODER.raw_decode(result, start)
+    except json.JSONDecodeError as e:
+        raise TriageParseError(f"invalid JSON in triage answer: {result!r}") from e
+    if not isinstance(data, dict):
+        raise TriageParseError(f"no JSON object in triage answer: {result!r}")
+
+    route = str(data.get("route", "")).strip().lower()
+    action = str(data.get("moderation", "")).strip().lower()
+    if route not in LABELS:
+        raise TriageParseError(f"unknown route {route!r}")
+    if action not in MODERATION_ACTIONS:
+        raise TriageParseError(f"unknown moderation action {action!r}")
+
+    if action == "allow":
+        return route, {"action": "allow"}
+    reason = str(data.get("reason") or "").strip().lower() or DEFAULT_REASONS[action]
+    return route, {"action": action, "reason": reason}
+
+
+def _try_parse_triage(result: str) -> Optional[Tuple[str, dict]]:
+    try:
+        return parse_triage(result)
+    except TriageParseError:
+        return None
+
+
+class TriageAgent:
+    """
+    Routes and moderates a message with a single LLM call.
+    """
+    def __init__(self, model: str = TRIAGE_MODEL, fast_model: str = TRIAGE_FAST_MODEL):
+        self.llm = OllamaClient(model, priority="moderation")
+        self.cascade = ModelCascade("triage", self.llm, fast_model)
+
+    async def triage(self, message: str):
+        """Return ``(classification, mod_result)``; raises TriageParseError on malformed output."""
+        classification, mod_result = fast_route(message), fast_moderate(message)
+        if classification and mod_result:
+            return classification, mod_result
+        prompt = f"{SYSTEM_PROMPT}\nMessage: {message}\nTriage:"
+        triage, result = await self.cascade.classify(prompt, _try_parse_triage, GENERATION_OPTIONS, OUTPUT_FORMAT)
+        return triage if triage is not None else parse_triage(result)
+
+    async def triage_batch(self, messages: Iterable[str]) -> Dict[str, Tuple[str, dict]]:
+        """
+        Triage many messages with numbered prompts of TRIAGE_BATCH_SIZE messages each.
+
+        Returns ``{message: (classification, mod_result)}``. Duplicates are triaged once
+        and cached answers are reused. Messages whose line is missing or does not parse
+        are left out, so the caller can triage them one by one.
+        """
+        results = {}
+        pending = []
+        for message in dict.fromkeys(str(m) for m in messages):
+            classification, mod_result = fast_route(message), fast_moderate(message)
+            if classification and mod_result:
+                results[message] = (classification, mod_result)
+                continue
+            found, cached = await response_cache.get("triage", BATCH_PROMPT_VERSION, self.llm.model, message)
+            if found:
+                results[message] = cached
+            else:
+                pending.append(message)
+
+        semaphore = asyncio.Semaphore(TRIAGE_MAX_CONCURRENCY)
+        chunks = [pending[i:i + TRIAGE_BATCH_SIZE] for i in range(0, len(pending), TRIAGE_BATCH_SIZE)]
+
+        async def run_chunk(chunk):
+            async with semaphore:
+                start = time.perf_counter()
+                chunk_results = await self._triage_chunk(chunk)
+                elapsed = (time.perf_counter() - start) / len(chunk)
+            for message, result in chunk_results.items():
+                await response_cache.set("triage", BATCH_PROMPT_VERSION, self.llm.model, message, result, elapsed)
+            return chunk_results
+
+        for chunk_results in await asyncio.gather(*(run_chunk(c) for c in chunks)):
+            results.update(chunk_results)
+        return results
+
+    async def _triage_chunk(self, messages: List[str]) -> Dict[str, Tuple[str, dict]]:
+        """Triage a chunk of messages with a single numbered prompt."""
+        numbered = "\n".join(f"{i}. {' '.join(m.split())}" for i, m in enumerate(messages, start=1))
+        prompt = f"{BATCH_PROMPT}\n{numbered}\n\nTriages:"
+        options = {**GENERATION_OPTIONS, "num_predict": BATCH_TOKENS_PER_MESSAGE * len(messages)}
+        try:
+            response = await self.llm.generate(prompt, options=options)
+        except Exception as e:
+            print(f"Error in LLM batch triage: {e}")
+            return {}
+
+        results = {}
+        for number, answer in _BATCH_LINE_RE.findall(response):
+            index = int(number) - 1
+            if not 0 <= index < len(messages):
+                continue
+            try:
+                results[messages[index]] = parse_triage(answer)
+            except TriageParseError as e:
+                print(f"Ignoring batch triage line {number}: {e}")
+        return results
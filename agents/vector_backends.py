@@ -1,44 +1,351 @@
+import contextlib
+import os
+import threading
+from abc import ABC, abstractmethod
 import numpy as np
-from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
 
 from agents.ollama_client import OllamaClient
+from agents.embedding_cache import EmbeddingCache
+
+# Texts per /api/embed request and how many of those requests may be in flight during bulk ingestion
+EMBEDDING_BATCH_SIZE = int(os.environ.get("EMBEDDING_BATCH_SIZE", "64"))
+EMBEDDING_MAX_CONCURRENCY = int(os.environ.get("EMBEDDING_MAX_CONCURRENCY", "4"))
 
 # Simple embedding function (replace with real model in production)
 ollama_client = OllamaClient()
+# Shared by FAISS, ChromaDB and pgvector ingestion as well as query-time embedding
+embedding_cache = EmbeddingCache()
 
 def get_embedding(text: str) -> np.ndarray:
-    return np.array(ollama_client.embed(text))
+    return embedding_cache.get_or_compute(
+        ollama_client.embedding_model, [text], lambda texts: [ollama_client.embed_sync(texts[0])]
+    )[0]
 
-# FAISS integration
-import faiss
+def get_embeddings(texts: List[str]) -> np.ndarray:
+    """Embed many texts as a stacked float32 matrix, requesting only texts missing from the cache."""
+    return embedding_cache.get_or_compute(ollama_client.embedding_model, texts, _embed_uncached)
 
-class FaissIndex:
-    def __init__(self, dim=384):
-        self.index = faiss.IndexFlatL2(dim)
-        self.vectors = []
-        self.ids = []  # Store merchant_ids
-    def add(self, merchant_id: str, text: str):
-        emb = get_embedding(text).astype('float32')
-        self.index.add(emb.reshape(1, -1))
-        self.vectors.append(emb)
-        self.ids.append(merchant_id)
+def _embed_uncached(texts: List[str]) -> List[List[float]]:
+    """Batched /api/embed requests with at most EMBEDDING_MAX_CONCURRENCY in flight."""
+    batches = [texts[i:i + EMBEDDING_BATCH_SIZE] for i in range(0, len(texts), EMBEDDING_BATCH_SIZE)]
+    with ThreadPoolExecutor(max_workers=EMBEDDING_MAX_CONCURRENCY) as pool:
+        return [e for batch in pool.map(ollama_client.embed_batch_sync, batches) for e in batch]
+
+# FAISS index structure: flat (exact), ivf, hnsw, pq or ivfpq (approximate, for large catalogs)
+FAISS_INDEX_TYPES = ("flat", "ivf", "hnsw", "pq", "ivfpq")
+FAISS_INDEX_TYPE = os.environ.get("FAISS_INDEX_TYPE", "flat").lower()
+# IVF lists (capped at one per 39 vectors) and how many are probed per query
+FAISS_NLIST = int(os.environ.get("FAISS_NLIST", "1024"))
+FAISS_NPROBE = int(os.environ.get("FAISS_NPROBE", "16"))
+# HNSW neighbours per node and query-time candidate list size
+FAISS_HNSW_M = int(os.environ.get("FAISS_HNSW_M", "32"))
+FAISS_EF_SEARCH = int(os.environ.get("FAISS_EF_SEARCH", "64"))
+# PQ sub-quantizers (one byte each per vector); must divide the embedding dimension
+FAISS_PQ_M = int(os.environ.get("FAISS_PQ_M", "48"))
+# Open saved FAISS snapshots memory-mapped instead of reading them into memory
+FAISS_MMAP = os.environ.get("FAISS_MMAP", "1") == "1"
+# Postgres connections shared by pgvector searches and writes, which run in different worker threads
+PGVECTOR_POOL_SIZE = int(os.environ.get("PGVECTOR_POOL_SIZE", "4"))
+
+# FAISS, ChromaDB and psycopg2 are imported on first use, so importing this module stays
+# cheap for deployments that use another backend
+
+class VectorIndex(ABC):
+    """
+    Interface shared by the vector backends.
+
+    ``search_batch`` embeds all queries in one batch and runs a single backend query
+    for all of them. Each result is a list of ``(merchant_id, distance)`` pairs,
+    nearest first, with distances in the backend's own metric (lower is closer).
+    """
+    @abstractmethod
+    def search_vectors(self, vectors: np.ndarray, k: int = 5) -> List[List[Tuple[str, float]]]:
+        """Nearest ``k`` merchants of each row of ``vectors``."""
+    def search_batch(self, queries: List[str], k: int = 5) -> List[List[Tuple[str, float]]]:
+        if not queries:
+            return []
+        return self.search_vectors(get_embeddings(queries), k)
     def search(self, query: str, k=5) -> List[str]:
-        emb = get_embedding(query).astype('float32').reshape(1, -1)
-        D, I = self.index.search(emb, k)
-        return [self.ids[i] for i in I[0] if i < len(self.ids)]
+        return [merchant_id for merchant_id, _ in self.search_vectors(get_embedding(query).reshape(1, -1), k)[0]]
+
+class FaissIndex(VectorIndex):
+    """
+    FAISS index behind an ID map, so single vectors can be removed and re-added.
+
+    Vector ids default to insertion order; the matchmaker passes feature store row
+    positions so incremental merchant updates can address their rows. ``index_type``
+    picks the structure: exact ``flat`` search, or for large catalogs ``ivf``
+    (inverted lists, tuned by ``nprobe``), ``hnsw`` (graph, tuned by ``ef_search``),
+    ``pq`` (product-quantized codes) or ``ivfpq``. Trained types are trained on the
+    first batch of vectors added.
+    """
+    def __init__(self, dim=384, index_type: str = FAISS_INDEX_TYPE, nlist: int = FAISS_NLIST,
+                 nprobe: int = FAISS_NPROBE, hnsw_m: int = FAISS_HNSW_M, ef_search: int = FAISS_EF_SEARCH,
+                 pq_m: int = FAISS_PQ_M, index=None):
+        import faiss
+        if index_type not in FAISS_INDEX_TYPES:
+            raise ValueError(f"Unknown FAISS index type {index_type!r}, expected one of {FAISS_INDEX_TYPES}")
+        self.dim = dim
+        self.index_type = index_type
+        self.nlist = nlist
+        self.pq_m = pq_m
+        self.hnsw_m = hnsw_m
+        self.search_params = {"nprobe": nprobe, "efSearch": ef_search}
+        self.index = index if index is not None else faiss.index_factory(dim, self._factory(None))
+        self._apply_search_params()
+        self.ids = {}  # vector id -> merchant_id
+        self.next_id = 0
+        # HNSW graphs cannot drop vectors; removed ones stay in the graph and are skipped
+        self.orphans = 0
+        # Snapshot file backing a memory-mapped index, re-read privately before the first write
+        self.path = None
+        self.mapped = False
+        # Updates may run in a worker thread while requests search
+        self._lock = threading.Lock()
+
+    def _factory(self, n: Optional[int]) -> str:
+        """FAISS factory string for this index type, sized for ``n`` training vectors when known."""
+        nlist = self.nlist if n is None else max(1, min(self.nlist, n // 39))
+        return {
+            "flat": "IDMap2,Flat",
+            "ivf": f"IDMap2,IVF{nlist},Flat",
+            "hnsw": f"IDMap2,HNSW{self.hnsw_m}",
+            "pq": f"IDMap2,PQ{self.pq_m}",
+            "ivfpq": f"IDMap2,IVF{nlist},PQ{self.pq_m}",
+        }[self.index_type]
+
+    def _apply_search_params(self):
+        import faiss
+        space = faiss.ParameterSpace()
+        if self.index_type in ("ivf", "ivfpq"):
+            space.set_index_parameter(self.index, "nprobe", self.search_params["nprobe"])
+        elif self.index_type == "hnsw":
+            space.set_index_parameter(self.index, "efSearch", self.search_params["efSearch"])
 
-# ChromaDB integration
-import chromadb
-from chromadb.config import Settings
+    def set_search_params(self, nprobe: Optional[int] = None, ef_search: Optional[int] = None):
+        """Trade recall for speed at query time: IVF lists probed, or HNSW candidate list size."""
+        with self._lock:
+            if nprobe is not None:
+                self.search_params["nprobe"] = nprobe
+            if ef_search is not None:
+                self.search_params["efSearch"] = ef_search
+            self._apply_search_params()
 
-class ChromaDBIndex:
+    def _train(self, vectors: np.ndarray):
+        import faiss
+        # PQ codebooks need 256 training points per sub-quantizer; too small a catalog stays exact
+        if self.index_type in ("pq", "ivfpq") and len(vectors) < 256:
+            print(f"Only {len(vectors)} vectors to train a {self.index_type} FAISS index, using flat instead")
+            self.index_type = "flat"
+        self.index = faiss.index_factory(self.dim, self._factory(len(vectors)))
+        self.index.train(vectors)
+        self._apply_search_params()
+
+    def _ensure_writable(self):
+        import faiss
+        # A memory-mapped index must not be modified in place (FAISS aborts the process)
+        if self.mapped:
+            self.index = faiss.read_index(self.path)
+            self.mapped = False
+            self._apply_search_params()
+
+    def add(self, merchant_id: str, text: str, vector_id: Optional[int] = None):
+        self.add_batch([merchant_id], [text], None if vector_id is None else [vector_id])
+    def add_batch(self, merchant_ids: List[str], texts: List[str], vector_ids: Optional[List[int]] = None):
+        if not texts:
+            return
+        self.add_vectors(merchant_ids, get_embeddings(texts), vector_ids)
+    def add_vectors(self, merchant_ids: List[str], vectors: np.ndarray, vector_ids: Optional[List[int]] = None):
+        if vector_ids is None:
+            vector_ids = range(self.next_id, self.next_id + len(merchant_ids))
+        vector_ids = np.asarray(vector_ids, dtype=np.int64)
+        if len(vector_ids) == 0:
+            return
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        with self._lock:
+            self._ensure_writable()
+            if not self.index.is_trained:
+                self._train(vectors)
+            self.index.add_with_ids(vectors, vector_ids)
+            self.ids.update(zip(vector_ids.tolist(), merchant_ids))
+            self.next_id = max(self.next_id, int(vector_ids.max()) + 1)
+    def remove(self, vector_ids: List[int]):
+        vector_ids = np.asarray(vector_ids, dtype=np.int64)
+        if len(vector_ids) == 0:
+            return
+        with self._lock:
+            if self.index_type == "hnsw":
+                self.orphans += sum(self.ids.pop(i, None) is not None for i in vector_ids.tolist())
+                return
+            self._ensure_writable()
+            self.index.remove_ids(vector_ids)
+            for vector_id in vector_ids.tolist():
+                self.ids.pop(vector_id, None)
+    def search_vectors(self, vectors: np.ndarray, k: int = 5) -> List[List[Tuple[str, float]]]:
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        with self._lock:
+            D, I = self.index.search(vectors, k + self.orphans)
+        results = []
+        for distances, vector_ids in zip(D.tolist(), I.tolist()):
+            hits = [(self.ids[i], d) for i, d in zip(vector_ids, distances) if i in self.ids]
+            results.append(hits[:k])
+        return results
+
+    def save(self, path: str):
+        """Write the index to ``path`` and its id mapping to ``path + '.ids.npz'``, each atomically."""
+        import faiss
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # Several workers may save the same snapshot at once, so temporary names are per process
+        tmp_suffix = f".tmp{os.getpid()}"
+        with self._lock:
+            vector_ids = np.fromiter(self.ids.keys(), dtype=np.int64, count=len(self.ids))
+            merchant_ids = np.array(list(self.ids.values()), dtype=str)
+            np.savez(path + tmp_suffix + ".npz", vector_ids=vector_ids, merchant_ids=merchant_ids,
+                     index_type=np.array(self.index_type), next_id=np.array(self.next_id),
+                     orphans=np.array(self.orphans))
+            faiss.write_index(self.index, path + tmp_suffix)
+        os.replace(path + tmp_suffix + ".npz", path + ".ids.npz")
+        os.replace(path + tmp_suffix, path)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = FAISS_MMAP, nprobe: int = FAISS_NPROBE,
+             ef_search: int = FAISS_EF_SEARCH) -> "FaissIndex":
+        """
+        Open a snapshot written by ``save``.
+
+        With ``mmap`` the vectors (or IVF lists) stay in the file and are paged in on
+        demand, so uvicorn workers opening the same snapshot share those pages through
+        the OS page cache. The first update re-reads the file into private memory.
+        """
+        import faiss
+        with np.load(path + ".ids.npz", allow_pickle=False) as data:
+            index_type = str(data["index_type"])
+            vector_ids, merchant_ids = data["vector_ids"], data["merchant_ids"]
+            next_id, orphans = int(data["next_id"]), int(data["orphans"])
+        flags = 0
+        if mmap:
+            flags = faiss.IO_FLAG_MMAP if index_type in ("ivf", "ivfpq") else faiss.IO_FLAG_MMAP_IFC
+        index = faiss.read_index(path, flags)
+        loaded = cls(dim=index.d, index_type=index_type, nprobe=nprobe, ef_search=ef_search, index=index)
+        loaded.ids = dict(zip(vector_ids.tolist(), merchant_ids.tolist()))
+        loaded.next_id, loaded.orphans = next_id, orphans
+        loaded.path, loaded.mapped = path, mmap
+        return loaded
+
+class ChromaDBIndex(VectorIndex):
     def __init__(self, collection_name="agents", persist_directory=".chromadb"):
+        import chromadb
+        from chromadb.config import Settings
         self.client = chromadb.Client(Settings(persist_directory=persist_directory))
         self.collection = self.client.get_or_create_collection(collection_name)
     def add(self, merchant_id: str, text: str):
         emb = get_embedding(text).tolist()
         self.collection.add(documents=[text], embeddings=[emb], ids=[merchant_id])
-    def search(self, query: str, k=5) -> List[str]:
-        emb = get_embedding(query).tolist()
-        results = self.collection.query(query_embeddings=[emb], n_results=k)
-        return results['ids'][0] if results['ids'] else [] 
\ No newline at end of file
+    def add_batch(self, merchant_ids: List[str], texts: List[str]):
+        # ChromaDB rejects duplicate ids within one add; keep the first text per id like add() does
+        first = {}
+        for merchant_id, text in zip(merchant_ids, texts):
+            first.setdefault(merchant_id, text)
+        ids, docs = list(first), list(first.values())
+        embs = get_embeddings(docs).tolist()
+        batch_size = self.client.get_max_batch_size() if hasattr(self.client, "get_max_batch_size") else 5000
+        for i in range(0, len(ids), batch_size):
+            self.collection.add(documents=docs[i:i + batch_size], embeddings=embs[i:i + batch_size],
+                                ids=ids[i:i + batch_size])
+    def upsert_batch(self, merchant_ids: List[str], texts: List[str]):
+        """Insert or replace the text of each merchant (the first one given per id)."""
+        first = {}
+        for merchant_id, text in zip(merchant_ids, texts):
+            first.setdefault(merchant_id, text)
+        if first:
+            ids, docs = list(first), list(first.values())
+            self.collection.upsert(documents=docs, embeddings=get_embeddings(docs).tolist(), ids=ids)
+    def delete(self, merchant_ids: List[str]):
+        if merchant_ids:
+            self.collection.delete(ids=list(merchant_ids))
+    def search_vectors(self, vectors: np.ndarray, k: int = 5) -> List[List[Tuple[str, float]]]:
+        results = self.collection.query(query_embeddings=np.asarray(vectors).tolist(), n_results=k,
+                                        include=["distances"])
+        return [list(zip(ids, distances)) for ids, distances in zip(results['ids'], results['distances'])]
+
+class PgVectorIndex(VectorIndex):
+    """
+    One embedding per merchant in the Postgres ``merchant_embeddings`` table.
+
+    Searches and writes run in worker threads, so each call borrows its own connection
+    from a pool of ``pool_size``; callers beyond that wait for a free connection.
+    """
+    def __init__(self, dsn: str, dim=384, pool_size: int = PGVECTOR_POOL_SIZE):
+        from psycopg2.pool import ThreadedConnectionPool
+        self.pool = ThreadedConnectionPool(1, pool_size, dsn)
+        # ThreadedConnectionPool raises instead of blocking when every connection is taken
+        self._available = threading.BoundedSemaphore(pool_size)
+        self._registered = set()
+        with self._connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(f"""
+                    CREATE TABLE IF NOT EXISTS merchant_embeddings (
+                        merchant_id TEXT PRIMARY KEY,
+                        embedding vector({int(dim)})
+                    )
+                """)
+            conn.commit()
+    @contextlib.contextmanager
+    def _connection(self):
+        """A pooled connection used by this thread alone; an unfinished transaction is rolled back."""
+        from pgvector.psycopg2 import register_vector
+        with self._available:
+            conn = self.pool.getconn()
+            try:
+                if id(conn) not in self._registered:
+                    register_vector(conn)
+                    conn.commit()
+                    self._registered.add(id(conn))
+                yield conn
+            finally:
+                if not conn.closed:
+                    conn.rollback()
+                self.pool.putconn(conn)
+    def write(self, latest: Dict[str, str], deleted: List[str] = ()):
+        """Upsert the embedding of each merchant's text and drop deleted merchants, in one transaction."""
+        from psycopg2.extras import execute_values
+        # Embed before taking a connection, so searches are not kept waiting on Ollama
+        rows = list(zip(latest, get_embeddings(list(latest.values())))) if latest else []
+        with self._connection() as conn:
+            with conn.cursor() as cur:
+                if rows:
+                    execute_values(cur, """
+                        INSERT INTO merchant_embeddings (merchant_id, embedding)
+                        VALUES %s
+                        ON CONFLICT (merchant_id) DO UPDATE SET embedding = EXCLUDED.embedding
+                    """, rows, page_size=1000)
+                if deleted:
+                    cur.execute("DELETE FROM merchant_embeddings WHERE merchant_id = ANY(%s)", (list(deleted),))
+            conn.commit()
+    def search_vectors(self, vectors: np.ndarray, k: int = 5) -> List[List[Tuple[str, float]]]:
+        from psycopg2.extras import execute_values
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if len(vectors) == 0:
+            return []
+        # All queries in one statement: each VALUES row drives an index scan through the lateral join;
+        # leaving the connection rolls the read transaction back
+        with self._connection() as conn, conn.cursor() as cur:
+            rows = execute_values(cur, f"""
+                SELECT q.i, m.merchant_id, m.distance
+                FROM (VALUES %s) AS q(i, embedding)
+                CROSS JOIN LATERAL (
+                    SELECT merchant_id, embedding <-> q.embedding AS distance
+                    FROM merchant_embeddings
+                    ORDER BY embedding <-> q.embedding
+                    LIMIT {int(k)}
+                ) m
+                ORDER BY q.i, m.distance
+            """, list(enumerate(vectors)), template="(%s, %s::vector)", page_size=len(vectors), fetch=True)
+        results = [[] for _ in range(len(vectors))]
+        for i, merchant_id, distance in rows:
+            results[i].append((merchant_id, float(distance)))
+        return results
+    def close(self):
+        self.pool.closeall()
@@ -0,0 +1,78 @@
+import asyncio
+import os
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple, Union
+
+from agents.orchestrator import AgentInput, AgentOutput
+
+# Window in which concurrent single-message requests are gathered into one batch; 0 disables coalescing
+MESSAGE_COALESCE_WINDOW_MS = float(os.environ.get("MESSAGE_COALESCE_WINDOW_MS", "0"))
+# A window is flushed early once this many requests are waiting
+MESSAGE_COALESCE_MAX_BATCH = int(os.environ.get("MESSAGE_COALESCE_MAX_BATCH", "32"))
+
+
+class MessageCoalescer:
+    """
+    Micro-batches concurrent single-message requests.
+
+    The first request opens a window of ``window_ms``; it and every request arriving
+    before the window closes (or until ``max_batch`` are waiting) are processed with
+    one ``run_batch`` call, so duplicates run once and triage prompts are shared.
+    ``run_batch`` returns an output or an exception per input, so one failing request
+    does not fail the others coalesced with it.
+    """
+
+    def __init__(self, run_batch: Callable[[List[AgentInput]], Awaitable[List[Union[AgentOutput, Exception]]]],
+                 window_ms: float = MESSAGE_COALESCE_WINDOW_MS, max_batch: int = MESSAGE_COALESCE_MAX_BATCH):
+        self.run_batch = run_batch
+        self.window = window_ms / 1000
+        self.max_batch = max(1, max_batch)
+        self._pending: List[Tuple[AgentInput, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks = set()
+        self.stats: Dict[str, int] = {"requests": 0, "batches": 0, "largest_batch": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.window > 0
+
+    async def submit(self, input: AgentInput) -> AgentOutput:
+        """The output for ``input``, computed together with the other requests of its window."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((input, future))
+        self.stats["requests"] += 1
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        self.stats["batches"] += 1
+        self.stats["largest_batch"] = max(self.stats["largest_batch"], len(batch))
+        task = asyncio.create_task(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[AgentInput, asyncio.Future]]):
+        try:
+            outputs = await self.run_batch([input for input, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        # A request whose client went away has a cancelled future
+        for (_, future), output in zip(batch, outputs):
+            if future.done():
+                continue
+            if isinstance(output, Exception):
+                future.set_exception(output)
+            else:
+                future.set_result(output)
@@ -1,29 +1,59 @@
-from fastapi import FastAPI, Request, WebSocket
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, PlainTextResponse
 from pydantic import BaseModel
-from agents.router_agent import RouterAgent
-from agents.matchmaker_agent import MatchmakerAgent
-from agents.moderator_agent import ModeratorAgent
 from typing import List, Dict, Optional, Any
 import os
-from agents.orchestrator import AgentOrchestrator, AgentInput
-
-app = FastAPI()
+from agents.orchestrator import AgentInput
+from agents.vector_backends import embedding_cache
+from agents.fast_path import fast_path_stats
+from agents.response_cache import response_cache
+from agents.model_cascade import cascade_stats
+from agents import ollama_client, metrics
+from api.registry import AgentRegistry
+from api.coalescer import MessageCoalescer
 
 # Path to merchant dataset (fixed for Docker)
 MERCHANT_DATA_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data', 'fake_merchant_dataset.csv'))
 
-# Initialize agents
-router_agent = RouterAgent()
-matchmaker_agent = MatchmakerAgent(MERCHANT_DATA_PATH, os.environ.get("PGVECTOR_DSN"))
-moderator_agent = ModeratorAgent()
+# Most messages accepted by one POST /messages/batch request
+MESSAGE_BATCH_MAX_SIZE = int(os.environ.get("MESSAGE_BATCH_MAX_SIZE", "500"))
+
+# One set of agents per process, shared by every endpoint
+registry = AgentRegistry(MERCHANT_DATA_PATH, os.environ.get("PGVECTOR_DSN"))
+
+async def run_batch(inputs: List[AgentInput], return_exceptions: bool = False):
+    orchestrator = await registry.get_orchestrator()
+    return await orchestrator.run_batch(inputs, return_exceptions)
+
+async def run_coalesced(inputs: List[AgentInput]):
+    # Each coalesced request gets its own output or error
+    return await run_batch(inputs, return_exceptions=True)
+
+# Concurrent single-message requests are batched together when MESSAGE_COALESCE_WINDOW_MS > 0
+coalescer = MessageCoalescer(run_coalesced)
 
-# Initialize orchestrator
-orchestrator = AgentOrchestrator(MERCHANT_DATA_PATH)
+async def run_message(agent_input: AgentInput):
+    if coalescer.enabled:
+        return await coalescer.submit(agent_input)
+    orchestrator = await registry.get_orchestrator()
+    return await orchestrator.run(agent_input)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    registry.start()
+    yield
+    await registry.stop()
+    await ollama_client.aclose()
+
+app = FastAPI(lifespan=lifespan)
 
 class MessageRequest(BaseModel):
     message: str
     user_id: str
     feedback: str = None  # thumbs-up or thumbs-down
+    match_ids: Optional[List[str]] = None  # partners of the answer the feedback rates
+    deadline_ms: Optional[float] = None  # LLM work still queued after this is dropped
 
 class AgentStep(BaseModel):
     agent_name: str
@@ -37,13 +67,28 @@ class ModelContextProtocol(BaseModel):
     user_id: str
     message: str
     feedback: Optional[str] = None
+    match_ids: Optional[List[str]] = None
     metadata: Optional[Dict[str, Any]] = None
     history: Optional[List[Dict[str, Any]]] = None
+    deadline_ms: Optional[float] = None
+
+class MessageBatchRequest(BaseModel):
+    messages: List[ModelContextProtocol]
+
+class MerchantRecord(BaseModel):
+    city: str = ""
+    mcc_code: str = ""
+    mcc_description: str = ""
+    messages: List[str]
+
+class MerchantMessage(BaseModel):
+    message: str
 
 @app.post("/message")
 async def process_message(payload: MessageRequest):
-    agent_input = AgentInput(message=payload.message, user_id=payload.user_id, feedback=payload.feedback)
-    agent_output = await orchestrator.run(agent_input)
+    agent_input = AgentInput(message=payload.message, user_id=payload.user_id, feedback=payload.feedback,
+                             match_ids=payload.match_ids, deadline_ms=payload.deadline_ms)
+    agent_output = await run_message(agent_input)
     return agent_output.dict()
 
 @app.post("/mcp/message")
@@ -52,24 +97,109 @@ async def mcp_message(payload: ModelContextProtocol):
     agent_input = AgentInput(
         message=payload.message,
         user_id=payload.user_id,
-        feedback=payload.feedback
+        feedback=payload.feedback,
+        match_ids=payload.match_ids,
+        deadline_ms=payload.deadline_ms
     )
     # Optionally, you can extend AgentInput and the orchestrator to use metadata/history
-    agent_output = await orchestrator.run(agent_input)
+    agent_output = await run_message(agent_input)
     return agent_output.dict()
 
+# Many messages in one request: duplicates run once and triage is batched across them
+@app.post("/messages/batch")
+async def process_message_batch(payload: MessageBatchRequest):
+    if len(payload.messages) > MESSAGE_BATCH_MAX_SIZE:
+        raise HTTPException(status_code=413, detail=f"At most {MESSAGE_BATCH_MAX_SIZE} messages per batch")
+    inputs = [AgentInput(**item.dict()) for item in payload.messages]
+    outputs = await run_batch(inputs) if inputs else []
+    return {"results": [output.dict() for output in outputs]}
+
 @app.get("/mcp/status")
-def mcp_status():
+def mcp_status(feedback_limit: int = Query(20, ge=0, le=500), feedback_offset: int = Query(0, ge=0)):
+    # Feedback is paginated (newest first) and summarized instead of returned in full
+    feedback = registry.orchestrator.feedback_memory if registry.built else None
     return {
         "status": "ok",
+        "startup": registry.readiness(),
         "agents": ["router", "moderator", "matchmaker", "human_escalation"],
         "message": "MCP server is running. Human Escalation Agent is available for complex or high-risk cases.",
-        "feedback_memory": orchestrator.feedback_memory
+        "feedback_memory": feedback.page(feedback_limit, feedback_offset) if feedback is not None else [],
+        "feedback": feedback.stats() if feedback is not None else None,
+        "embedding_cache": embedding_cache.stats(),
+        "fast_path": fast_path_stats,
+        "response_cache": response_cache.stats(),
+        "message_coalescer": coalescer.stats if coalescer.enabled else None,
+        "llm_scheduler": ollama_client.scheduler_stats(),
+        "model_cascade": {agent: dict(stats) for agent, stats in cascade_stats.items()},
+        "merchant_updates": registry.orchestrator.matchmaker.update_stats if registry.built else None,
+        "precomputed_matches": registry.orchestrator.matchmaker.precomputed.stats()
+        if registry.built and registry.orchestrator.matchmaker.precomputed is not None else None
     }
 
-# Optional: WebSocket endpoint for real-time agent workflow (not implemented)
-# @app.websocket("/mcp/stream")
-# async def mcp_stream(websocket: WebSocket):
-#     await websocket.accept()
-#     await websocket.send_text("MCP streaming not implemented yet.")
-#     await websocket.close() 
\ No newline at end of file
+# Incremental merchant updates: only the changed rows are re-tokenized and re-embedded
+@app.put("/merchants/{merchant_id}")
+async def upsert_merchant(merchant_id: str, payload: MerchantRecord):
+    orchestrator = await registry.get_orchestrator()
+    record = {"merchant_id": merchant_id, **payload.dict()}
+    return await orchestrator.matchmaker.apply_changes(upserts=[record])
+
+@app.delete("/merchants/{merchant_id}")
+async def delete_merchant(merchant_id: str):
+    orchestrator = await registry.get_orchestrator()
+    if merchant_id not in orchestrator.matchmaker.profiles:
+        raise HTTPException(status_code=404, detail=f"Unknown merchant {merchant_id}")
+    return await orchestrator.matchmaker.apply_changes(deletes=[merchant_id])
+
+@app.post("/merchants/{merchant_id}/messages")
+async def add_merchant_message(merchant_id: str, payload: MerchantMessage):
+    orchestrator = await registry.get_orchestrator()
+    try:
+        return await orchestrator.matchmaker.add_message(merchant_id, payload.message)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown merchant {merchant_id}")
+
+@app.delete("/merchants/{merchant_id}/messages/{position}")
+async def delete_merchant_message(merchant_id: str, position: int):
+    orchestrator = await registry.get_orchestrator()
+    try:
+        return await orchestrator.matchmaker.delete_message(merchant_id, position)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown message {position} of merchant {merchant_id}")
+
+# Prometheus scrape target: per-step latency, LLM call and token histograms, cache hits and
+# the LLM scheduler's queue depth and shed calls
+@app.get("/metrics")
+def prometheus_metrics():
+    return PlainTextResponse(metrics.registry.render(ollama_client.scheduler_stats()),
+                             media_type="text/plain; version=0.0.4")
+
+@app.get("/ready")
+def ready():
+    """Readiness probe: 200 once the agents and the vector index are built, 503 before."""
+    return JSONResponse(registry.readiness(), status_code=200 if registry.ready else 503)
+
+# Real-time agent workflow: send MCP messages as JSON, receive a "step" event per completed
+# AgentStep and a final "done" event with the full output for each of them
+@app.websocket("/mcp/stream")
+async def mcp_stream(websocket: WebSocket):
+    await websocket.accept()
+    orchestrator = await registry.get_orchestrator()
+    try:
+        while True:
+            try:
+                payload = ModelContextProtocol(**await websocket.receive_json())
+            except (ValueError, TypeError) as e:
+                await websocket.send_json({"event": "error", "detail": str(e)})
+                continue
+            agent_input = AgentInput(message=payload.message, user_id=payload.user_id, feedback=payload.feedback,
+                                     match_ids=payload.match_ids, deadline_ms=payload.deadline_ms)
+            try:
+                async for event in orchestrator.run_stream(agent_input):
+                    await websocket.send_json(event)
+            except WebSocketDisconnect:
+                raise
+            except Exception as e:
+                print(f"Error streaming agent workflow: {e}")
+                await websocket.send_json({"event": "error", "detail": str(e)})
+    except WebSocketDisconnect:
+        pass 
\ No newline at end of file
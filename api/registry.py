@@ -0,0 +1,130 @@
+import asyncio
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from agents.feature_store import FEATURE_STORE_DIR
+from agents.matchmaker_agent import MatchmakerAgent
+from agents.merchant_updates import MERCHANT_WATCH, MerchantFileWatcher
+from agents.orchestrator import AgentOrchestrator
+
+
+class AgentRegistry:
+    """
+    Builds the agents once per process and tracks startup progress.
+
+    Under the FastAPI lifespan the agents are built in a worker thread and the vector
+    index afterwards in the background, so the server accepts traffic (and matches by
+    scanning every merchant) while embeddings are computed. Without the lifespan, e.g.
+    a bare ``TestClient(app)``, everything is built on first access instead.
+    """
+
+    def __init__(self, merchant_data_path: str, pgvector_dsn: Optional[str] = None,
+                 feature_store_dir: str = FEATURE_STORE_DIR, watch: bool = MERCHANT_WATCH):
+        self.merchant_data_path = merchant_data_path
+        self.pgvector_dsn = pgvector_dsn
+        self.feature_store_dir = feature_store_dir
+        self.watch = watch
+        self.status = {"agents": "pending", "index": "pending"}
+        self.timings: Dict[str, float] = {}
+        self.error: Optional[str] = None
+        self._orchestrator: Optional[AgentOrchestrator] = None
+        self._lock = threading.Lock()
+        self._created = time.perf_counter()
+        self._agents_task = None
+        self._index_task = None
+        self._watch_task = None
+
+    @property
+    def built(self) -> bool:
+        return self._orchestrator is not None
+
+    @property
+    def ready(self) -> bool:
+        # A failed index build leaves matching degraded to full scans, not unavailable
+        return self.status["agents"] == "ready" and self.status["index"] in ("ready", "failed")
+
+    @property
+    def orchestrator(self) -> AgentOrchestrator:
+        """The shared orchestrator, built together with its index on first access if nobody started it."""
+        if self._orchestrator is None:
+            self._build_agents()
+            self._build_index()
+        return self._orchestrator
+
+    async def get_orchestrator(self) -> AgentOrchestrator:
+        """The shared orchestrator without blocking the event loop, waiting for a startup in progress."""
+        if self._agents_task is not None:
+            await asyncio.shield(self._agents_task)
+        if self._orchestrator is None:
+            return await asyncio.to_thread(lambda: self.orchestrator)
+        return self._orchestrator
+
+    def start(self):
+        """Begin building agents and then the index in the background of the running event loop."""
+        self._created = time.perf_counter()
+        self._agents_task = asyncio.create_task(asyncio.to_thread(self._build_agents))
+        self._index_task = asyncio.create_task(self._build_index_in_background())
+        if self.watch:
+            self._watch_task = asyncio.create_task(self._watch_merchant_file())
+
+    async def stop(self):
+        for task in (self._watch_task, self._index_task, self._agents_task):
+            if task is not None and not task.done():
+                task.cancel()
+        if self._orchestrator is not None:
+            self._orchestrator.matchmaker.close()
+
+    def readiness(self) -> Dict[str, Any]:
+        return {"ready": self.ready, **self.status, "timings": self.timings, "error": self.error}
+
+    async def _build_index_in_background(self):
+        try:
+            await self._agents_task
+        except Exception:
+            # _build_agents already recorded the error; there is nothing to index
+            self.status["index"] = "failed"
+            return
+        await asyncio.to_thread(self._build_index)
+
+    async def _watch_merchant_file(self):
+        # Start from the state the index was built from, so no edit is missed or applied twice
+        await self._index_task
+        if self._orchestrator is None:
+            return
+        await MerchantFileWatcher(self._orchestrator.matchmaker, self.merchant_data_path).run()
+
+    def _build_agents(self):
+        with self._lock:
+            if self._orchestrator is not None:
+                return
+            self.status["agents"] = "building"
+            start = time.perf_counter()
+            try:
+                matchmaker = MatchmakerAgent(self.merchant_data_path, self.pgvector_dsn,
+                                             feature_store_dir=self.feature_store_dir, build_index=False)
+                self._orchestrator = AgentOrchestrator(self.merchant_data_path, matchmaker=matchmaker)
+            except Exception as e:
+                self.status["agents"] = "failed"
+                self.error = f"agents: {e}"
+                raise
+            self.status["agents"] = "ready"
+            self.timings["agents_seconds"] = round(time.perf_counter() - start, 3)
+
+    def _build_index(self):
+        with self._lock:
+            if self.status["index"] in ("building", "ready"):
+                return
+            self.status["index"] = "building"
+        start = time.perf_counter()
+        try:
+            self._orchestrator.matchmaker.init_index()
+        except Exception as e:
+            # Matching keeps working without an index by scanning every merchant
+            print(f"Error building vector index: {e}")
+            self.status["index"] = "failed"
+            self.error = f"index: {e}"
+            return
+        self.status["index"] = "ready"
+        self.timings["index_seconds"] = round(time.perf_counter() - start, 3)
+        self.timings["ready_seconds"] = round(time.perf_counter() - self._created, 3)
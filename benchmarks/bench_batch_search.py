@@ -0,0 +1,63 @@
+"""
+Bulk nearest-neighbour search: one search() per query against one search_batch() call.
+
+Every merchant's first message is used as a query, like a nightly "suggest partners
+for every merchant" job; query embeddings start cold so both paths pay for them:
+
+    python -m benchmarks.bench_batch_search --size 20000 --latency 0.002
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.stub_ollama import StubOllamaServer
+from benchmarks.synthetic import make_merchant_frame
+
+
+def run(size, latency, backends, k):
+    df = make_merchant_frame(size)
+    ids, texts = df['merchant_id'].tolist(), df['message'].tolist()
+    # Unique query texts so the embedding cache cannot answer for the index's own messages
+    queries = [f"{text} ({merchant_id})" for merchant_id, text in
+               df.groupby('merchant_id', sort=False)['message'].first().items()]
+
+    with StubOllamaServer(latency=latency) as stub, tempfile.TemporaryDirectory() as tmp:
+        os.environ["OLLAMA_HOST"] = stub.url
+        # Stub vectors must never land in the real on-disk embedding cache
+        os.environ["EMBEDDING_CACHE_PATH"] = ""
+        from agents import vector_backends
+        from agents.embedding_cache import EmbeddingCache
+        from agents.vector_backends import FaissIndex, ChromaDBIndex
+
+        factories = {
+            "faiss": FaissIndex,
+            "chromadb": lambda: ChromaDBIndex(collection_name=f"bench_{time.time_ns()}",
+                                              persist_directory=os.path.join(tmp, "chroma")),
+        }
+        print(f"{'backend':>9} {'path':>9} {'queries':>8} {'http_calls':>11} {'seconds':>8} {'queries/sec':>12}")
+        for backend in backends:
+            index = factories[backend]()
+            index.add_batch(ids, texts)
+            for path, search in (("per-query", lambda: [index.search(q, k) for q in queries]),
+                                 ("batch", lambda: index.search_batch(queries, k))):
+                vector_backends.embedding_cache = EmbeddingCache(path=None)
+                stub.reset()
+                start = time.perf_counter()
+                search()
+                seconds = time.perf_counter() - start
+                print(f"{backend:>9} {path:>9} {len(queries):>8} {sum(stub.calls.values()):>11} "
+                      f"{seconds:>8.2f} {len(queries) / seconds:>12.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=20000)
+    parser.add_argument("--latency", type=float, default=0.002, help="stub latency per HTTP call in seconds")
+    parser.add_argument("--backends", nargs="+", default=["faiss", "chromadb"])
+    parser.add_argument("-k", type=int, default=200)
+    args = parser.parse_args()
+    run(args.size, args.latency, args.backends, args.k)
@@ -0,0 +1,76 @@
+"""
+Offline bulk matchmaking against calling find_matches once per merchant message.
+
+The online loop is timed on a sample of messages and extrapolated to the whole
+table; the bulk job runs in full, with full scans and with FAISS retrieval, on one
+process and on a pool:
+
+    python -m benchmarks.bench_bulk_matchmaking --size 20000 --sample 200 --workers 1 4
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.stub_ollama import StubOllamaServer
+from benchmarks.synthetic import write_merchant_csv
+
+
+async def online_loop(agent, pairs):
+    for user_id, message in pairs:
+        await agent.find_matches(user_id, message)
+
+
+def run(size, sample, workers, latency, candidate_k):
+    with StubOllamaServer(latency=latency) as stub, tempfile.TemporaryDirectory() as tmp:
+        os.environ["OLLAMA_HOST"] = stub.url
+        # Stub vectors must never land in the real on-disk embedding cache
+        os.environ["EMBEDDING_CACHE_PATH"] = ""
+        os.environ["VECTOR_BACKEND"] = "faiss"
+        from agents.bulk_matchmaking import run_bulk_matchmaking
+        from agents.matchmaker_agent import MatchmakerAgent
+        from agents.response_cache import response_cache
+
+        path = write_merchant_csv(os.path.join(tmp, "merchants.csv"), size)
+        print(f"{'mode':>24} {'messages':>9} {'llm_calls':>10} {'seconds':>9} {'messages/sec':>13}")
+
+        agent = MatchmakerAgent(path, feature_store_dir=os.path.join(tmp, "online"), candidate_k=candidate_k,
+                                precomputed_path="")
+        pairs = list(zip(agent.df['merchant_id'], agent.df['message']))[:sample]
+        stub.reset()
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            asyncio.run(online_loop(agent, pairs))
+        seconds = time.perf_counter() - start
+        calls = stub.calls['/api/generate'] * size / len(pairs)
+        print(f"{'find_matches loop (est.)':>24} {size:>9} {calls:>10.0f} {seconds * size / len(pairs):>9.1f} "
+              f"{len(pairs) / seconds:>13.1f}")
+
+        for k in (0, candidate_k):
+            for n in workers:
+                response_cache.clear()
+                stub.reset()
+                label = f"bulk {'scan' if k == 0 else f'faiss k={k}'} x{n}"
+                with contextlib.redirect_stdout(io.StringIO()):
+                    stats = run_bulk_matchmaking(path, os.path.join(tmp, f"{label}.sqlite3"),
+                                                 feature_store_dir=os.path.join(tmp, f"features_{label}"),
+                                                 workers=n, candidate_k=k)
+                print(f"{label:>24} {stats['messages']:>9} {stub.calls['/api/generate']:>10} "
+                      f"{stats['seconds']:>9.1f} {stats['messages_per_sec']:>13.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=20000)
+    parser.add_argument("--sample", type=int, default=200, help="messages timed on the online path")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--latency", type=float, default=0.005, help="stub latency per HTTP call in seconds")
+    parser.add_argument("--candidate-k", type=int, default=200)
+    args = parser.parse_args()
+    run(args.size, args.sample, args.workers, args.latency, args.candidate_k)
@@ -0,0 +1,98 @@
+"""
+Load test of POST /message on a single uvicorn worker against the stub Ollama server.
+
+Sends the same number of requests serially and with N in flight. With the old
+blocking client every LLM call froze the event loop, so throughput was capped at
+the serial figure (1 / (llm_calls_per_request * latency)); with the async client
+concurrent requests overlap their LLM round trips.
+
+    python -m benchmarks.bench_concurrency --requests 40 --concurrency 1 10 20 --latency 0.1
+"""
+import argparse
+import asyncio
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.stub_ollama import StubOllamaServer
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_api(port: int):
+    import uvicorn
+    from api.main import app
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, workers=1, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    # Measure steady state, not the background startup
+    while httpx.get(f"http://127.0.0.1:{port}/ready").status_code != 200:
+        time.sleep(0.05)
+    return server, thread
+
+
+async def fire(url: str, total: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(client, i):
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.post(url, json={"message": f"mensagem de teste {i}", "user_id": "001"})
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+
+    async with httpx.AsyncClient(timeout=120) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(one(client, i) for i in range(total)))
+        return time.perf_counter() - start, sorted(latencies)
+
+
+def run(total, concurrencies, latency):
+    with StubOllamaServer(latency=latency) as stub, tempfile.TemporaryDirectory() as tmp:
+        os.environ["OLLAMA_HOST"] = stub.url
+        os.environ["FEATURE_STORE_DIR"] = tmp
+        os.environ["EMBEDDING_CACHE_PATH"] = ""
+        port = free_port()
+        server, thread = start_api(port)
+        from agents.response_cache import response_cache
+        url = f"http://127.0.0.1:{port}/message"
+        try:
+            print(f"{'in_flight':>9} {'requests':>8} {'llm_calls':>9} {'seconds':>8} {'req/s':>7} {'p50_ms':>7} {'p95_ms':>7}")
+            for concurrency in concurrencies:
+                stub.reset()
+                # Every round repeats the same messages; measure LLM round trips, not cached answers
+                response_cache.clear()
+                seconds, latencies = asyncio.run(fire(url, total, concurrency))
+                print(f"{concurrency:>9} {total:>8} {stub.calls['/api/generate']:>9} {seconds:>8.2f} "
+                      f"{total / seconds:>7.1f} {latencies[len(latencies) // 2] * 1000:>7.0f} "
+                      f"{latencies[int(len(latencies) * 0.95) - 1] * 1000:>7.0f}")
+            calls_per_request = stub.calls['/api/generate'] / total
+            print(f"blocking-client ceiling: {1 / (calls_per_request * latency):.1f} req/s "
+                  f"({calls_per_request:.0f} LLM calls x {latency * 1000:.0f} ms, event loop serialized)")
+        finally:
+            server.should_exit = True
+            thread.join()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 20])
+    parser.add_argument("--latency", type=float, default=0.1, help="stub latency per LLM call in seconds")
+    args = parser.parse_args()
+    run(args.requests, args.concurrency, args.latency)
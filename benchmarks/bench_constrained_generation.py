@@ -0,0 +1,86 @@
+"""
+Decode tokens and latency of the router, moderator and marketing classifications with
+and without output constraints (num_predict, stop sequences and format enums).
+
+The stub server makes the model chatty: every answer is followed by ``--ramble`` words
+of explanation, and each generated token costs ``--token-latency`` seconds, as decode
+time does on a real model. Unconstrained calls pay for the whole explanation; constrained
+ones stop after the label. Labels are compared between the two runs.
+
+    python -m benchmarks.bench_constrained_generation --messages 100 --ramble 60 --token-latency 0.002
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.stub_ollama import StubOllamaServer
+from benchmarks.bench_model_cascade import messages
+
+MERCHANT_DATA_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data', 'fake_merchant_dataset.csv'))
+
+
+async def classify_all(router, moderator, matchmaker, texts, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(text):
+        async with semaphore:
+            start = time.perf_counter()
+            answers = await asyncio.gather(router.classify(text), moderator.moderate(text),
+                                           matchmaker._marketing_llm(text))
+            return (time.perf_counter() - start) * 1000, answers
+
+    return await asyncio.gather(*(one(t) for t in texts))
+
+
+def run(n, concurrency, latency, ramble, token_latency):
+    with StubOllamaServer(latency=latency, ramble=ramble, token_latency=token_latency) as stub, \
+            tempfile.TemporaryDirectory() as tmp:
+        os.environ.update({"OLLAMA_HOST": stub.url, "FAST_PATH_ENABLED": "0", "RESPONSE_CACHE_SIZE": "0",
+                           "EMBEDDING_CACHE_PATH": ""})
+        from agents import ollama_client
+        from agents.router_agent import RouterAgent
+        from agents.moderator_agent import ModeratorAgent
+        from agents.matchmaker_agent import MatchmakerAgent
+
+        router, moderator = RouterAgent(), ModeratorAgent()
+        matchmaker = MatchmakerAgent(MERCHANT_DATA_PATH, feature_store_dir=tmp, build_index=False)
+        clients = [router.llm, moderator.llm, matchmaker.llm]
+        texts = messages(n)
+        reference = None
+        print(f"{'mode':>13} {'p50_ms':>8} {'p95_ms':>8} {'completion_tokens':>18} {'tokens/call':>12} "
+              f"{'labels_agree':>13}")
+        for mode, constrained in (("unconstrained", False), ("constrained", True)):
+            ollama_client.OLLAMA_CONSTRAINED_OUTPUT = constrained
+            before = [dict(client.usage) for client in clients]
+            with contextlib.redirect_stdout(io.StringIO()):
+                results = asyncio.run(classify_all(router, moderator, matchmaker, texts, concurrency))
+            latencies = np.array([ms for ms, _ in results])
+            # Moderation reasons are free text and get cut short; compare the actions
+            labels = [(route, verdict["action"], is_marketing) for _, (route, verdict, is_marketing) in results]
+            if reference is None:
+                reference = labels
+            agree = np.mean([a == r for a, r in zip(labels, reference)])
+            tokens = sum(c.usage["completion_tokens"] - b["completion_tokens"] for c, b in zip(clients, before))
+            calls = sum(c.usage["calls"] - b["calls"] for c, b in zip(clients, before))
+            print(f"{mode:>13} {np.percentile(latencies, 50):>8.1f} {np.percentile(latencies, 95):>8.1f} "
+                  f"{tokens:>18} {tokens / calls:>12.1f} {agree:>13.1%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.02, help="stub latency per LLM call in seconds")
+    parser.add_argument("--ramble", type=int, default=60, help="words of explanation after every answer")
+    parser.add_argument("--token-latency", type=float, default=0.002, help="stub seconds per generated token")
+    args = parser.parse_args()
+    run(args.messages, args.concurrency, args.latency, args.ramble, args.token_latency)
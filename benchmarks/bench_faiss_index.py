@@ -0,0 +1,89 @@
+"""
+Build time, snapshot size, load time, query latency and recall@10 of the FAISS index types.
+
+Vectors are clustered points of a low-dimensional space projected to 384 dimensions,
+recall is measured against the exact flat index, and snapshots are opened both
+memory-mapped and read into memory:
+
+    python -m benchmarks.bench_faiss_index --size 50000 --types flat ivf hnsw pq ivfpq
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from agents.vector_backends import FaissIndex
+
+DIM = 384
+
+
+def clustered_vectors(n, clusters=256, latent_dim=32, seed=0):
+    # Sentence embeddings have a low intrinsic dimension: clustered latent points projected up
+    rng = np.random.default_rng(0)
+    projection = rng.normal(size=(latent_dim, DIM)).astype(np.float32)
+    centers = rng.normal(size=(clusters, latent_dim)).astype(np.float32)
+    rng = np.random.default_rng(seed)
+    latent = centers[rng.integers(0, clusters, n)] + 0.5 * rng.normal(size=(n, latent_dim)).astype(np.float32)
+    vectors = latent @ projection + 0.05 * rng.normal(size=(n, DIM)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def private_mb():
+    # Anonymous memory only: pages of a memory-mapped snapshot are shared between workers
+    with open("/proc/self/status") as f:
+        return int(f.read().split("RssAnon:")[1].split()[0]) / 1024
+
+
+def run(size, types, queries, k):
+    vectors = clustered_vectors(size)
+    probes = clustered_vectors(queries, seed=1)
+    ids = [str(i) for i in range(size)]
+    exact = FaissIndex(index_type="flat")
+    exact.add_vectors(ids, vectors)
+    _, truth = exact.index.search(probes, k)
+
+    print(f"{'type':>6} {'build_s':>8} {'size_mb':>8} {'load_s':>7} {'mmap_s':>7} {'private_mb':>10} "
+          f"{'p50_ms':>7} {'recall@10':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for index_type in types:
+            start = time.perf_counter()
+            index = FaissIndex(index_type=index_type)
+            index.add_vectors(ids, vectors)
+            build = time.perf_counter() - start
+            path = os.path.join(tmp, f"{index_type}.faiss")
+            index.save(path)
+            del index
+
+            start = time.perf_counter()
+            FaissIndex.load(path, mmap=False)
+            load = time.perf_counter() - start
+            before = private_mb()
+            start = time.perf_counter()
+            mapped = FaissIndex.load(path, mmap=True)
+            mmap_load = time.perf_counter() - start
+
+            latencies, found = [], []
+            for probe in probes:
+                start = time.perf_counter()
+                _, I = mapped.index.search(probe.reshape(1, -1), k)
+                latencies.append((time.perf_counter() - start) * 1000)
+                found.append(I[0])
+            private = private_mb() - before
+            recall = np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)])
+            print(f"{index_type:>6} {build:>8.2f} {os.path.getsize(path) / 1e6:>8.1f} {load:>7.3f} "
+                  f"{mmap_load:>7.3f} {private:>10.1f} {np.percentile(latencies, 50):>7.3f} {recall:>9.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--size", type=int, default=50000)
+    parser.add_argument("--types", nargs="+", default=["flat", "ivf", "hnsw", "pq", "ivfpq"])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=10)
+    args = parser.parse_args()
+    run(args.size, args.types, args.queries, args.k)
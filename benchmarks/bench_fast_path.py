@@ -0,0 +1,100 @@
+"""
+Share of router/moderator traffic answered by the fast-path rules and their accuracy
+against LLM labels.
+
+Labels come from one of:
+- benchmarks/fast_path_sample.jsonl (default): the dataset messages plus greetings, short
+  questions, spam and abuse, labelled by hand with the route and moderation action
+- a JSONL log written by the agents with FAST_PATH_LABEL_LOG=<path> (--labels <path>)
+- a live Ollama at OLLAMA_HOST (--live)
+
+    python -m benchmarks.bench_fast_path
+    python -m benchmarks.bench_fast_path --labels llm_labels.jsonl
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+MERCHANT_DATA_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data', 'fake_merchant_dataset.csv'))
+SAMPLE_PATH = os.path.join(os.path.dirname(__file__), 'fast_path_sample.jsonl')
+
+
+def load_sample(path=SAMPLE_PATH):
+    labels = {"router": {}, "moderator": {}}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            entry = json.loads(line)
+            labels["router"][entry["message"]] = entry["route"]
+            labels["moderator"][entry["message"]] = {"action": entry["moderation"]}
+    return labels
+
+
+def load_logged_labels(path):
+    labels = {"router": {}, "moderator": {}}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            entry = json.loads(line)
+            labels[entry["agent"]][entry["message"]] = entry["label"]
+    return labels
+
+
+async def llm_labels(messages):
+    """Ask the LLM directly, bypassing the fast path."""
+    from agents import fast_path
+    from agents.router_agent import RouterAgent
+    from agents.moderator_agent import ModeratorAgent
+
+    fast_path.FAST_PATH_ENABLED = False
+    router, moderator = RouterAgent(), ModeratorAgent()
+    routes = await asyncio.gather(*(router.classify(m) for m in messages))
+    verdicts = await asyncio.gather(*(moderator.moderate(m) for m in messages))
+    fast_path.FAST_PATH_ENABLED = True
+    return {"router": dict(zip(messages, routes)), "moderator": dict(zip(messages, verdicts))}
+
+
+def evaluate(labels):
+    from agents import fast_path
+    rules = {"router": fast_path._route, "moderator": fast_path._moderate}
+
+    print(f"{'agent':>10} {'messages':>9} {'short_circuited':>16} {'accuracy':>9} {'rule_us':>8}")
+    for agent, answers in labels.items():
+        hits, correct, elapsed = 0, 0, 0.0
+        for message, label in answers.items():
+            start = time.perf_counter()
+            answer = rules[agent](fast_path.normalize(message))
+            elapsed += time.perf_counter() - start
+            if answer is None:
+                continue
+            hits += 1
+            if agent == "router":
+                correct += answer == label
+            else:
+                correct += answer["action"] == label["action"]
+        n = len(answers)
+        accuracy = f"{correct / hits:.3f}" if hits else "n/a"
+        print(f"{agent:>10} {n:>9} {hits / n:>16.1%} {accuracy:>9} {elapsed / n * 1e6:>8.1f}")
+
+
+def run(labels_path, live):
+    if labels_path:
+        evaluate(load_logged_labels(labels_path))
+    elif live:
+        messages = list(dict.fromkeys(pd.read_csv(MERCHANT_DATA_PATH)['message'].astype(str)))
+        evaluate(asyncio.run(llm_labels(messages)))
+    else:
+        evaluate(load_sample())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--labels", help="JSONL file written via FAST_PATH_LABEL_LOG")
+    parser.add_argument("--live", action="store_true", help="label the dataset with the Ollama at OLLAMA_HOST")
+    args = parser.parse_args()
+    run(args.labels, args.live)
@@ -0,0 +1,82 @@
+"""
+Memory, /mcp/status serialization time and per-user lookup time of the old unbounded
+feedback list against FeedbackStore, as feedback accumulates.
+
+    python -m benchmarks.bench_feedback --entries 1000 10000 100000
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from agents.feedback_store import FeedbackStore
+
+HISTORY = [{"user_id": "001", "message": "tenho interesse em roupa masculina"},
+           {"user_id": "001", "message": "quero vender mais"}] * 5
+METADATA = {"source": "bench", "channel": "whatsapp", "session": "x" * 64}
+
+
+def entries(n):
+    for i in range(n):
+        yield (f"{i % 2000:04d}", f"procuro parceiro para frete {i}", "thumbs-down" if i % 5 == 0 else "thumbs-up",
+               [f"{(i * 7) % 2000:04d}"])
+
+
+def fill_list(n):
+    memory = []
+    for user_id, message, feedback, match_ids in entries(n):
+        memory.append({"user_id": user_id, "message": message, "feedback": feedback,
+                       "metadata": dict(METADATA), "history": list(HISTORY)})
+    return memory
+
+
+def fill_store(n, path):
+    store = FeedbackStore(path=path)
+    for user_id, message, feedback, match_ids in entries(n):
+        store.append(user_id, message, feedback, match_ids, dict(METADATA), list(HISTORY))
+    return store
+
+
+def measure(fill, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    value = fill(*args)
+    fill_seconds = time.perf_counter() - start
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return value, fill_seconds, memory
+
+
+def timed_ms(func, repeat=20):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) * 1000 / repeat
+
+
+def run(sizes):
+    print(f"{'entries':>8} {'kind':>6} {'memory_mb':>10} {'append_us':>10} {'status_ms':>10} {'lookup_ms':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in sizes:
+            memory, seconds, used = measure(fill_list, n)
+            status = timed_ms(lambda: json.dumps(memory))
+            lookup = timed_ms(lambda: [e for e in memory if e["user_id"] == "0001"])
+            print(f"{n:>8} {'list':>6} {used / 2**20:>10.1f} {seconds / n * 1e6:>10.1f} {status:>10.2f} {lookup:>10.3f}")
+            del memory
+
+            store, seconds, used = measure(fill_store, n, os.path.join(tmp, f"feedback_{n}.sqlite3"))
+            status = timed_ms(lambda: json.dumps({"feedback_memory": store.page(), "feedback": store.stats()}))
+            lookup = timed_ms(lambda: store.rejected_partners("0001"))
+            print(f"{n:>8} {'store':>6} {used / 2**20:>10.1f} {seconds / n * 1e6:>10.1f} {status:>10.2f} {lookup:>10.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, nargs="+", default=[1000, 10000, 100000])
+    args = parser.parse_args()
+    run(args.entries)
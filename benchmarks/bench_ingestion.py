@@ -0,0 +1,59 @@
+"""
+Vector index ingestion throughput: per-row add() against bulk add_batch().
+
+    python -m benchmarks.bench_ingestion --size 5000 --latency 0.002
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.stub_ollama import StubOllamaServer
+from benchmarks.synthetic import make_merchant_frame
+
+
+def ingest_per_row(index, ids, texts):
+    for merchant_id, text in zip(ids, texts):
+        index.add(merchant_id, text)
+
+
+def run(size, latency, backends):
+    df = make_merchant_frame(size)
+    ids, texts = df['merchant_id'].tolist(), df['message'].tolist()
+
+    with StubOllamaServer(latency=latency) as stub, tempfile.TemporaryDirectory() as tmp:
+        os.environ["OLLAMA_HOST"] = stub.url
+        # Stub vectors must never land in the real on-disk embedding cache
+        os.environ["EMBEDDING_CACHE_PATH"] = ""
+        from agents import vector_backends
+        from agents.embedding_cache import EmbeddingCache
+        from agents.vector_backends import FaissIndex, ChromaDBIndex
+
+        factories = {
+            "faiss": FaissIndex,
+            "chromadb": lambda: ChromaDBIndex(collection_name=f"bench_{time.time_ns()}",
+                                              persist_directory=os.path.join(tmp, "chroma")),
+        }
+        print(f"{'backend':>9} {'path':>9} {'rows':>7} {'http_calls':>11} {'seconds':>8} {'rows/sec':>9}")
+        for backend in backends:
+            for path, ingest in (("per-row", ingest_per_row), ("bulk", lambda i, *a: i.add_batch(*a))):
+                index = factories[backend]()
+                vector_backends.embedding_cache = EmbeddingCache(path=None)
+                stub.reset()
+                start = time.perf_counter()
+                ingest(index, ids, texts)
+                seconds = time.perf_counter() - start
+                print(f"{backend:>9} {path:>9} {size:>7} {sum(stub.calls.values()):>11} "
+                      f"{seconds:>8.2f} {size / seconds:>9.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=5000)
+    parser.add_argument("--latency", type=float, default=0.002, help="stub latency per HTTP call in seconds")
+    parser.add_argument("--backends", nargs="+", default=["faiss", "chromadb"])
+    args = parser.parse_args()
+    run(args.size, args.latency, args.backends)
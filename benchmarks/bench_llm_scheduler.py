@@ -0,0 +1,99 @@
+"""
+A burst of concurrent AgentOrchestrator.run calls against the stub Ollama server with
+different LLM scheduler settings: a queue large enough to never shed (every request
+waits its turn), a bounded queue that sheds the lowest priority calls, and the large
+queue with a per-request deadline that drops calls still waiting when it passes.
+Degraded requests are the ones that had at least one LLM call shed or expired and
+were answered by a fallback.
+
+    python -m benchmarks.bench_llm_scheduler --latency 0.1 --burst 200 --queue 64 --deadline-ms 500
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.stub_ollama import StubOllamaServer
+
+MERCHANT_DATA_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data', 'fake_merchant_dataset.csv'))
+
+MESSAGES = [
+    ("Tem alguém que faz doces para festas na zona leste?", "001"),
+    ("Quero dividir frete para entregas em Campinas. Quem topa?", "002"),
+    ("Alguém indica um contador bom em Santos?", "003"),
+    ("Qual foi o último jogo do Palmeiras?", "004"),
+]
+
+
+async def burst(orchestrator, n, deadline_ms):
+    from agents import ollama_client
+    from agents.orchestrator import AgentInput
+
+    async def one(i):
+        message, user_id = MESSAGES[i % len(MESSAGES)]
+        start = time.perf_counter()
+        # A distinct suffix keeps every request on the LLM path
+        output = await orchestrator.run(AgentInput(message=f"{message} #{i}", user_id=user_id,
+                                                   deadline_ms=deadline_ms))
+        return (time.perf_counter() - start) * 1000, output.metrics["total"]["llm_shed"] > 0
+
+    results = await asyncio.gather(*(one(i) for i in range(n)))
+    stats = ollama_client.scheduler_stats()
+    # Drop this loop's client and scheduler so the next scenario starts from zero
+    await ollama_client.aclose()
+    return results, stats
+
+
+async def warm_up(matchmaker):
+    from agents import ollama_client
+    await matchmaker.classify_all_marketing()
+    await ollama_client.aclose()
+
+
+def run(latency, n, queue, deadline_ms):
+    with StubOllamaServer(latency=latency) as stub, tempfile.TemporaryDirectory() as tmp:
+        os.environ["OLLAMA_HOST"] = stub.url
+        os.environ["FEATURE_STORE_DIR"] = tmp
+        os.environ["EMBEDDING_CACHE_PATH"] = ""
+        os.environ["RESPONSE_CACHE_SIZE"] = "0"
+        from agents import llm_scheduler
+        from agents.matchmaker_agent import MatchmakerAgent
+        from agents.orchestrator import AgentOrchestrator
+
+        matchmaker = MatchmakerAgent(MERCHANT_DATA_PATH, feature_store_dir=tmp, build_index=False)
+        orchestrator = AgentOrchestrator(MERCHANT_DATA_PATH, matchmaker=matchmaker)
+        asyncio.run(warm_up(matchmaker))
+        print(f"{'scenario':>24} {'p50_ms':>9} {'p95_ms':>9} {'p99_ms':>9} {'degraded':>9} {'llm_calls':>10} "
+              f"{'shed':>6} {'expired':>8} {'max_depth':>10}")
+        for label, queue_size, deadline in (("unbounded queue", 1_000_000, None),
+                                            (f"queue {queue}", queue, None),
+                                            (f"deadline {deadline_ms:.0f}ms", 1_000_000, deadline_ms)):
+            # Each asyncio.run gets a fresh scheduler sized from LLM_QUEUE_SIZE
+            llm_scheduler.LLM_QUEUE_SIZE = queue_size
+            stub.reset()
+            with contextlib.redirect_stdout(io.StringIO()):
+                results, stats = asyncio.run(burst(orchestrator, n, deadline))
+            latencies = np.array([ms for ms, _ in results])
+            degraded = sum(1 for _, shed in results if shed)
+            print(f"{label:>24} {np.percentile(latencies, 50):>9.1f} {np.percentile(latencies, 95):>9.1f} "
+                  f"{np.percentile(latencies, 99):>9.1f} {degraded:>9} {stub.calls['/api/generate']:>10} "
+                  f"{sum(stats['shed'].values()):>6} {sum(stats['expired'].values()):>8} "
+                  f"{stats['max_queue_depth']:>10}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.1, help="stub latency per LLM call in seconds")
+    parser.add_argument("--burst", type=int, default=200, help="concurrent requests")
+    parser.add_argument("--queue", type=int, default=64, help="LLM_QUEUE_SIZE of the bounded scenario")
+    parser.add_argument("--deadline-ms", type=float, default=500, help="per-request deadline of the last scenario")
+    args = parser.parse_args()
+    run(args.latency, args.burst, args.queue, args.deadline_ms)
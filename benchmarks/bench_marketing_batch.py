@@ -0,0 +1,55 @@
+"""
+LLM calls and wall time of MatchmakerAgent.find_matches per marketing classification mode.
+
+Runs against the stub Ollama server, so no model is needed:
+
+    python -m benchmarks.bench_marketing_batch --sizes 100 1000 10000 --latency 0.005
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.stub_ollama import StubOllamaServer
+from benchmarks.synthetic import write_merchant_csv
+
+QUERY = "quero divulgar promoções da minha loja"
+
+
+def run(sizes, modes, latency):
+    with StubOllamaServer(latency=latency) as stub:
+        os.environ["OLLAMA_HOST"] = stub.url
+        # Each run must pay for its own LLM calls instead of reusing cached answers
+        os.environ["RESPONSE_CACHE_SIZE"] = "0"
+        # Import after OLLAMA_HOST is set, the client reads it at import time
+        from agents.matchmaker_agent import MatchmakerAgent
+
+        print(f"{'merchants':>10} {'mode':>11} {'llm_calls':>10} {'wall_s':>9}")
+        with tempfile.TemporaryDirectory() as tmp:
+            for size in sizes:
+                path = write_merchant_csv(os.path.join(tmp, f"merchants_{size}.csv"), size)
+                for mode in modes:
+                    agent = MatchmakerAgent(path, marketing_batch_mode=mode,
+                                            feature_store_dir=os.path.join(tmp, f"features_{mode}"))
+                    user_id = agent.df.iloc[0]['merchant_id']
+                    stub.reset()
+                    start = time.perf_counter()
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        asyncio.run(agent.find_matches(user_id, QUERY))
+                    elapsed = time.perf_counter() - start
+                    print(f"{size:>10} {mode:>11} {stub.calls['/api/generate']:>10} {elapsed:>9.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--modes", nargs="+", default=["sequential", "concurrent", "prompt"])
+    parser.add_argument("--latency", type=float, default=0.0, help="stub latency per LLM call in seconds")
+    args = parser.parse_args()
+    run(args.sizes, args.modes, args.latency)
@@ -0,0 +1,94 @@
+"""
+A burst of merchant messages sent one orchestrator run at a time, concurrently,
+through the request coalescer and as a single run_batch call.
+
+About a third of the burst repeats earlier messages, as forwarded chat bursts do.
+
+    python -m benchmarks.bench_message_batch --size 60 --latency 0.1
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.stub_ollama import StubOllamaServer
+
+MERCHANT_DATA_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data', 'fake_merchant_dataset.csv'))
+
+TEMPLATES = [
+    "Quero dividir frete para entregas em {city}. Quem topa?",
+    "Tem alguém que faz doces para festas em {city}?",
+    "Procuro parceiro para vender cestas de café da manhã em {city}",
+    "Alguém indica um contador bom em {city}?",
+    "Qual foi o último jogo do time de {city}?",
+]
+CITIES = ["Campinas", "Santos", "Sorocaba", "Jundiaí", "Osasco", "Guarulhos", "Barueri", "Taubaté"]
+
+
+def make_burst(size, seed=0):
+    from agents.orchestrator import AgentInput
+    rng = random.Random(seed)
+    inputs = []
+    for _ in range(size):
+        if inputs and rng.random() < 0.33:
+            inputs.append(rng.choice(inputs))
+        else:
+            message = rng.choice(TEMPLATES).format(city=rng.choice(CITIES))
+            inputs.append(AgentInput(message=message, user_id=f"{rng.randint(1, 20):03d}"))
+    return inputs
+
+
+async def run_mode(orchestrator, mode, inputs):
+    from api.coalescer import MessageCoalescer
+    if mode == "sequential":
+        for item in inputs:
+            await orchestrator.run(item)
+    elif mode == "concurrent":
+        await asyncio.gather(*(orchestrator.run(item) for item in inputs))
+    elif mode == "coalesced":
+        coalescer = MessageCoalescer(orchestrator.run_batch, window_ms=20)
+        await asyncio.gather(*(coalescer.submit(item) for item in inputs))
+    else:
+        await orchestrator.run_batch(inputs)
+
+
+def run(size, latency):
+    with StubOllamaServer(latency=latency) as stub, tempfile.TemporaryDirectory() as tmp:
+        os.environ["OLLAMA_HOST"] = stub.url
+        os.environ["FEATURE_STORE_DIR"] = tmp
+        os.environ["EMBEDDING_CACHE_PATH"] = ""
+        from agents.matchmaker_agent import MatchmakerAgent
+        from agents.orchestrator import AgentOrchestrator
+        from agents.response_cache import response_cache
+
+        inputs = make_burst(size)
+        matchmaker = MatchmakerAgent(MERCHANT_DATA_PATH, feature_store_dir=tmp, build_index=False)
+        orchestrator = AgentOrchestrator(MERCHANT_DATA_PATH, matchmaker=matchmaker)
+        # Marketing verdicts are filled once, so every mode pays only for triage
+        asyncio.run(matchmaker.classify_all_marketing())
+
+        print(f"{'mode':>11} {'messages':>9} {'llm_calls':>10} {'seconds':>8} {'messages/sec':>13}")
+        for mode in ("sequential", "concurrent", "coalesced", "batch"):
+            response_cache.clear()
+            stub.reset()
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                asyncio.run(run_mode(orchestrator, mode, inputs))
+            seconds = time.perf_counter() - start
+            print(f"{mode:>11} {len(inputs):>9} {stub.calls['/api/generate']:>10} {seconds:>8.2f} "
+                  f"{len(inputs) / seconds:>13.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=60)
+    parser.add_argument("--latency", type=float, default=0.1, help="stub latency per LLM call in seconds")
+    args = parser.parse_args()
+    run(args.size, args.latency)
@@ -0,0 +1,92 @@
+"""
+Latency and agreement of the router, moderator and marketing classifications with the
+large model alone, the small model alone and the small-then-large cascade.
+
+The stub server stands in for both models: the small one answers faster and gets a
+fraction of the prompts wrong (unparseable or unsure). Agreement is measured against
+the large model's answers; the fast-path rules and the response cache are off so
+every message reaches a model.
+
+    python -m benchmarks.bench_model_cascade --messages 300 --large-latency 0.1 --small-latency 0.02 --noise 0.15
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.stub_ollama import StubOllamaServer
+from benchmarks.synthetic import MESSAGE_TEMPLATES, PRODUCTS, CITIES
+
+
+def messages(n: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    return [f"{rng.choice(MESSAGE_TEMPLATES).format(product=rng.choice(PRODUCTS), city=rng.choice(CITIES))} "
+            f"({i})" for i in range(n)]
+
+
+async def classify_all(router, moderator, marketing, texts, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(text):
+        async with semaphore:
+            start = time.perf_counter()
+            answers = await asyncio.gather(router.classify(text), moderator.moderate(text), marketing(text))
+            return (time.perf_counter() - start) * 1000, answers
+
+    return await asyncio.gather(*(one(t) for t in texts))
+
+
+def run(n, concurrency, large_latency, small_latency, noise, min_confidence):
+    models = {"large": {"latency": large_latency}, "small": {"latency": small_latency, "noise": noise}}
+    with StubOllamaServer(models=models) as stub:
+        os.environ.update({"OLLAMA_HOST": stub.url, "FAST_PATH_ENABLED": "0", "RESPONSE_CACHE_SIZE": "0"})
+        from agents.model_cascade import ModelCascade
+        from agents.ollama_client import OllamaClient
+        from agents.router_agent import RouterAgent
+        from agents.moderator_agent import ModeratorAgent
+        from agents.matchmaker_agent import MARKETING_PROMPT, parse_yes_no
+
+        texts = messages(n)
+        reference = None
+        print(f"{'mode':>10} {'p50_ms':>8} {'p95_ms':>8} {'large_calls':>12} {'small_calls':>12} "
+              f"{'route_agree':>12} {'moderation_agree':>17} {'marketing_agree':>16}")
+        for mode, model, fast_model in (("large", "large", ""), ("small", "small", ""), ("cascade", "large", "small")):
+            router, moderator = RouterAgent(model, fast_model), ModeratorAgent(model, fast_model)
+            for cascade in (router.cascade, moderator.cascade):
+                cascade.min_confidence = min_confidence
+            marketing_cascade = ModelCascade(f"bench_{mode}", OllamaClient(model), fast_model, min_confidence)
+
+            async def marketing(text):
+                verdict, _ = await marketing_cascade.classify(MARKETING_PROMPT.format(text=text), parse_yes_no)
+                return verdict
+
+            stub.reset()
+            with contextlib.redirect_stdout(io.StringIO()):
+                results = asyncio.run(classify_all(router, moderator, marketing, texts, concurrency))
+            latencies = np.array([ms for ms, _ in results])
+            answers = [a for _, a in results]
+            if reference is None:
+                reference = answers
+            agree = [np.mean([a[k] == r[k] for a, r in zip(answers, reference)]) for k in range(3)]
+            print(f"{mode:>10} {np.percentile(latencies, 50):>8.1f} {np.percentile(latencies, 95):>8.1f} "
+                  f"{stub.model_calls['large']:>12} {stub.model_calls['small']:>12} "
+                  f"{agree[0]:>12.1%} {agree[1]:>17.1%} {agree[2]:>16.1%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--large-latency", type=float, default=0.1, help="stub latency of the large model")
+    parser.add_argument("--small-latency", type=float, default=0.02, help="stub latency of the small model")
+    parser.add_argument("--noise", type=float, default=0.15, help="fraction of bad small-model answers")
+    parser.add_argument("--min-confidence", type=float, default=0.8, help="CASCADE_MIN_CONFIDENCE")
+    args = parser.parse_args()
+    run(args.messages, args.concurrency, args.large_latency, args.small_latency, args.noise, args.min_confidence)
@@ -0,0 +1,71 @@
+"""
+Per-step timings of AgentOrchestrator.run with serial and concurrent triage.
+
+    python -m benchmarks.bench_orchestrator --latency 0.1
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.stub_ollama import StubOllamaServer
+
+MERCHANT_DATA_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data', 'fake_merchant_dataset.csv'))
+
+MESSAGES = [
+    ("Preciso de ajuda com divulgação no Instagram", "001"),
+    ("Tem alguém que faz doces para festas na zona leste?", "001"),
+    ("Quero dividir frete para entregas em Campinas. Quem topa?", "002"),
+    ("Conteúdo ofensivo que deve ser bloqueado", "003"),
+    ("Qual foi o último jogo do Palmeiras?", "004"),
+]
+
+MODES = {
+    "serial": dict(parallel=False),
+    "parallel": dict(parallel=True, speculative_matching=False),
+    "speculative": dict(parallel=True, speculative_matching=True),
+}
+
+
+async def run_mode(orchestrator, rounds):
+    from agents.orchestrator import AgentInput
+    timings = []
+    for _ in range(rounds):
+        for message, user_id in MESSAGES:
+            with contextlib.redirect_stdout(io.StringIO()):
+                output = await orchestrator.run(AgentInput(message=message, user_id=user_id))
+            timings.append(output.timings)
+    return timings
+
+
+def run(latency, rounds):
+    with StubOllamaServer(latency=latency) as stub, tempfile.TemporaryDirectory() as tmp:
+        os.environ["OLLAMA_HOST"] = stub.url
+        os.environ["FEATURE_STORE_DIR"] = tmp
+        os.environ["EMBEDDING_CACHE_PATH"] = ""
+        # Each run must pay for its own LLM calls instead of reusing cached answers
+        os.environ["RESPONSE_CACHE_SIZE"] = "0"
+        from agents.orchestrator import AgentOrchestrator
+
+        steps = ["RouterAgent", "ModeratorAgent", "MatchmakerAgent", "total"]
+        print(f"{'mode':>12} " + " ".join(f"{s + '_ms':>18}" for s in steps))
+        for mode, options in MODES.items():
+            orchestrator = AgentOrchestrator(MERCHANT_DATA_PATH, **options)
+            timings = asyncio.run(run_mode(orchestrator, rounds))
+            means = [np.mean([t[s] for t in timings if s in t]) for s in steps]
+            print(f"{mode:>12} " + " ".join(f"{m:>18.1f}" for m in means))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.1, help="stub latency per LLM call in seconds")
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+    run(args.latency, args.rounds)
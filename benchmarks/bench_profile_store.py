@@ -0,0 +1,73 @@
+"""
+Memory and lookup latency of MerchantProfileStore versus boolean-mask scans of the DataFrame.
+
+    python -m benchmarks.bench_profile_store --sizes 100000 1000000
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from agents.profile_store import MerchantProfileStore
+from benchmarks.synthetic import make_merchant_frame
+
+
+def mask_lookup(df, merchant_id):
+    row = df[df['merchant_id'] == merchant_id]
+    if not row.empty:
+        return row.iloc[0]['city'], row.iloc[0].get('mcc_description', merchant_id)
+    return None
+
+
+def store_lookup(profiles, merchant_id):
+    profile = profiles.get(merchant_id)
+    if profile is not None:
+        return profile['city'], profiles.name(merchant_id)
+    return None
+
+
+def time_lookups(lookup, source, ids):
+    timings = []
+    for merchant_id in ids:
+        start = time.perf_counter()
+        lookup(source, merchant_id)
+        timings.append((time.perf_counter() - start) * 1e6)
+    return np.median(timings)
+
+
+def run(sizes, lookups, mask_lookups):
+    print(f"{'rows':>9} {'merchants':>10} {'df_mb':>7} {'store_mb':>9} {'build_s':>8} "
+          f"{'mask_us_p50':>12} {'store_us_p50':>13}")
+    for size in sizes:
+        # Interleave merchants like a real append-only message log
+        df = make_merchant_frame(size).sample(frac=1, random_state=0).reset_index(drop=True)
+        df_mb = df.memory_usage(deep=True).sum() / 1e6
+
+        start = time.perf_counter()
+        MerchantProfileStore.build(df)
+        build_s = time.perf_counter() - start
+        # Memory still allocated after the build is what the store itself holds
+        tracemalloc.start()
+        profiles = MerchantProfileStore.build(df)
+        store_mb = tracemalloc.get_traced_memory()[0] / 1e6
+        tracemalloc.stop()
+
+        ids = np.random.default_rng(1).choice(profiles.merchant_id, size=lookups).tolist()
+        mask_us = time_lookups(mask_lookup, df, ids[:mask_lookups])
+        store_us = time_lookups(store_lookup, profiles, ids)
+        print(f"{size:>9} {len(profiles):>10} {df_mb:>7.1f} {store_mb:>9.1f} {build_s:>8.2f} "
+              f"{mask_us:>12.1f} {store_us:>13.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100000, 1000000])
+    parser.add_argument("--lookups", type=int, default=10000)
+    parser.add_argument("--mask-lookups", type=int, default=20, help="mask scans are slow, time fewer of them")
+    args = parser.parse_args()
+    run(args.sizes, args.lookups, args.mask_lookups)
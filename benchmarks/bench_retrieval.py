@@ -0,0 +1,86 @@
+"""
+Recall and latency of two-stage (ANN retrieval + rerank) matchmaking against the full scan.
+
+Builds a FAISS index over a synthetic merchant table using the stub Ollama server's
+embeddings, then compares find_matches top-5 results for several candidate_k values:
+
+    python -m benchmarks.bench_retrieval --size 5000 --ks 50 200 1000
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.stub_ollama import StubOllamaServer
+from benchmarks.synthetic import write_merchant_csv
+
+QUERIES = [
+    "quero divulgar promoções da minha loja",
+    "preciso de fornecedores de embalagens na minha região",
+    "alguém para dividir frete de doces para Campinas?",
+    "procuro quem faça posts no instagram para minha loja de cosméticos",
+    "busco parceiros para eventos de flores",
+    "quero vender brinquedos no atacado",
+]
+
+
+async def timed_matches(agent, user_id, message):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        matches = await agent.find_matches(user_id, message)
+    return matches, (time.perf_counter() - start) * 1000
+
+
+def run(size, ks, users):
+    with StubOllamaServer() as stub, tempfile.TemporaryDirectory() as tmp:
+        os.environ["OLLAMA_HOST"] = stub.url
+        # Stub vectors must never land in the real on-disk embedding cache
+        os.environ["EMBEDDING_CACHE_PATH"] = ""
+        # Each run must pay for its own LLM calls instead of reusing cached answers
+        os.environ["RESPONSE_CACHE_SIZE"] = "0"
+        os.environ["VECTOR_BACKEND"] = "faiss"
+        from agents.matchmaker_agent import MatchmakerAgent
+        from agents.feature_store import MARKETING_UNKNOWN
+
+        path = write_merchant_csv(os.path.join(tmp, "merchants.csv"), size)
+        agent = MatchmakerAgent(path, feature_store_dir=os.path.join(tmp, "features"), candidate_k=0)
+        user_ids = list(dict.fromkeys(agent.df['merchant_id']))[:users]
+
+        reference = {}
+        for user_id in user_ids:
+            for message in QUERIES:
+                reference[user_id, message] = asyncio.run(timed_matches(agent, user_id, message))
+
+        print(f"{'candidate_k':>11} {'recall@5':>9} {'p50_ms':>8} {'p95_ms':>8} {'llm_calls':>10}")
+        for k in [0] + ks:
+            agent.candidate_k = k
+            # Start every mode with cold marketing verdicts so LLM calls are comparable
+            agent.features.marketing[:] = MARKETING_UNKNOWN
+            stub.reset()
+            recalls, latencies = [], []
+            for (user_id, message), (expected, _) in reference.items():
+                matches, elapsed = asyncio.run(timed_matches(agent, user_id, message))
+                latencies.append(elapsed)
+                if expected:
+                    found = {(m['id'], m['message']) for m in matches}
+                    recalls.append(len(found & {(m['id'], m['message']) for m in expected}) / len(expected))
+            label = "full scan" if k == 0 else k
+            print(f"{label:>11} {np.mean(recalls):>9.3f} {np.percentile(latencies, 50):>8.2f} "
+                  f"{np.percentile(latencies, 95):>8.2f} {stub.calls['/api/generate']:>10}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=5000)
+    parser.add_argument("--ks", type=int, nargs="+", default=[50, 200, 1000])
+    parser.add_argument("--users", type=int, default=5)
+    args = parser.parse_args()
+    run(args.size, args.ks, args.users)
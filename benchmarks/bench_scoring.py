@@ -0,0 +1,54 @@
+"""
+Latency of the vectorized matchmaking scoring engine over large merchant tables.
+
+    python -m benchmarks.bench_scoring --sizes 10000 100000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from agents.feature_store import MerchantFeatureStore, keyword_tokens, is_request_message
+from agents.scoring import score_rows, top_k_rows
+from benchmarks.synthetic import make_merchant_frame
+
+QUERIES = [
+    "quero divulgar promoções da minha loja",
+    "preciso de fornecedores de embalagens na minha região",
+    "alguém para dividir frete de doces para Campinas?",
+]
+
+
+def run(sizes, repeats):
+    print(f"{'merchants':>10} {'build_s':>8} {'score_ms_p50':>13} {'score_ms_max':>13}")
+    for size in sizes:
+        df = make_merchant_frame(size)
+        start = time.perf_counter()
+        store = MerchantFeatureStore.build(df)
+        build_s = time.perf_counter() - start
+
+        marketing = np.random.default_rng(0).random(size) < 0.3
+        user_id = store.merchant_id[0]
+        user_city = store.city[0]
+        timings = []
+        for r in range(repeats):
+            message = QUERIES[r % len(QUERIES)]
+            start = time.perf_counter()
+            candidates = np.flatnonzero(store.merchant_id != user_id)
+            scores, city_match = score_rows(store, user_city, store.query_token_ids(keyword_tokens(message)),
+                                            is_request_message(message), marketing)
+            top_k_rows(scores, city_match, candidates)
+            timings.append((time.perf_counter() - start) * 1000)
+        print(f"{size:>10} {build_s:>8.2f} {np.median(timings):>13.2f} {max(timings):>13.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--repeats", type=int, default=30)
+    args = parser.parse_args()
+    run(args.sizes, args.repeats)
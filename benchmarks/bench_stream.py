@@ -0,0 +1,73 @@
+"""
+Time to first event against total latency of AgentOrchestrator.run_stream, with
+many streams open at once as concurrent /mcp/stream sockets would have.
+
+    python -m benchmarks.bench_stream --latency 0.1 --streams 1 10 50
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.stub_ollama import StubOllamaServer
+
+MERCHANT_DATA_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data', 'fake_merchant_dataset.csv'))
+
+MESSAGES = [
+    ("Tem alguém que faz doces para festas na zona leste?", "001"),
+    ("Quero dividir frete para entregas em Campinas. Quem topa?", "002"),
+    ("Alguém indica um contador bom em Santos?", "003"),
+    ("Qual foi o último jogo do Palmeiras?", "004"),
+]
+
+
+async def stream_one(orchestrator, message, user_id):
+    from agents.orchestrator import AgentInput
+    start = time.perf_counter()
+    first = None
+    async for event in orchestrator.run_stream(AgentInput(message=message, user_id=user_id)):
+        if first is None:
+            first = time.perf_counter() - start
+    return first * 1000, (time.perf_counter() - start) * 1000
+
+
+async def run_streams(orchestrator, streams):
+    return await asyncio.gather(*(stream_one(orchestrator, *MESSAGES[i % len(MESSAGES)]) for i in range(streams)))
+
+
+def run(latency, streams):
+    with StubOllamaServer(latency=latency) as stub, tempfile.TemporaryDirectory() as tmp:
+        os.environ["OLLAMA_HOST"] = stub.url
+        os.environ["FEATURE_STORE_DIR"] = tmp
+        os.environ["EMBEDDING_CACHE_PATH"] = ""
+        # Each stream must pay for its own LLM calls instead of reusing cached answers
+        os.environ["RESPONSE_CACHE_SIZE"] = "0"
+        from agents.matchmaker_agent import MatchmakerAgent
+        from agents.orchestrator import AgentOrchestrator
+
+        matchmaker = MatchmakerAgent(MERCHANT_DATA_PATH, feature_store_dir=tmp, build_index=False)
+        orchestrator = AgentOrchestrator(MERCHANT_DATA_PATH, matchmaker=matchmaker)
+        asyncio.run(matchmaker.classify_all_marketing())
+        print(f"{'streams':>8} {'first_p50_ms':>13} {'first_p95_ms':>13} {'total_p50_ms':>13} {'total_p95_ms':>13}")
+        for n in streams:
+            with contextlib.redirect_stdout(io.StringIO()):
+                results = np.array(asyncio.run(run_streams(orchestrator, n)))
+            first, total = results[:, 0], results[:, 1]
+            print(f"{n:>8} {np.percentile(first, 50):>13.1f} {np.percentile(first, 95):>13.1f} "
+                  f"{np.percentile(total, 50):>13.1f} {np.percentile(total, 95):>13.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.1, help="stub latency per LLM call in seconds")
+    parser.add_argument("--streams", type=int, nargs="+", default=[1, 10, 50])
+    args = parser.parse_args()
+    run(args.latency, args.streams)
@@ -0,0 +1,71 @@
+"""
+Prompt tokens, completion tokens, LLM calls and latency of split vs combined triage.
+
+Token counts come from Ollama's prompt_eval_count / eval_count; against the stub
+server they are approximated as four characters per token. Point OLLAMA_HOST at
+a real Ollama (with --live) to measure actual tokens and latency.
+
+    python -m benchmarks.bench_triage --latency 0.1
+"""
+import argparse
+import asyncio
+import contextlib
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.stub_ollama import StubOllamaServer
+
+MESSAGES = [
+    "Preciso de ajuda com divulgação no Instagram",
+    "Tem alguém que faz doces para festas na zona leste?",
+    "Quero dividir frete para entregas em Campinas. Quem topa?",
+    "COMPRE AGORA! OFERTA POR TEMPO LIMITADO!",
+    "Qual foi o último jogo do Palmeiras?",
+    "oi",
+]
+
+
+async def measure(mode):
+    from agents.router_agent import RouterAgent
+    from agents.moderator_agent import ModeratorAgent
+    from agents.triage_agent import TriageAgent
+
+    router, moderator, triage = RouterAgent(), ModeratorAgent(), TriageAgent()
+    latencies = []
+    for message in MESSAGES:
+        start = time.perf_counter()
+        if mode == "combined":
+            await triage.triage(message)
+        else:
+            await asyncio.gather(router.classify(message), moderator.moderate(message))
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    usage = {key: sum(agent.llm.usage[key] for agent in (router, moderator, triage))
+             for key in ("calls", "prompt_tokens", "completion_tokens")}
+    return usage, latencies
+
+
+def run(latency, live):
+    stub = contextlib.nullcontext() if live else StubOllamaServer(latency=latency)
+    with stub as server:
+        if server is not None:
+            os.environ["OLLAMA_HOST"] = server.url
+        n = len(MESSAGES)
+        print(f"{'mode':>9} {'calls/msg':>10} {'prompt_tok/msg':>15} {'compl_tok/msg':>14} {'p50_ms':>7} {'max_ms':>7}")
+        for mode in ("split", "combined"):
+            usage, latencies = asyncio.run(measure(mode))
+            print(f"{mode:>9} {usage['calls'] / n:>10.1f} {usage['prompt_tokens'] / n:>15.1f} "
+                  f"{usage['completion_tokens'] / n:>14.1f} {np.median(latencies):>7.1f} {max(latencies):>7.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.1, help="stub latency per LLM call in seconds")
+    parser.add_argument("--live", action="store_true", help="use the Ollama at OLLAMA_HOST instead of the stub")
+    args = parser.parse_args()
+    run(args.latency, args.live)
@@ -0,0 +1,90 @@
+"""
+Propagation latency and throughput of incremental merchant updates, against a full rebuild.
+
+Builds a FAISS-backed matchmaker over a synthetic CSV with the stub Ollama server, then
+measures single-merchant upserts, batched upserts and a file-watch poll after a CSV edit:
+
+    python -m benchmarks.bench_updates --size 20000 --batch 500
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.stub_ollama import StubOllamaServer
+from benchmarks.synthetic import write_merchant_csv
+
+
+def updated(profile, i):
+    return {**profile, "messages": profile["messages"][1:] + [f"ofereço serviço novo número {i} de entregas"]}
+
+
+def run(size, singles, batch):
+    with StubOllamaServer() as stub, tempfile.TemporaryDirectory() as tmp:
+        os.environ["OLLAMA_HOST"] = stub.url
+        # Stub vectors must never land in the real on-disk embedding cache
+        os.environ["EMBEDDING_CACHE_PATH"] = ""
+        os.environ["VECTOR_BACKEND"] = "faiss"
+        import pandas as pd
+        from agents.matchmaker_agent import MatchmakerAgent
+        from agents.merchant_updates import MerchantFileWatcher
+
+        path = write_merchant_csv(os.path.join(tmp, "merchants.csv"), size)
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            agent = MatchmakerAgent(path, feature_store_dir=os.path.join(tmp, "features"))
+        rebuild_s = time.perf_counter() - start
+        merchant_ids = list(agent.profiles.index)
+
+        async def measure():
+            latencies = []
+            for i, merchant_id in enumerate(merchant_ids[:singles]):
+                start = time.perf_counter()
+                await agent.apply_changes(upserts=[updated(agent.profiles.get(merchant_id), i)])
+                latencies.append((time.perf_counter() - start) * 1000)
+
+            records = [updated(agent.profiles.get(m), singles + i)
+                       for i, m in enumerate(merchant_ids[singles:singles + batch])]
+            start = time.perf_counter()
+            result = await agent.apply_changes(upserts=records)
+            batch_s = time.perf_counter() - start
+            return latencies, result, batch_s
+
+        stub.reset()
+        latencies, result, batch_s = asyncio.run(measure())
+        single_embeds = stub.calls['/api/embed']
+
+        watcher = MerchantFileWatcher(agent, path, interval=0)
+        df = pd.read_csv(path, dtype={'merchant_id': str})
+        edited = df['merchant_id'].isin(merchant_ids[-batch:])
+        df.loc[edited, 'message'] = df.loc[edited, 'message'] + " e entregas"
+        df.to_csv(path, index=False)
+        os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1))
+        start = time.perf_counter()
+        watched = asyncio.run(watcher.poll_once())
+        watch_s = time.perf_counter() - start
+
+        print(f"rows={size} merchants={len(merchant_ids)} full rebuild={rebuild_s:.2f}s")
+        print(f"single upsert: p50={np.percentile(latencies, 50):.1f} ms p95={np.percentile(latencies, 95):.1f} ms "
+              f"({single_embeds} embed requests for {singles} upserts)")
+        print(f"batch of {result['merchants']} merchants: {batch_s:.2f}s "
+              f"({result['merchants'] / batch_s:.0f} merchants/s, {result['rows_added']} rows embedded)")
+        print(f"file watch poll for {watched['merchants']} edited merchants: {watch_s:.2f}s "
+              f"({watched['rows_added']} rows embedded)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=20000)
+    parser.add_argument("--singles", type=int, default=50)
+    parser.add_argument("--batch", type=int, default=500)
+    args = parser.parse_args()
+    run(args.size, args.singles, args.batch)
@@ -0,0 +1,288 @@
+"""
+Offline stand-in for the Ollama HTTP API used by the benchmarks.
+
+Answers /api/generate, /api/embeddings and /api/embed deterministically with a configurable
+per-request latency and counts every call, so LLM round trips per request can be
+measured without a real model. Models can be given their own latency and a fraction
+of noisy answers, to stand in for a small, fast and less reliable model. Generation
+options are honoured: ``stop`` and ``num_predict`` cut the answer (with ``ramble``
+extra words the way a chatty model adds an explanation) and ``format`` enums are
+answered as JSON strings; ``token_latency`` charges for every generated token.
+"""
+import hashlib
+import json
+import math
+import re
+import socket
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+MARKETING_KEYWORDS = [
+    "divulg", "marketing", "instagram", "insta", "rede social", "redes sociais",
+    "seguidores", "promo", "anúncio", "anuncio", "posts", "propaganda",
+]
+
+EMBEDDING_DIM = 384
+
+PARTNERSHIP_KEYWORDS = ["parceri", "parceiro", "fornecedor", "frete", "conectar", "dividir", "alguém que faz", "quem topa"]
+SERVICE_KEYWORDS = ["como", "ajuda", "preciso", "quero", "procuro", "busco"]
+ABUSIVE_KEYWORDS = ["lixo", "ofensivo", "idiota", "abusivo", "bloquead"]
+SPAM_KEYWORDS = ["compre agora", "tempo limitado", "grátis", "clique aqui"]
+
+_MESSAGE_RE = re.compile(r"\nMessage: (.*)\n(?:Classification|Moderation|Triage):\s*$", re.DOTALL)
+_NUMBERED_LINE_RE = re.compile(r"^\s*(\d+)\.\s+(.*)$", re.MULTILINE)
+_TEXT_RE = re.compile(r"Text:\s*(.*?)\s*Response \(yes/no\):", re.DOTALL)
+
+
+def is_marketing_text(text: str) -> bool:
+    text = text.lower()
+    return any(keyword in text for keyword in MARKETING_KEYWORDS)
+
+
+def stub_route(message: str) -> str:
+    text = message.lower()
+    if any(k in text for k in ABUSIVE_KEYWORDS):
+        return "moderation"
+    if is_marketing_text(text):
+        return "social_media_promotion"
+    if any(k in text for k in PARTNERSHIP_KEYWORDS):
+        return "partnership_request"
+    if any(k in text for k in SERVICE_KEYWORDS):
+        return "service_request"
+    return "fallback"
+
+
+def stub_moderate(message: str) -> str:
+    text = message.lower()
+    if any(k in text for k in SPAM_KEYWORDS):
+        return "flag: spam"
+    if any(k in text for k in ABUSIVE_KEYWORDS):
+        return "flag: abusive content"
+    if len(text.split()) <= 1:
+        return "warn: message too short"
+    return "allow"
+
+
+def stub_triage(message: str) -> str:
+    verdict = stub_moderate(message)
+    action, _, reason = verdict.partition(":")
+    return json.dumps({"route": stub_route(message), "moderation": action, "reason": reason.strip()})
+
+
+def count_tokens(text: str) -> int:
+    """Rough token count (about four characters per token)."""
+    return max(1, len(text) // 4)
+
+
+def stub_generate(prompt: str) -> str:
+    """Deterministic answer for the prompts the agents send."""
+    message = _MESSAGE_RE.search(prompt)
+    if message and prompt.rstrip().endswith("Triage:"):
+        return stub_triage(message.group(1))
+    if message and prompt.rstrip().endswith("Classification:"):
+        return stub_route(message.group(1))
+    if message and prompt.rstrip().endswith("Moderation:"):
+        return stub_moderate(message.group(1))
+    if prompt.rstrip().endswith("Response (yes/no):"):
+        match = _TEXT_RE.search(prompt)
+        return "yes" if match and is_marketing_text(match.group(1)) else "no"
+    if prompt.rstrip().endswith("Triages:"):
+        lines = _NUMBERED_LINE_RE.findall(prompt)
+        return "\n".join(f"{n}: {stub_triage(t)}" for n, t in lines)
+    if prompt.rstrip().endswith("Response:"):
+        lines = _NUMBERED_LINE_RE.findall(prompt)
+        return "\n".join(f"{n}: {'yes' if is_marketing_text(t) else 'no'}" for n, t in lines)
+    return "fallback"
+
+
+def constrain(text: str, body: dict, ramble: int = 0) -> str:
+    """The answer after ``ramble`` words of explanation, cut by the request's stop and num_predict."""
+    # A format schema ends generation with the JSON value, leaving no room to explain
+    if ramble and not body.get("format"):
+        filler = ["a", "mensagem", "trata", "de", "negócios", "entre", "lojistas"] * (ramble // 7 + 1)
+        text += "\nExplicação: " + " ".join(filler[:ramble])
+    options = body.get("options") or {}
+    for stop in options.get("stop") or ():
+        text = text.split(stop, 1)[0]
+    if options.get("num_predict"):
+        text = text[:options["num_predict"] * 4]  # about four characters per token, as in count_tokens
+    return text
+
+
+def _apply_format(text: str, format) -> str:
+    # A schema whose top level is an enum of strings yields one of them as a JSON string
+    if isinstance(format, dict) and format.get("type") == "string" and format.get("enum"):
+        word = text.strip().split(":")[0].strip()
+        return json.dumps(word if word in format["enum"] else format["enum"][0])
+    return text
+
+
+def noisy_answer(text: str, prompt: str, model, noise: float):
+    """``(answer, token probability)``: a ``noise`` fraction of prompts, fixed per model, get a bad answer."""
+    digest = hashlib.md5(f"{model}\n{prompt}".encode("utf-8")).digest()
+    draw = int.from_bytes(digest[:4], "little") / 2 ** 32
+    if draw >= noise:
+        return text, 0.97
+    # Half of the bad answers do not parse, the other half are unsure and often wrong
+    if draw < noise / 2:
+        return f"Hmm, talvez {text}", 0.3
+    return (_other_answer(text, prompt) if draw < noise * 3 / 4 else text), 0.4
+
+
+def _other_answer(text: str, prompt: str) -> str:
+    """A plausible but different answer to the same prompt."""
+    prompt = prompt.rstrip()
+    if prompt.endswith("Classification:"):
+        return "service_request" if text == "fallback" else "fallback"
+    if prompt.endswith("Moderation:"):
+        return "warn: unclear message" if text == "allow" else "allow"
+    if prompt.endswith("Response (yes/no):"):
+        return "no" if text == "yes" else "yes"
+    return text
+
+
+def stub_embedding(text: str, dim: int = EMBEDDING_DIM) -> list:
+    """Hashed bag-of-words embedding, so texts sharing words land close together."""
+    vector = np.zeros(dim, dtype=np.float32)
+    for token in text.lower().split():
+        digest = hashlib.md5(token.encode("utf-8")).digest()
+        vector[int.from_bytes(digest[:4], "little") % dim] += 1.0
+    norm = np.linalg.norm(vector)
+    if norm:
+        vector /= norm
+    return vector.tolist()
+
+
+class StubOllamaServer:
+    """Threaded HTTP server speaking the subset of the Ollama API the agents use."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0,
+                 generate=stub_generate, embed=stub_embedding, models=None, ramble: int = 0,
+                 token_latency: float = 0.0):
+        self.latency = latency
+        self.ramble = ramble
+        self.token_latency = token_latency
+        self.generate = generate
+        self.embed = embed
+        # model name -> {"latency": seconds, "noise": fraction of answers that are garbled or unsure}
+        self.models = models or {}
+        self.calls = Counter()
+        self.model_calls = Counter()
+        self.failures = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def reset(self):
+        with self._lock:
+            self.calls.clear()
+            self.model_calls.clear()
+
+    def fail_next(self, n: int):
+        """Answer the next ``n`` requests with HTTP 503 (to exercise client retries)."""
+        with self._lock:
+            self.failures = n
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _make_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                # Headers and body go out in separate writes; avoid Nagle/delayed-ACK stalls on keep-alive
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                profile = stub.models.get(body.get("model"), {})
+                with stub._lock:
+                    stub.calls[self.path] += 1
+                    if self.path == "/api/generate":
+                        stub.model_calls[body.get("model")] += 1
+                    fail = stub.failures > 0
+                    stub.failures -= int(fail)
+                latency = profile.get("latency", stub.latency)
+                text = None
+                if self.path == "/api/generate" and not fail:
+                    text = constrain(stub.generate(body.get("prompt", "")), body, stub.ramble)
+                    latency += stub.token_latency * count_tokens(text)
+                if latency:
+                    time.sleep(latency)
+                if fail:
+                    self.send_error(503)
+                    return
+
+                if self.path == "/api/generate" and body.get("stream", True):
+                    # Ollama streams newline-delimited JSON chunks by default
+                    tokens = text.split(" ")
+                    lines = [{"model": body.get("model"), "response": t if i == 0 else " " + t, "done": False}
+                             for i, t in enumerate(tokens)]
+                    lines.append({"model": body.get("model"), "response": "", "done": True,
+                                  "prompt_eval_count": count_tokens(body.get("prompt", "")),
+                                  "eval_count": count_tokens(text)})
+                    self._send(b"".join(json.dumps(line).encode("utf-8") + b"\n" for line in lines),
+                               "application/x-ndjson")
+                    return
+                if self.path == "/api/generate":
+                    text, probability = noisy_answer(text, body.get("prompt", ""), body.get("model"),
+                                                     profile.get("noise", 0.0))
+                    text = _apply_format(text, body.get("format"))
+                    payload = {"model": body.get("model"), "response": text, "done": True,
+                               "prompt_eval_count": count_tokens(body.get("prompt", "")),
+                               "eval_count": count_tokens(text)}
+                    if body.get("logprobs"):
+                        payload["logprobs"] = [{"token": token, "logprob": math.log(probability)}
+                                               for token in text.split(" ")]
+                elif self.path == "/api/embeddings":
+                    payload = {"embedding": stub.embed(body.get("prompt", ""))}
+                elif self.path == "/api/embed":
+                    inputs = body.get("input", [])
+                    inputs = [inputs] if isinstance(inputs, str) else inputs
+                    payload = {"model": body.get("model"), "embeddings": [stub.embed(t) for t in inputs]}
+                else:
+                    self.send_error(404)
+                    return
+
+                self._send(json.dumps(payload).encode("utf-8"), "application/json")
+
+            def _send(self, data: bytes, content_type: str):
+                try:
+                    self.send_response(200)
+                    self.send_header("Content-Type", content_type)
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # the client gave up (e.g. its timeout fired)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
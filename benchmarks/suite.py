@@ -0,0 +1,224 @@
+"""
+End-to-end benchmark suite against the stub Ollama server, with a regression check.
+
+Each dataset size runs in a fresh interpreter on a synthetic merchant CSV and reports
+startup time (agents and vector index), find_matches and AgentOrchestrator.run
+latency percentiles with LLM calls per request, requests/sec through the FastAPI
+app and the peak RSS of the process. Results are compared against a baseline file;
+any metric worse than the baseline by more than --threshold fails the run.
+
+    python -m benchmarks.suite                                  # compare with benchmarks/baseline.json
+    python -m benchmarks.suite --save-baseline                  # record a new baseline
+    python -m benchmarks.suite --sizes 1000 100000 1000000 --output results.json
+
+Baselines are machine specific: record one on the machine that runs the comparison.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+import numpy as np
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+# Metrics where a larger value is better; every other metric should not grow
+HIGHER_IS_BETTER = {"requests_per_sec"}
+# Changes smaller than this (by unit suffix) are noise, whatever their relative size
+NOISE_FLOOR = {"_ms": 2.0, "_s": 0.05, "_mb": 10.0}
+
+MESSAGES = [
+    "procuro fornecedores de {product}",
+    "quero divulgar promoções da minha loja de {product}",
+    "alguém interessado em parcerias para eventos de {product}?",
+    "quero dividir frete de {product} para Campinas",
+    "Qual foi o último jogo do Palmeiras?",
+]
+
+
+def percentiles(samples_ms: List[float]) -> Dict[str, float]:
+    return {f"p{q}_ms": round(float(np.percentile(samples_ms, q)), 2) for q in (50, 95, 99)}
+
+
+def workload(df, n: int, seed: int = 0):
+    """``n`` (user_id, message) pairs from real merchants of the dataset."""
+    from benchmarks.synthetic import PRODUCTS
+    rng = np.random.default_rng(seed)
+    user_ids = df['merchant_id'].unique()
+    return [(str(rng.choice(user_ids)), MESSAGES[i % len(MESSAGES)].format(product=rng.choice(PRODUCTS)))
+            for i in range(n)]
+
+
+async def time_calls(stub, calls, concurrency: int = 1):
+    """Latency percentiles and LLM calls per call of awaiting every ``calls`` factory."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def timed(call):
+        async with semaphore:
+            start = time.perf_counter()
+            await call()
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    stub.reset()
+    start = time.perf_counter()
+    await asyncio.gather(*(timed(call) for call in calls))
+    seconds = time.perf_counter() - start
+    return {**percentiles(latencies), "requests_per_sec": round(len(calls) / seconds, 1),
+            "llm_calls_per_request": round(stub.calls['/api/generate'] / len(calls), 2)}
+
+
+def run_size(size: int, requests: int, concurrency: int, latency: float) -> Dict:
+    """Every scenario on one dataset size; meant to run in its own interpreter."""
+    import resource
+    from benchmarks.stub_ollama import StubOllamaServer
+    from benchmarks.synthetic import write_merchant_csv
+
+    with StubOllamaServer(latency=latency) as stub, tempfile.TemporaryDirectory() as tmp:
+        os.environ.update({
+            "OLLAMA_HOST": stub.url,
+            "FEATURE_STORE_DIR": tmp,
+            "EMBEDDING_CACHE_PATH": "",
+            "VECTOR_BACKEND": "faiss",
+            # Every request pays for its own LLM calls, so calls per request stay comparable
+            "RESPONSE_CACHE_SIZE": "0",
+        })
+        import httpx
+        start = time.perf_counter()
+        import api.main
+        import_s = time.perf_counter() - start
+        from agents.orchestrator import AgentInput
+        from api.registry import AgentRegistry
+
+        path = write_merchant_csv(os.path.join(tmp, "merchants.csv"), size)
+        registry = api.main.registry = AgentRegistry(path, watch=False)
+        with contextlib.redirect_stdout(io.StringIO()):
+            orchestrator = registry.orchestrator
+            matchmaker = orchestrator.matchmaker
+            pairs = workload(matchmaker.df, requests)
+            # Warm up: marketing verdicts of the candidates are classified once and kept
+            asyncio.run(time_calls(stub, [lambda u=u, m=m: matchmaker.find_matches(u, m) for u, m in pairs]))
+
+            results = {
+                "startup": {
+                    "import_s": round(import_s, 3),
+                    "agents_s": registry.timings["agents_seconds"],
+                    "index_s": registry.timings["index_seconds"],
+                },
+                "find_matches": asyncio.run(time_calls(
+                    stub, [lambda u=u, m=m: matchmaker.find_matches(u, m) for u, m in pairs])),
+                "orchestrator": asyncio.run(time_calls(
+                    stub, [lambda u=u, m=m: orchestrator.run(AgentInput(message=m, user_id=u)) for u, m in pairs])),
+            }
+
+            async def api_requests():
+                transport = httpx.ASGITransport(app=api.main.app)
+                async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+                    async def post(u, m):
+                        response = await client.post("/message", json={"message": m, "user_id": u})
+                        response.raise_for_status()
+                    return await time_calls(stub, [lambda u=u, m=m: post(u, m) for u, m in pairs], concurrency)
+
+            results["api"] = asyncio.run(api_requests())
+        matchmaker.close()
+
+    # ru_maxrss is in kilobytes on Linux
+    results["peak_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    return results
+
+
+def flatten(results: Dict, prefix: str = "") -> Dict[str, float]:
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{key}."))
+        else:
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def compare(results: Dict, baseline: Dict, threshold: float, tail_threshold: float) -> List[str]:
+    """
+    Metrics present in both that are worse than the baseline by more than ``threshold``
+    (a fraction), or ``tail_threshold`` for the noisier p95/p99 latencies.
+    """
+    current, reference = flatten(results), flatten(baseline)
+    regressions = []
+    for name in sorted(current.keys() & reference.keys()):
+        value, base = current[name], reference[name]
+        floor = next((v for suffix, v in NOISE_FLOOR.items() if name.endswith(suffix)), 0.0)
+        if abs(value - base) <= floor:
+            continue
+        allowed = tail_threshold if name.endswith(("p95_ms", "p99_ms")) else threshold
+        if name.rsplit(".", 1)[-1] in HIGHER_IS_BETTER:
+            worse = value < base * (1 - allowed)
+        else:
+            worse = value > base * (1 + allowed) if base > 0 else value > 0
+        if worse:
+            regressions.append(f"{name}: {value} vs baseline {base}")
+    return regressions
+
+
+def run_suite(sizes: List[int], requests: int, concurrency: int, latency: float) -> Dict:
+    results = {}
+    for size in sizes:
+        command = [sys.executable, "-m", "benchmarks.suite", "--child", str(size), "--requests", str(requests),
+                   "--concurrency", str(concurrency), "--latency", str(latency)]
+        out = subprocess.run(command, cwd=ROOT, capture_output=True, text=True)
+        if out.returncode != 0:
+            raise RuntimeError(f"benchmark of {size} rows failed:\n{out.stderr}")
+        results[str(size)] = json.loads(out.stdout.strip().splitlines()[-1])
+        print(f"{size} rows: {json.dumps(results[str(size)])}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000], help="merchant rows per dataset")
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=16, help="concurrent requests through the API")
+    parser.add_argument("--latency", type=float, default=0.02, help="stub latency per Ollama call in seconds")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed relative regression per metric")
+    parser.add_argument("--tail-threshold", type=float, default=0.75, help="allowed relative regression of p95/p99")
+    parser.add_argument("--save-baseline", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--output", help="also write the results to this JSON file")
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        print(json.dumps(run_size(args.child, args.requests, args.concurrency, args.latency)))
+        sys.exit(0)
+
+    results = run_suite(args.sizes, args.requests, args.concurrency, args.latency)
+    settings = {"requests": args.requests, "concurrency": args.concurrency, "latency": args.latency}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"settings": settings, "results": results}, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({"settings": settings, "results": results}, f, indent=2)
+        print(f"Saved baseline {args.baseline}")
+        sys.exit(0)
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; record one with --save-baseline")
+        sys.exit(0)
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get("settings") != settings:
+        print(f"Warning: baseline was recorded with {baseline.get('settings')}, this run used {settings}")
+    regressions = compare(results, baseline["results"], args.threshold, args.tail_threshold)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    print(f"{len(regressions)} regressions beyond {args.threshold:.0%} ({args.tail_threshold:.0%} for p95/p99)")
+    sys.exit(1 if regressions else 0)
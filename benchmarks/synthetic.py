@@ -0,0 +1,67 @@
+"""
+Synthetic merchant datasets shaped like data/fake_merchant_dataset.csv.
+"""
+import numpy as np
+import pandas as pd
+
+CITIES = [
+    "São Paulo", "Campinas", "Santos", "Sorocaba", "Bauru", "Jundiaí",
+    "São José dos Campos", "São Carlos", "Ribeirão Preto",
+]
+
+MCCS = [
+    (5411, "Grocery Stores, Supermarkets"),
+    (5812, "Eating Places, Restaurants"),
+    (5651, "Family Clothing Stores"),
+    (5945, "Hobby, Toy, and Game Shops"),
+    (5732, "Electronics Stores"),
+    (7311, "Advertising Services"),
+]
+
+MESSAGE_TEMPLATES = [
+    "quero divulgar promoções da minha loja de {product}",
+    "preciso de alguém que me ajude com rede social para {product}",
+    "faço posts no instagram para lojas de {product}",
+    "ofereço serviço de entrega de {product} em {city}",
+    "procuro fornecedores de {product}",
+    "tenho interesse em fornecedores de {product} na minha região",
+    "alguém interessado em parcerias para eventos de {product}?",
+    "quero dividir frete de {product} para {city}",
+    "sou de {city} e vendo {product} no atacado",
+    "oi td bom?",
+    "como funciona?",
+]
+
+PRODUCTS = [
+    "roupas femininas", "roupa masculina", "brinquedos", "doces", "embalagens",
+    "eletrônicos", "café", "bebidas", "cosméticos", "calçados", "móveis", "flores",
+]
+
+
+def make_merchant_frame(n_rows: int, seed: int = 0, rows_per_merchant: int = 4) -> pd.DataFrame:
+    """Build ``n_rows`` merchant messages spread over ``n_rows / rows_per_merchant`` merchants."""
+    rng = np.random.default_rng(seed)
+    n_merchants = max(1, n_rows // rows_per_merchant)
+    merchant_idx = np.sort(rng.integers(0, n_merchants, size=n_rows))
+    merchant_city = rng.integers(0, len(CITIES), size=n_merchants)
+    merchant_mcc = rng.integers(0, len(MCCS), size=n_merchants)
+    templates = rng.integers(0, len(MESSAGE_TEMPLATES), size=n_rows)
+    products = rng.integers(0, len(PRODUCTS), size=n_rows)
+    cities = rng.integers(0, len(CITIES), size=n_rows)
+
+    width = len(str(n_merchants))
+    return pd.DataFrame({
+        "merchant_id": [str(i).zfill(max(3, width)) for i in merchant_idx],
+        "city": [CITIES[merchant_city[i]] for i in merchant_idx],
+        "mcc_code": [MCCS[merchant_mcc[i]][0] for i in merchant_idx],
+        "mcc_description": [MCCS[merchant_mcc[i]][1] for i in merchant_idx],
+        "message": [
+            MESSAGE_TEMPLATES[t].format(product=PRODUCTS[p], city=CITIES[c])
+            for t, p, c in zip(templates, products, cities)
+        ],
+    })
+
+
+def write_merchant_csv(path: str, n_rows: int, seed: int = 0) -> str:
+    make_merchant_frame(n_rows, seed=seed).to_csv(path, index=False)
+    return path
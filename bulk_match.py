@@ -0,0 +1,33 @@
+import argparse
+import json
+import os
+
+from agents.bulk_matchmaking import run_bulk_matchmaking, export_parquet, BULK_CHUNK_SIZE, BULK_WORKERS
+from agents.feature_store import FEATURE_STORE_DIR
+from agents.matchmaker_agent import MATCHMAKER_CANDIDATE_K
+
+MERCHANT_DATA_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), 'data', 'fake_merchant_dataset.csv'))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Precompute partner suggestions for every merchant message. "
+                    "Serve them online with PRECOMPUTED_MATCHES_PATH=<output>.")
+    parser.add_argument("--merchants", default=MERCHANT_DATA_PATH, help="merchant CSV")
+    parser.add_argument("--output", default="precomputed_matches.sqlite3", help="SQLite results and checkpoint")
+    parser.add_argument("--parquet", help="also export the results to this Parquet file (needs pyarrow)")
+    parser.add_argument("--chunk-size", type=int, default=BULK_CHUNK_SIZE)
+    parser.add_argument("--workers", type=int, default=BULK_WORKERS)
+    parser.add_argument("--candidate-k", type=int, default=MATCHMAKER_CANDIDATE_K,
+                        help="ANN neighbours per message from VECTOR_BACKEND; 0 scans every merchant")
+    parser.add_argument("--feature-store-dir", default=FEATURE_STORE_DIR)
+    args = parser.parse_args()
+
+    stats = run_bulk_matchmaking(args.merchants, args.output, args.feature_store_dir,
+                                 args.chunk_size, args.workers, args.candidate_k)
+    print(json.dumps(stats, indent=2))
+    if args.parquet:
+        try:
+            export_parquet(args.output, args.parquet)
+            print(f"Exported {args.parquet}")
+        except ImportError as e:
+            print(f"Parquet export needs pyarrow: {e}")
@@ -1,5 +1,30 @@
 import sys
 import os
+import pytest
 
 # Add the project root to the Python path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+@pytest.fixture(autouse=True)
+def _clear_response_cache():
+    """LLM answers cached by one test must not leak into the next one."""
+    from agents.response_cache import response_cache
+    response_cache.clear()
+    yield
+    response_cache.clear()
+
+
+@pytest.fixture
+def llm_calls(monkeypatch):
+    """Answer every OllamaClient.generate call with the offline stub and record the prompts."""
+    from agents.ollama_client import OllamaClient
+    from benchmarks.stub_ollama import stub_generate
+    calls = []
+
+    async def fake_generate(self, prompt, timeout=None, **options):
+        calls.append(prompt)
+        return stub_generate(prompt)
+
+    monkeypatch.setattr(OllamaClient, "generate", fake_generate)
+    return calls
@@ -70,4 +70,34 @@ async def test_e2e_mcp_with_metadata_and_history():
     assert all(key in data for key in ["response", "source_agent_response", "agent_workflow"])
     data = response.json()
     assert "response" in data
-    assert "agent_workflow" in data 
\ No newline at end of file
+    assert "agent_workflow" in data 
+
+
+def test_e2e_message_batch(llm_calls):
+    messages = [
+        {"message": "Quero dividir frete para entregas em Campinas", "user_id": "001"},
+        {"message": "Qual foi o último jogo do Palmeiras?", "user_id": "002", "feedback": "thumbs-down"},
+        {"message": "Quero dividir frete para entregas em Campinas", "user_id": "001"},
+    ]
+    response = client.post("/messages/batch", json={"messages": messages})
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert len(results) == 3
+    assert results[0] == results[2]
+    assert results[1]["feedback"] == "thumbs-down"
+    assert any(step["agent_name"] == "HumanEscalationAgent" for step in results[1]["agent_workflow"])
+
+
+def test_e2e_mcp_stream(llm_calls):
+    with client.websocket_connect("/mcp/stream") as websocket:
+        websocket.send_json({"message": "Qual foi o último jogo do Palmeiras?", "user_id": "001"})
+        events = []
+        while not events or events[-1]["event"] != "done":
+            events.append(websocket.receive_json())
+        assert events[0]["event"] == "step" and events[0]["step"]["agent_name"] == "RouterAgent"
+        assert events[-1]["output"]["agent_workflow"] == [e["step"] for e in events[:-1]]
+        assert "first_event" in events[-1]["output"]["timings"]
+
+        # Invalid messages are reported and the socket stays open
+        websocket.send_json({"message": "sem usuário"})
+        assert websocket.receive_json()["event"] == "error"
@@ -0,0 +1,72 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+# This will be handled by conftest.py
+from api.registry import AgentRegistry
+from benchmarks.stub_ollama import StubOllamaServer
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+HEAVY_MODULES = ("faiss", "chromadb", "psycopg2")
+
+# Runs in a fresh interpreter so import costs and sys.modules are those of a cold start
+COLD_START_SCRIPT = """
+import gc, json, sys, time
+start = time.perf_counter()
+import api.main
+from fastapi.testclient import TestClient
+result = {"import_s": time.perf_counter() - start,
+          "heavy_after_import": [m for m in %(heavy)r if m in sys.modules]}
+with TestClient(api.main.app) as client:
+    result["first_ready_status"] = client.get("/ready").status_code
+    result["status_before_ready"] = client.get("/mcp/status").status_code
+    while client.get("/ready").status_code != 200:
+        time.sleep(0.02)
+    result["ready_s"] = time.perf_counter() - start
+    result["readiness"] = client.get("/ready").json()
+    result["message_status"] = client.post("/message", json={"message": "procuro fornecedores", "user_id": "001"}).status_code
+result["matchmakers"] = sum(1 for o in gc.get_objects() if type(o).__name__ == "MatchmakerAgent")
+print(json.dumps(result))
+"""
+
+
+@pytest.fixture
+def stub():
+    # Slow embeddings keep the background index build running while the app already answers
+    with StubOllamaServer(latency=0.3) as server:
+        yield server
+
+
+def test_cold_start_is_lazy_and_reports_readiness(stub, tmp_path):
+    env = dict(os.environ, OLLAMA_HOST=stub.url, VECTOR_BACKEND="faiss", FEATURE_STORE_DIR=str(tmp_path),
+               EMBEDDING_CACHE_PATH="", PYTHONPATH=ROOT)
+    out = subprocess.run([sys.executable, "-c", COLD_START_SCRIPT % {"heavy": HEAVY_MODULES}],
+                         cwd=str(tmp_path), env=env, capture_output=True, text=True, timeout=300)
+    assert out.returncode == 0, out.stderr
+    result = json.loads(out.stdout.strip().splitlines()[-1])
+    print(f"cold start: import {result['import_s']:.2f}s, ready {result['ready_s']:.2f}s, "
+          f"timings {result['readiness']['timings']}")
+
+    assert result["heavy_after_import"] == []
+    # The app answers while the index is still being built, and only becomes ready afterwards
+    assert result["first_ready_status"] == 503
+    assert result["status_before_ready"] == 200
+    assert result["readiness"]["index"] == "ready"
+    assert result["readiness"]["timings"]["index_seconds"] >= 0.3
+    assert result["message_status"] == 200
+    assert result["matchmakers"] == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_agent_build_fails_the_background_tasks_cleanly(tmp_path):
+    registry = AgentRegistry(str(tmp_path / "missing.csv"), feature_store_dir=str(tmp_path), watch=True)
+    registry.start()
+    # Neither task re-raises the agent error, so none is left with an unretrieved exception
+    assert await registry._index_task is None
+    assert await registry._watch_task is None
+    readiness = registry.readiness()
+    assert (readiness["ready"], readiness["agents"], readiness["index"]) == (False, "failed", "failed")
+    assert readiness["error"].startswith("agents:")
@@ -0,0 +1,32 @@
+import pytest
+
+# This will be handled by conftest.py
+from benchmarks.suite import compare, run_suite
+
+
+def test_compare_flags_only_regressions_beyond_threshold_and_noise():
+    baseline = {"1000": {"api": {"p50_ms": 100.0, "p99_ms": 200.0, "requests_per_sec": 50.0,
+                                 "llm_calls_per_request": 0.0},
+                         "startup": {"agents_s": 0.01}, "peak_rss_mb": 100.0}}
+    same = {"1000": {"api": {"p50_ms": 110.0, "p99_ms": 300.0, "requests_per_sec": 45.0,
+                             "llm_calls_per_request": 0.0},
+                     "startup": {"agents_s": 0.05}, "peak_rss_mb": 108.0}}
+    assert compare(same, baseline, 0.25, 0.75) == []
+
+    worse = {"1000": {"api": {"p50_ms": 130.0, "p99_ms": 400.0, "requests_per_sec": 30.0,
+                              "llm_calls_per_request": 1.0},
+                      "startup": {"agents_s": 0.01}, "peak_rss_mb": 140.0}}
+    assert [r.split(":")[0] for r in compare(worse, baseline, 0.25, 0.75)] == [
+        "1000.api.llm_calls_per_request", "1000.api.p50_ms", "1000.api.p99_ms",
+        "1000.api.requests_per_sec", "1000.peak_rss_mb"]
+
+
+def test_suite_reports_every_metric_on_a_small_dataset():
+    results = run_suite([300], requests=10, concurrency=4, latency=0.0)["300"]
+    assert set(results) == {"startup", "find_matches", "orchestrator", "api", "peak_rss_mb"}
+    for scenario in ("find_matches", "orchestrator", "api"):
+        assert results[scenario]["p50_ms"] <= results[scenario]["p95_ms"] <= results[scenario]["p99_ms"]
+        assert results[scenario]["requests_per_sec"] > 0
+    # Routing and moderation of these messages need the LLM
+    assert results["orchestrator"]["llm_calls_per_request"] > 0
+    assert results["startup"]["index_s"] > 0 and results["peak_rss_mb"] > 0
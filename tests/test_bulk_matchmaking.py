@@ -0,0 +1,74 @@
+import asyncio
+import os
+import sqlite3
+import pytest
+
+# This will be handled by conftest.py
+from agents.bulk_matchmaking import run_bulk_matchmaking
+from agents.matchmaker_agent import MatchmakerAgent
+from agents.precomputed_matches import PrecomputedMatches
+
+MERCHANT_DATA_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data', 'fake_merchant_dataset.csv'))
+
+
+def bulk(tmp_path, **kwargs):
+    options = {"chunk_size": 40, "workers": 1, "candidate_k": 0, **kwargs}
+    return run_bulk_matchmaking(MERCHANT_DATA_PATH, str(tmp_path / "matches.sqlite3"),
+                                feature_store_dir=str(tmp_path / "features"), **options)
+
+
+@pytest.mark.asyncio
+async def test_bulk_results_match_online_matchmaking(tmp_path, llm_calls):
+    # The bulk job is a synchronous entry point with its own event loop
+    stats = await asyncio.to_thread(bulk, tmp_path)
+    agent = MatchmakerAgent(MERCHANT_DATA_PATH, feature_store_dir=str(tmp_path / "features"), precomputed_path="")
+    precomputed = PrecomputedMatches(str(tmp_path / "matches.sqlite3"))
+    assert stats["computed"] == stats["messages"] == len(agent.df)
+
+    for user_id, message in zip(agent.df['merchant_id'], agent.df['message']):
+        assert precomputed.get(user_id, message) == await agent.find_matches(user_id, message)
+
+
+def test_bulk_job_resumes_from_checkpoint(tmp_path, llm_calls):
+    first = bulk(tmp_path)
+    conn = sqlite3.connect(str(tmp_path / "matches.sqlite3"))
+    with conn:
+        conn.execute("DELETE FROM bulk_chunks WHERE chunk = 1")
+    conn.close()
+    llm_calls.clear()
+
+    resumed = bulk(tmp_path)
+    assert resumed["resumed_chunks"] == 2
+    assert resumed["computed"] == 40
+    # Marketing verdicts were kept in the feature store by the first run
+    assert resumed["classified"] == 0 and llm_calls == []
+
+    # A different configuration starts over
+    assert bulk(tmp_path, chunk_size=50)["computed"] == first["messages"]
+
+
+def test_process_pool_gives_the_same_results(tmp_path, llm_calls):
+    bulk(tmp_path / "single")
+    bulk(tmp_path / "pool", workers=2)
+    rows = "SELECT user_id, message_key, matches FROM precomputed_matches ORDER BY user_id, message_key"
+    single = PrecomputedMatches(str(tmp_path / "single" / "matches.sqlite3")).conn.execute(rows).fetchall()
+    pool = PrecomputedMatches(str(tmp_path / "pool" / "matches.sqlite3")).conn.execute(rows).fetchall()
+    assert single == pool
+
+
+@pytest.mark.asyncio
+async def test_find_matches_serves_precomputed_results(tmp_path, llm_calls):
+    await asyncio.to_thread(bulk, tmp_path)
+    agent = MatchmakerAgent(MERCHANT_DATA_PATH, feature_store_dir=str(tmp_path / "features"),
+                            precomputed_path=str(tmp_path / "matches.sqlite3"))
+    user_id, message = agent.df['merchant_id'][0], agent.df['message'][0]
+    llm_calls.clear()
+
+    assert await agent.find_matches(user_id, f"  {message.upper()} ") == \
+        agent.precomputed.get(user_id, message)
+    assert llm_calls == []
+    assert agent.precomputed.stats()["hits"] == 2
+
+    # Merchant changes invalidate every precomputed suggestion
+    await agent.apply_changes(deletes=["030"])
+    assert agent.precomputed is None
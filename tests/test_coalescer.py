@@ -0,0 +1,62 @@
+import asyncio
+import pytest
+
+# This will be handled by conftest.py
+from agents.orchestrator import AgentInput, AgentOutput
+from api.coalescer import MessageCoalescer
+
+
+def make_coalescer(window_ms, max_batch=32):
+    batches = []
+
+    async def run_batch(inputs):
+        batches.append([i.message for i in inputs])
+        await asyncio.sleep(0)
+        return [AgentOutput(response=i.message.upper(), source_agent_response="", agent_workflow=[])
+                for i in inputs]
+
+    return MessageCoalescer(run_batch, window_ms=window_ms, max_batch=max_batch), batches
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_share_one_batch():
+    coalescer, batches = make_coalescer(window_ms=20)
+    messages = ["a", "b", "a", "c"]
+    outputs = await asyncio.gather(*(coalescer.submit(AgentInput(message=m, user_id="001")) for m in messages))
+    assert [o.response for o in outputs] == ["A", "B", "A", "C"]
+    assert batches == [messages]
+    assert coalescer.stats == {"requests": 4, "batches": 1, "largest_batch": 4}
+
+
+@pytest.mark.asyncio
+async def test_full_batch_is_flushed_before_the_window_closes():
+    coalescer, batches = make_coalescer(window_ms=10_000, max_batch=2)
+    outputs = await asyncio.wait_for(asyncio.gather(
+        *(coalescer.submit(AgentInput(message=m, user_id="001")) for m in ["a", "b", "c", "d"])), timeout=1)
+    assert [o.response for o in outputs] == ["A", "B", "C", "D"]
+    assert batches == [["a", "b"], ["c", "d"]]
+
+
+@pytest.mark.asyncio
+async def test_batch_errors_reach_every_request():
+    async def run_batch(inputs):
+        raise RuntimeError("ollama down")
+
+    coalescer = MessageCoalescer(run_batch, window_ms=5)
+    results = await asyncio.gather(*(coalescer.submit(AgentInput(message=m, user_id="001")) for m in "ab"),
+                                   return_exceptions=True)
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+@pytest.mark.asyncio
+async def test_a_failing_request_does_not_fail_the_others():
+    async def run_batch(inputs):
+        return [ValueError(i.message) if i.message == "b" else
+                AgentOutput(response=i.message.upper(), source_agent_response="", agent_workflow=[])
+                for i in inputs]
+
+    coalescer = MessageCoalescer(run_batch, window_ms=5)
+    results = await asyncio.gather(*(coalescer.submit(AgentInput(message=m, user_id="001")) for m in "abc"),
+                                   return_exceptions=True)
+    assert [r.response for r in (results[0], results[2])] == ["A", "C"]
+    assert isinstance(results[1], ValueError)
@@ -0,0 +1,58 @@
+import pytest
+
+# This will be handled by conftest.py
+from agents import fast_path
+from agents.fast_path import fast_route, fast_moderate
+from agents.router_agent import RouterAgent
+from agents.moderator_agent import ModeratorAgent
+
+
+def test_fast_route_obvious_messages():
+    assert fast_route("Preciso de ajuda com divulgação no instagram") == "social_media_promotion"
+    assert fast_route("procuro fornecedores") == "partnership_request"
+    assert fast_route("como funciona?") == "service_request"
+    assert fast_route("seu lixo") == "moderation"
+
+
+def test_fast_route_defers_ambiguous_messages():
+    assert fast_route("Qual foi o último jogo do Palmeiras?") is None
+    # Both a social media and a partnership signal: let the LLM decide
+    assert fast_route("procuro parceiros para divulgação no instagram") is None
+
+
+def test_fast_moderate_obvious_messages():
+    assert fast_moderate("COMPRE AGORA! OFERTA POR TEMPO LIMITADO!") == {"action": "flag", "reason": "spam"}
+    assert fast_moderate("oi") == {"action": "warn", "reason": "message too short"}
+    assert fast_moderate("faço posts para redes sociais") == {"action": "allow"}
+    assert fast_moderate("conteúdo ofensivo e abusivo") is None
+
+
+def test_fast_moderate_leaves_one_word_messages_to_the_llm():
+    assert fast_moderate("obrigado") is None
+    assert fast_moderate("valeu") is None
+
+
+def test_counting_records_each_lookup_once():
+    before = dict(fast_path.fast_path_stats)
+    with fast_path.counting():
+        for _ in range(3):
+            fast_route("procuro fornecedores")
+            fast_moderate("Qual foi o último jogo do Palmeiras?")
+    assert fast_path.fast_path_stats["route_hits"] == before["route_hits"] + 1
+    assert fast_path.fast_path_stats["moderation_misses"] == before["moderation_misses"] + 1
+
+
+@pytest.mark.asyncio
+async def test_agents_skip_llm_on_fast_path(monkeypatch):
+    router, moderator = RouterAgent(), ModeratorAgent()
+
+    async def no_llm(prompt, **options):
+        pytest.fail("LLM should not be called")
+
+    monkeypatch.setattr(router.llm, "generate", no_llm)
+    monkeypatch.setattr(moderator.llm, "generate", no_llm)
+    before = dict(fast_path.fast_path_stats)
+    assert await router.classify("quero aumentar meus seguidores") == "social_media_promotion"
+    assert (await moderator.moderate("oi"))["action"] == "warn"
+    assert fast_path.fast_path_stats["route_hits"] == before["route_hits"] + 1
+    assert fast_path.fast_path_stats["moderation_hits"] == before["moderation_hits"] + 1
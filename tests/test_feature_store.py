@@ -0,0 +1,65 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+# This will be handled by conftest.py
+from agents.feature_store import MerchantFeatureStore, keyword_tokens, is_offer_message, MARKETING_UNKNOWN
+
+MERCHANT_DATA_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data', 'fake_merchant_dataset.csv'))
+
+
+def load_df():
+    return pd.read_csv(MERCHANT_DATA_PATH, dtype={'merchant_id': str})
+
+
+def cold_start(store_dir):
+    store = MerchantFeatureStore.load_or_build(load_df(), MERCHANT_DATA_PATH, store_dir)
+    store.marketing[:] = 1
+    store.save_marketing()
+    return len(store)
+
+
+def test_keyword_overlap_matches_word_sets():
+    df = load_df()
+    store = MerchantFeatureStore.build(df)
+    query = "preciso de fornecedores de embalagens na minha região"
+    overlap = store.keyword_overlap(store.query_token_ids(keyword_tokens(query)))
+    expected = [len(keyword_tokens(query) & keyword_tokens(str(m))) for m in df['message']]
+    assert overlap.tolist() == expected
+    assert store.is_offer.tolist() == [is_offer_message(str(m)) for m in df['message']]
+
+
+def test_load_or_build_persists_store(tmp_path):
+    df = load_df()
+    store = MerchantFeatureStore.load_or_build(df, MERCHANT_DATA_PATH, str(tmp_path), marketing_model="llama3.2")
+    assert os.path.exists(store.path)
+    store.marketing[:3] = 1
+    saved = os.path.getmtime(store.path)
+    store.save_marketing()
+    # Verdicts go to their own small file; the store itself is not rewritten
+    assert os.path.getmtime(store.path) == saved
+    assert os.path.exists(MerchantFeatureStore.marketing_path_for(store.path))
+
+    reloaded = MerchantFeatureStore.load_or_build(df, MERCHANT_DATA_PATH, str(tmp_path), marketing_model="llama3.2")
+    assert reloaded.path == store.path
+    assert reloaded.marketing[:3].tolist() == [1, 1, 1]
+    assert np.array_equal(reloaded.token_rows, store.token_rows)
+    assert reloaded.messages(range(len(df))) == [str(m) for m in df['message']]
+
+    # A different model invalidates the cached marketing verdicts
+    other = MerchantFeatureStore.load_or_build(df, MERCHANT_DATA_PATH, str(tmp_path), marketing_model="other")
+    assert (other.marketing == MARKETING_UNKNOWN).all()
+
+
+def test_concurrent_cold_starts_share_the_store_dir(tmp_path):
+    # Four workers at a time start on the same empty store dir and all build or load the store
+    store_dirs = [str(tmp_path / str(i)) for i in range(6) for _ in range(4)]
+    with ProcessPoolExecutor(max_workers=4, mp_context=multiprocessing.get_context("spawn")) as pool:
+        sizes = list(pool.map(cold_start, store_dirs))
+    assert sizes == [len(load_df())] * len(store_dirs)
+    for store_dir in set(store_dirs):
+        assert not [name for name in os.listdir(store_dir) if ".tmp" in name]
+        store = MerchantFeatureStore.load_or_build(load_df(), MERCHANT_DATA_PATH, store_dir)
+        assert (store.marketing == 1).all()
@@ -0,0 +1,46 @@
+import pytest
+
+# This will be handled by conftest.py
+from agents.feedback_store import FeedbackStore
+
+
+def test_memory_is_bounded_and_indexed_by_user():
+    store = FeedbackStore(path="", memory_size=3, per_user=2, max_users=2)
+    for n in range(5):
+        store.append("001", f"mensagem {n}", "thumbs-up", metadata={"big": "x" * 1000})
+    store.append("002", "outra", "thumbs-down", match_ids=["010", "011"])
+    store.append("003", "mais uma", "thumbs-up")
+
+    assert len(store) == 7 and len(store.recent) == 3
+    assert [e["message"] for e in store.page(limit=2)] == ["mais uma", "outra"]
+    # Metadata and history are not kept in memory
+    assert "metadata" not in store.recent[0]
+    # The least recently active user was dropped
+    assert store.for_user("001") == []
+    assert store.rejected_partners("002") == {"010", "011"}
+    assert store.rejected_partners("003") == set()
+    assert store.stats()["by_feedback"] == {"thumbs-up": 6, "thumbs-down": 1}
+
+
+def test_sqlite_log_survives_restarts_and_serves_old_pages(tmp_path):
+    path = str(tmp_path / "feedback.sqlite3")
+    store = FeedbackStore(path=path, memory_size=2)
+    for n in range(5):
+        store.append(f"{n % 2:03d}", f"mensagem {n}", "thumbs-down" if n == 4 else "thumbs-up",
+                     match_ids=[f"0{n}0"], history=[{"message": "antes"}])
+
+    reopened = FeedbackStore(path=path, memory_size=2)
+    assert len(reopened) == 5 and len(reopened.recent) == 2
+    assert [e["message"] for e in reopened.page(limit=2, offset=2)] == ["mensagem 2", "mensagem 1"]
+    assert reopened.rejected_partners("000") == {"040"}
+    history = reopened.conn.execute("SELECT history FROM feedback WHERE id = 1").fetchone()[0]
+    assert history == '[{"message": "antes"}]'
+
+
+@pytest.mark.asyncio
+async def test_append_async_writes_the_log_in_a_thread(tmp_path):
+    path = str(tmp_path / "feedback.sqlite3")
+    store = FeedbackStore(path=path)
+    entry = await store.append_async("001", "mensagem", "thumbs-down", match_ids=["010"])
+    assert entry["id"] == 1 and store.rejected_partners("001") == {"010"}
+    assert len(FeedbackStore(path=path)) == 1
@@ -0,0 +1,101 @@
+import asyncio
+import os
+import pytest
+
+# This will be handled by conftest.py
+from agents import llm_scheduler
+from agents.llm_scheduler import LLMScheduler, LLMOverloaded, LLMDeadlineExceeded
+from agents.matchmaker_agent import MatchmakerAgent
+from agents.feature_store import MARKETING_UNKNOWN
+from agents.orchestrator import AgentOrchestrator, AgentInput
+
+MERCHANT_DATA_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data', 'fake_merchant_dataset.csv'))
+
+
+async def hold(scheduler, name, order, release):
+    await scheduler.acquire(name)
+    order.append(name)
+    await release.wait()
+    scheduler.release()
+
+
+@pytest.mark.asyncio
+async def test_waiters_run_by_priority():
+    scheduler = LLMScheduler(max_in_flight=1)
+    await scheduler.acquire("matchmaking")
+    order, release = [], asyncio.Event()
+    release.set()
+    tasks = [asyncio.create_task(hold(scheduler, name, order, release))
+             for name in ("bulk", "matchmaking", "routing", "moderation")]
+    await asyncio.sleep(0)
+    assert scheduler.stats()["queue_depth"] == 4
+
+    scheduler.release()
+    await asyncio.gather(*tasks)
+    assert order == ["moderation", "routing", "matchmaking", "bulk"]
+    assert scheduler.stats()["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_full_queue_sheds_the_lowest_priority():
+    scheduler = LLMScheduler(max_in_flight=1, max_queue=1)
+    await scheduler.acquire("matchmaking")
+    bulk = asyncio.create_task(scheduler.acquire("bulk"))
+    await asyncio.sleep(0)
+
+    # A moderation call evicts the queued bulk call, then an equal or lower priority is shed
+    moderation = asyncio.create_task(scheduler.acquire("moderation"))
+    await asyncio.sleep(0)
+    with pytest.raises(LLMOverloaded):
+        await bulk
+    with pytest.raises(LLMOverloaded):
+        await scheduler.acquire("matchmaking")
+
+    scheduler.release()
+    await moderation
+    stats = scheduler.stats()
+    assert stats["shed"] == {"bulk": 1, "matchmaking": 1}
+    assert stats["admitted"] == {"matchmaking": 1, "moderation": 1}
+    assert stats["queue_depth"] == 0 and stats["in_flight"] == 1
+
+
+@pytest.mark.asyncio
+async def test_expired_waiters_leave_the_queue():
+    scheduler = LLMScheduler(max_in_flight=1)
+    await scheduler.acquire("moderation")
+    with llm_scheduler.deadline(20):
+        with pytest.raises(LLMDeadlineExceeded):
+            async with scheduler.slot("routing"):
+                pass
+    assert scheduler.stats()["expired"] == {"routing": 1}
+    assert scheduler.stats()["queue_depth"] == 0
+
+    # The slot is handed to the next live waiter, not the expired one
+    waiter = asyncio.create_task(scheduler.acquire("bulk"))
+    await asyncio.sleep(0)
+    scheduler.release()
+    await waiter
+    assert scheduler.stats()["in_flight"] == 1
+
+
+@pytest.mark.asyncio
+async def test_agents_fall_back_when_the_llm_is_shed(tmp_path, monkeypatch):
+    async def shed(self, name, deadline_at=None):
+        raise self._shed(self.shed, name, LLMOverloaded("LLM queue full"))
+
+    monkeypatch.setattr(LLMScheduler, "acquire", shed)
+    matchmaker = MatchmakerAgent(MERCHANT_DATA_PATH, feature_store_dir=str(tmp_path), build_index=False)
+    orchestrator = AgentOrchestrator(MERCHANT_DATA_PATH, matchmaker=matchmaker)
+
+    # Rule-based route and an allow verdict marked as unverified
+    output = await orchestrator.run(AgentInput(message="Alguém conhece um bom contador em Campinas?", user_id="001"))
+    steps = {step.agent_name: step for step in output.agent_workflow}
+    assert steps["RouterAgent"].classification == "fallback"
+    assert steps["ModeratorAgent"].moderation_action == "allow"
+    assert steps["ModeratorAgent"].moderation_reason.startswith("unverified")
+    assert output.metrics["ModeratorAgent"]["llm_shed"] == 1
+
+    # Heuristic-only matching; no marketing verdict is stored for the shed calls
+    unknown = int((matchmaker.features.marketing == MARKETING_UNKNOWN).sum())
+    assert await matchmaker.find_matches("001", "quero divulgar promoções da minha loja")
+    assert int((matchmaker.features.marketing == MARKETING_UNKNOWN).sum()) == unknown
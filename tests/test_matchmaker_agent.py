@@ -6,14 +6,74 @@ import pandas as pd
 
 # This will be handled by conftest.py
 from agents.matchmaker_agent import MatchmakerAgent
+from agents.feature_store import MerchantFeatureStore, MARKETING_UNKNOWN
 
 MERCHANT_DATA_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data', 'fake_merchant_dataset.csv'))
 
 @pytest.fixture
-def agent():
-    return MatchmakerAgent(MERCHANT_DATA_PATH)
+def agent(tmp_path):
+    return MatchmakerAgent(MERCHANT_DATA_PATH, feature_store_dir=str(tmp_path))
 
 @pytest.mark.asyncio
 async def test_find_matches(agent):
     matches = await agent.find_matches("123", "Tem alguém que faz doces para festas na zona leste?")
-    assert isinstance(matches, list)
\ No newline at end of file
+    assert isinstance(matches, list)
+
+@pytest.mark.asyncio
+async def test_marketing_batch_verdict_map(agent, llm_calls):
+    texts = ["quero divulgar promoções da minha loja", "oi td bom?", "quero divulgar promoções da minha loja"]
+    verdicts = await agent.is_marketing_related_batch(texts)
+    assert verdicts == {"quero divulgar promoções da minha loja": True, "oi td bom?": False}
+    assert len(llm_calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_find_matches_batches_marketing_calls(agent, llm_calls):
+    saved = os.path.getmtime(agent.features.path)
+    matches = await agent.find_matches("001", "quero divulgar promoções da minha loja")
+    assert matches
+    # One call for the query plus one numbered prompt per MARKETING_BATCH_SIZE unique candidates
+    assert len(llm_calls) < agent.df['message'].nunique()
+
+    # New verdicts are written to their own file, never by rewriting the store
+    await agent.flush_marketing()
+    assert os.path.getmtime(agent.features.path) == saved
+    reloaded = MerchantFeatureStore.load(agent.features.path)
+    assert (reloaded.marketing != MARKETING_UNKNOWN).any()
+
+
+@pytest.mark.asyncio
+async def test_find_matches_reranks_retrieved_candidates_only(agent, llm_calls):
+    class FakeIndex:
+        def search(self, query, k=5):
+            return ["002", "003"]
+
+    agent.vector_backend = "faiss"
+    agent.faiss_index = FakeIndex()
+    matches = await agent.find_matches("001", "quero divulgar promoções da minha loja")
+    assert matches
+    assert {m['id'] for m in matches} <= {"002", "003"}
+
+
+def test_faiss_snapshot_is_reused_across_restarts(tmp_path, monkeypatch):
+    from agents import vector_backends
+    from agents.embedding_cache import EmbeddingCache
+    from benchmarks.stub_ollama import stub_embedding
+    embedded = []
+
+    def fake_embed_batch(texts):
+        embedded.extend(texts)
+        return [stub_embedding(t) for t in texts]
+
+    monkeypatch.setenv("VECTOR_BACKEND", "faiss")
+    monkeypatch.setattr(vector_backends.ollama_client, "embed_batch_sync", fake_embed_batch)
+    monkeypatch.setattr(vector_backends, "embedding_cache", EmbeddingCache(path=None))
+
+    first = MatchmakerAgent(MERCHANT_DATA_PATH, feature_store_dir=str(tmp_path))
+    assert len(embedded) == first.df["message"].nunique()
+    embedded.clear()
+    second = MatchmakerAgent(MERCHANT_DATA_PATH, feature_store_dir=str(tmp_path))
+    assert embedded == []
+    assert second.faiss_index.mapped
+    assert second.faiss_index.ids == first.faiss_index.ids
+
@@ -0,0 +1,136 @@
+import os
+import shutil
+import numpy as np
+import pandas as pd
+import pytest
+
+# This will be handled by conftest.py
+from agents import vector_backends
+from agents.embedding_cache import EmbeddingCache
+from agents.feature_store import MerchantFeatureStore, keyword_tokens
+from agents.matchmaker_agent import MatchmakerAgent
+from agents.merchant_updates import MerchantFileWatcher, merchant_digests
+from benchmarks.stub_ollama import stub_embedding
+
+MERCHANT_DATA_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data', 'fake_merchant_dataset.csv'))
+
+NEW_MERCHANT = {
+    "merchant_id": "900",
+    "city": "Santos",
+    "mcc_code": "7311",
+    "mcc_description": "Advertising Services",
+    "messages": ["faço gestão de instagram para lojas de doces", "ofereço fotos de produtos de doces"],
+}
+
+
+@pytest.fixture
+def embedded_texts(monkeypatch):
+    texts = []
+
+    def fake_embed_batch(batch):
+        texts.extend(batch)
+        return [stub_embedding(t) for t in batch]
+
+    monkeypatch.setattr(vector_backends.ollama_client, "embed_batch_sync", fake_embed_batch)
+    monkeypatch.setattr(vector_backends.ollama_client, "embed_sync", stub_embedding)
+    monkeypatch.setattr(vector_backends, "embedding_cache", EmbeddingCache(path=None))
+    return texts
+
+
+@pytest.fixture
+def agent(tmp_path, monkeypatch, embedded_texts, llm_calls):
+    monkeypatch.setenv("VECTOR_BACKEND", "faiss")
+    agent = MatchmakerAgent(MERCHANT_DATA_PATH, feature_store_dir=str(tmp_path))
+    embedded_texts.clear()
+    return agent
+
+
+@pytest.mark.asyncio
+async def test_upserted_merchant_is_matched_and_deleted_one_is_not(agent):
+    result = await agent.apply_changes(upserts=[NEW_MERCHANT])
+    assert result["rows_added"] == 2 and result["rows_removed"] == 0
+    assert agent.get_merchant_name("900") == "Advertising Services"
+
+    matches = await agent.find_matches("001", "procuro alguém para instagram da minha loja de doces")
+    assert "900" in {m['id'] for m in matches}
+
+    await agent.apply_changes(deletes=["900"])
+    assert agent.profiles.get("900") is None
+    matches = await agent.find_matches("001", "procuro alguém para instagram da minha loja de doces")
+    assert "900" not in {m['id'] for m in matches}
+    assert agent.faiss_index.index.ntotal == len(agent.df)
+
+
+@pytest.mark.asyncio
+async def test_only_changed_messages_are_embedded(agent, embedded_texts):
+    await agent.add_message("002", "vendo embalagens personalizadas para doces")
+    assert embedded_texts == ["vendo embalagens personalizadas para doces"]
+    assert agent.profiles.get("002")["messages"][-1] == "vendo embalagens personalizadas para doces"
+
+    embedded_texts.clear()
+    result = await agent.delete_message("002", 0)
+    assert embedded_texts == []
+    assert result["rows_added"] == 0 and result["rows_removed"] == 1
+    assert agent.faiss_index.index.ntotal == len(agent.df)
+
+
+@pytest.mark.asyncio
+async def test_changed_city_replaces_rows(agent):
+    profile = agent.profiles.get("001")
+    old_rows = agent.profiles.rows_of("001").tolist()
+    result = await agent.apply_changes(upserts=[{**profile, "city": "Bauru"}])
+    assert result["rows_removed"] == len(old_rows) and result["rows_added"] == len(old_rows)
+    rows = agent.profiles.rows_of("001")
+    assert set(agent.features.city[rows]) == {"Bauru"}
+    assert not agent.features.alive[old_rows].any()
+
+
+@pytest.mark.asyncio
+async def test_changes_during_a_pending_index_build_reach_the_index(tmp_path, monkeypatch, embedded_texts):
+    monkeypatch.setenv("VECTOR_BACKEND", "faiss")
+    agent = MatchmakerAgent(MERCHANT_DATA_PATH, feature_store_dir=str(tmp_path), build_index=False)
+    await agent.apply_changes(upserts=[NEW_MERCHANT], deletes=["002"])
+    assert agent.faiss_index is None
+
+    agent.init_index()
+    assert agent.faiss_index.index.ntotal == len(agent.df) + 2 - len(agent.df[agent.df.merchant_id == "002"])
+    neighbours = agent.retrieve_candidates(NEW_MERCHANT["messages"][0], 5)
+    assert "900" in neighbours and "002" not in agent.retrieve_candidates("x", len(agent.df) + 2)
+
+
+def test_incremental_store_matches_rebuild():
+    df = pd.read_csv(MERCHANT_DATA_PATH, dtype={'merchant_id': str})
+    head = MerchantFeatureStore.build(df.iloc[:20])
+    tail = df.iloc[20:]
+    store = head.with_changes([3, 5], tail['merchant_id'].tolist(), tail['city'].fillna("").tolist(),
+                              [str(m) for m in tail['message']])
+    full = MerchantFeatureStore.build(df)
+    query = keyword_tokens("preciso de fornecedores de doces e frete para instagram")
+    assert np.array_equal(store.keyword_overlap(store.query_token_ids(query)),
+                          full.keyword_overlap(full.query_token_ids(query)))
+    assert store.alive.sum() == len(df) - 2
+
+
+@pytest.mark.asyncio
+async def test_file_watcher_applies_only_changed_merchants(tmp_path, monkeypatch, embedded_texts):
+    path = str(tmp_path / "merchants.csv")
+    shutil.copy(MERCHANT_DATA_PATH, path)
+    monkeypatch.setenv("VECTOR_BACKEND", "faiss")
+    agent = MatchmakerAgent(path, feature_store_dir=str(tmp_path / "features"))
+    watcher = MerchantFileWatcher(agent, path, interval=0)
+    assert await watcher.poll_once() is None
+
+    df = pd.read_csv(path, dtype={'merchant_id': str})
+    first_002 = df.index[df['merchant_id'] == "002"][0]
+    df.loc[first_002, 'message'] = "faço entregas de doces em Santos"
+    df = df[df['merchant_id'] != "003"]
+    df.to_csv(path, index=False)
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1))
+    embedded_texts.clear()
+
+    result = await watcher.poll_once()
+    assert result["merchants"] == 2
+    assert embedded_texts == ["faço entregas de doces em Santos"]
+    assert agent.profiles.get("003") is None
+    assert "faço entregas de doces em Santos" in agent.profiles.get("002")["messages"]
+    assert merchant_digests(df) == watcher.digests
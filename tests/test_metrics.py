@@ -0,0 +1,70 @@
+import asyncio
+import os
+import pytest
+from fastapi.testclient import TestClient
+
+# This will be handled by conftest.py
+from agents import metrics
+from agents.matchmaker_agent import MatchmakerAgent
+from agents.ollama_client import OllamaClient
+from agents.orchestrator import AgentOrchestrator, AgentInput
+from benchmarks.stub_ollama import stub_generate
+
+MERCHANT_DATA_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data', 'fake_merchant_dataset.csv'))
+
+
+@pytest.mark.asyncio
+async def test_concurrent_steps_are_counted_separately():
+    async def work(calls):
+        for _ in range(calls):
+            await asyncio.sleep(0)
+            metrics.record_llm_call(prompt_tokens=10, completion_tokens=2)
+
+    async def timed(name, calls):
+        with metrics.step(name):
+            await work(calls)
+
+    with metrics.trace() as steps:
+        await asyncio.gather(timed("a", 1), timed("b", 3))
+    assert (steps["a"].llm_calls, steps["b"].llm_calls) == (1, 3)
+    assert steps["b"].as_dict()["prompt_tokens"] == 30
+    # Outside any step nothing is recorded
+    metrics.record_llm_call(5, 5)
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = metrics.Histogram("demo_seconds", "Demo.", (0.1, 1.0))
+    for value in (0.05, 0.5, 0.7, 5.0):
+        histogram.observe("RouterAgent", value)
+    lines = histogram.render()
+    assert 'demo_seconds_bucket{step="RouterAgent",le="0.1"} 1' in lines
+    assert 'demo_seconds_bucket{step="RouterAgent",le="1.0"} 3' in lines
+    assert 'demo_seconds_bucket{step="RouterAgent",le="+Inf"} 4' in lines
+    assert 'demo_seconds_count{step="RouterAgent"} 4' in lines
+
+
+@pytest.mark.asyncio
+async def test_agent_output_carries_per_step_metrics(tmp_path, monkeypatch):
+    async def fake_post(self, path, payload, timeout=None):
+        return {"response": stub_generate(payload["prompt"]), "prompt_eval_count": 100, "eval_count": 3}
+
+    monkeypatch.setattr(OllamaClient, "_post", fake_post)
+    matchmaker = MatchmakerAgent(MERCHANT_DATA_PATH, feature_store_dir=str(tmp_path), build_index=False)
+    orchestrator = AgentOrchestrator(MERCHANT_DATA_PATH, matchmaker=matchmaker)
+    message = AgentInput(message="Quero dividir frete para entregas em Campinas", user_id="001")
+
+    first = await orchestrator.run(message)
+    assert first.metrics["RouterAgent"]["llm_calls"] == first.metrics["ModeratorAgent"]["llm_calls"] == 1
+    assert first.metrics["RouterAgent"]["prompt_tokens"] == 100
+    assert first.metrics["total"]["llm_calls"] == sum(
+        m["llm_calls"] for name, m in first.metrics.items() if name != "total")
+    assert first.metrics["total"]["ms"] == first.timings["total"]
+
+    second = await orchestrator.run(message)
+    assert second.metrics["RouterAgent"]["llm_calls"] == 0
+    assert second.metrics["RouterAgent"]["cache_hits"] == 1
+
+    from api.main import app
+    body = TestClient(app).get("/metrics").text
+    assert 'agent_step_llm_calls_count{step="RouterAgent"}' in body
+    assert 'agent_step_cache_hits_total{step="RouterAgent"}' in body
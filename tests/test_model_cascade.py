@@ -0,0 +1,89 @@
+import math
+import pytest
+
+# This will be handled by conftest.py
+from agents.model_cascade import ModelCascade
+from agents.ollama_client import OllamaClient
+from agents.router_agent import RouterAgent, parse_label
+from agents.moderator_agent import ModeratorAgent
+from benchmarks.stub_ollama import stub_generate
+
+
+@pytest.fixture
+def models(monkeypatch):
+    """Fake Ollama: ``answers[model]`` overrides the stub answer, ``confidence[model]`` sets logprobs."""
+    calls, answers, confidence = [], {}, {}
+
+    async def fake_post(self, path, payload, timeout=None):
+        model = payload["model"]
+        calls.append(model)
+        text = answers.get(model) or stub_generate(payload["prompt"])
+        data = {"response": text}
+        if payload.get("logprobs") and model in confidence:
+            data["logprobs"] = [{"token": text.split()[0], "logprob": math.log(confidence[model])}]
+        return data
+
+    monkeypatch.setattr(OllamaClient, "_post", fake_post)
+    return calls, answers, confidence
+
+
+def test_parse_label_accepts_only_known_labels():
+    assert parse_label("Partnership_request.") == "partnership_request"
+    assert parse_label("'fallback'") == "fallback"
+    assert parse_label('"moderation"') == "moderation"  # format-constrained answers are JSON strings
+    assert parse_label("Hmm, talvez moderation") is None
+    assert parse_label("") is None
+
+
+@pytest.mark.asyncio
+async def test_cascade_escalates_unparsed_and_unsure_answers(models):
+    calls, answers, confidence = models
+    router = RouterAgent(model="large", fast_model="small")
+    message = "Como consigo vender mais no atacado?"
+
+    # A confident, valid small-model answer is kept
+    confidence["small"] = 0.95
+    assert await router.classify(message) == "service_request"
+    assert calls == ["small"]
+
+    # Low confidence asks the large model
+    calls.clear()
+    confidence["small"] = 0.4
+    prompt = "\nMessage: qual o placar?\nClassification:"
+    assert await router.cascade.classify(prompt, parse_label) == ("fallback", "fallback")
+    assert calls == ["small", "large"]
+
+    # So does an answer that is not a label; the large model's verdict wins
+    calls.clear()
+    answers["small"] = "Hmm, acho que allow"
+    moderator = ModeratorAgent(model="large", fast_model="small")
+    assert await moderator.moderate("Alguém indica um contador bom em Santos?") == {"action": "allow"}
+    assert calls == ["small", "large"]
+    assert moderator.cascade.stats["escalated_unparsed"] >= 1
+
+
+@pytest.mark.asyncio
+async def test_without_a_fast_model_only_the_agent_model_is_called(models):
+    calls, _, _ = models
+    cascade = ModelCascade("test", OllamaClient("large"), fast_model="")
+    assert cascade.cache_key == "large"
+    assert await cascade.classify("\nMessage: oi tudo bem\nModeration:", lambda r: r) == ("allow", "allow")
+    assert calls == ["large"]
+    assert ModelCascade("test", OllamaClient("large"), fast_model="small").cache_key == "small>large"
+
+
+@pytest.mark.asyncio
+async def test_classification_calls_ask_for_short_constrained_answers(monkeypatch):
+    payloads = []
+
+    async def fake_post(self, path, payload, timeout=None):
+        payloads.append(payload)
+        return {"response": '"partnership_request"'}
+
+    monkeypatch.setattr(OllamaClient, "_post", fake_post)
+    assert await RouterAgent(model="large", fast_model="").classify("Como consigo vender mais?") == \
+        "partnership_request"
+    options, format = payloads[0]["options"], payloads[0]["format"]
+    assert options["temperature"] == 0 and options["num_predict"] <= 12 and options["stop"] == ["\n"]
+    assert format["enum"] == ["partnership_request", "social_media_promotion", "service_request",
+                              "moderation", "fallback"]
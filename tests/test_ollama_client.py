@@ -0,0 +1,75 @@
+import asyncio
+import time
+import pytest
+
+# This will be handled by conftest.py
+from agents.ollama_client import OllamaClient
+from benchmarks.stub_ollama import StubOllamaServer
+
+
+@pytest.fixture
+def stub():
+    with StubOllamaServer() as server:
+        yield server
+
+
+@pytest.fixture
+def client(stub):
+    return OllamaClient(host=stub.url, max_retries=2)
+
+
+@pytest.mark.asyncio
+async def test_generate_retries_on_server_error(stub, client, monkeypatch):
+    monkeypatch.setattr("agents.ollama_client.OLLAMA_RETRY_BACKOFF", 0.0)
+    stub.fail_next(2)
+    assert await client.generate("qualquer coisa") == "fallback"
+    assert stub.calls["/api/generate"] == 3
+
+
+@pytest.mark.asyncio
+async def test_stream_yields_tokens(stub):
+    stub.generate = lambda prompt: "flag: spam detected"
+    client = OllamaClient(host=stub.url)
+    tokens = [t async for t in client.stream("compre agora!")]
+    assert len(tokens) == 3
+    assert "".join(tokens) == "flag: spam detected"
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_do_not_serialize(stub, client):
+    stub.latency = 0.2
+    start = time.perf_counter()
+    results = await asyncio.gather(*(client.generate("oi") for _ in range(5)))
+    assert results == ["fallback"] * 5
+    assert time.perf_counter() - start < 0.8
+
+
+@pytest.mark.asyncio
+async def test_timeout_is_enforced(stub):
+    stub.latency = 0.5
+    client = OllamaClient(host=stub.url, max_retries=0)
+    with pytest.raises(Exception):
+        await client.generate("oi", timeout=0.1)
+
+
+@pytest.mark.asyncio
+async def test_generation_options_and_format_are_sent(stub, client, monkeypatch):
+    stub.ramble = 40
+    stub.generate = lambda prompt: "partnership_request"
+    assert (await client.generate("oi")).startswith("partnership_request\nExplicação:")
+
+    options = {"temperature": 0, "num_predict": 12, "stop": ["\n"]}
+    answer = await client.generate("oi", options=options, format={"type": "string", "enum": ["partnership_request"]})
+    assert answer == '"partnership_request"'
+
+    # Servers without structured outputs only get the sampling options
+    payloads = []
+
+    async def fake_post(self, path, payload, timeout=None):
+        payloads.append(payload)
+        return {"response": "fallback"}
+
+    monkeypatch.setattr("agents.ollama_client.OLLAMA_CONSTRAINED_OUTPUT", False)
+    monkeypatch.setattr(OllamaClient, "_post", fake_post)
+    await client.generate("oi", options=options, format="json")
+    assert payloads[0]["options"] == {"temperature": 0} and "format" not in payloads[0]
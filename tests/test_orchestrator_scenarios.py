@@ -43,4 +43,104 @@ async def test_fallback_palmeiras(test_orchestrator):
     input = AgentInput(message="Qual foi o último jogo do Palmeiras?", user_id="456")
     output = await test_orchestrator.run(input)
     # Accept escalation or fallback
-    assert any(step.agent_name in ["HumanEscalationAgent", "ModeratorAgent"] for step in output.agent_workflow)
\ No newline at end of file
+    assert any(step.agent_name in ["HumanEscalationAgent", "ModeratorAgent"] for step in output.agent_workflow)
+
+@pytest.fixture
+def offline_orchestrator(tmp_path, monkeypatch):
+    """Orchestrator whose agents answer after a fixed delay, without calling Ollama."""
+    monkeypatch.setenv("FEATURE_STORE_DIR", str(tmp_path))
+    merchant_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data', 'fake_merchant_dataset.csv'))
+    orchestrator = AgentOrchestrator(merchant_path)
+    calls = []
+
+    async def classify(message):
+        await asyncio.sleep(0.2)
+        return "partnership_request"
+
+    async def moderate(message):
+        await asyncio.sleep(0.3)
+        return {"action": "flag", "reason": "spam"} if "compre" in message else {"action": "allow"}
+
+    async def find_matches(user_id, message, feedback_memory=None):
+        calls.append(message)
+        await asyncio.sleep(0.1)
+        return [{"id": "002", "name": "Loja", "city": "Santos", "message": "faço fretes"}]
+
+    monkeypatch.setattr(orchestrator.router, "classify", classify)
+    monkeypatch.setattr(orchestrator.moderator, "moderate", moderate)
+    monkeypatch.setattr(orchestrator.matchmaker, "find_matches", find_matches)
+    orchestrator.matchmaker_calls = calls
+    return orchestrator
+
+
+@pytest.mark.asyncio
+async def test_router_and_moderator_run_concurrently(offline_orchestrator):
+    output = await offline_orchestrator.run(AgentInput(message="procuro parceiros de frete", user_id="001"))
+    assert [step.agent_name for step in output.agent_workflow] == ["RouterAgent", "MatchmakerAgent"]
+    timings = output.timings
+    assert timings["RouterAgent"] >= 200 and timings["ModeratorAgent"] >= 300
+    # Matchmaking started speculatively right after routing, so the critical path is ~0.3s, not 0.6s
+    assert timings["total"] < timings["RouterAgent"] + timings["ModeratorAgent"]
+
+
+@pytest.mark.asyncio
+async def test_flagged_message_cancels_speculative_matching(offline_orchestrator):
+    output = await offline_orchestrator.run(AgentInput(message="compre agora", user_id="001"))
+    assert [step.agent_name for step in output.agent_workflow] == ["RouterAgent", "ModeratorAgent"]
+    assert output.agent_workflow[1].moderation_action == "flag"
+    assert "MatchmakerAgent" not in output.timings
+    await asyncio.sleep(0.15)
+    assert offline_orchestrator.matchmaker_calls == ["compre agora"]  # started, then cancelled
+
+
+@pytest.mark.asyncio
+async def test_run_stream_yields_steps_as_they_complete(offline_orchestrator):
+    events = [event async for event in offline_orchestrator.run_stream(
+        AgentInput(message="procuro parceiros de frete", user_id="001"))]
+    assert [e["event"] for e in events] == ["step", "step", "done"]
+    assert [e["step"]["agent_name"] for e in events[:2]] == ["RouterAgent", "MatchmakerAgent"]
+    # The route is sent after ~0.2s, while moderation is still running
+    assert events[0]["elapsed_ms"] < 300 <= events[1]["elapsed_ms"]
+    output = events[-1]["output"]
+    assert output["agent_workflow"] == [e["step"] for e in events[:2]]
+    assert output["timings"]["first_event"] == events[0]["elapsed_ms"] < output["timings"]["total"]
+
+
+@pytest.mark.asyncio
+async def test_closing_the_stream_early_cancels_the_run(offline_orchestrator):
+    stream = offline_orchestrator.run_stream(AgentInput(message="procuro parceiros de frete", user_id="001"))
+    first = await stream.__anext__()
+    assert first["step"]["agent_name"] == "RouterAgent"
+    await stream.aclose()
+    await asyncio.sleep(0.3)
+    assert len(offline_orchestrator.feedback_memory) == 0
+    assert offline_orchestrator.matchmaker_calls == ["procuro parceiros de frete"]
+
+
+@pytest.mark.asyncio
+async def test_feedback_rates_the_matches_the_client_sent(offline_orchestrator):
+    output = await offline_orchestrator.run(AgentInput(message="procuro parceiros de frete", user_id="001",
+                                                       feedback="thumbs-down", match_ids=["010"]))
+    # The answer's own matches ("002") were not seen by the client when it sent the feedback
+    assert output.agent_workflow[-1].matches[0].id == "002"
+    assert offline_orchestrator.feedback_memory.rejected_partners("001") == {"010"}
+
+
+@pytest.mark.asyncio
+async def test_run_batch_keeps_going_when_one_item_fails(offline_orchestrator, monkeypatch):
+    async def triage_batch(messages):
+        return {}
+
+    async def find_matches(user_id, message, feedback_memory=None):
+        if user_id == "999":
+            raise RuntimeError("matchmaker down")
+        return [{"id": "002", "name": "Loja", "city": "Santos", "message": "faço fretes"}]
+
+    monkeypatch.setattr(offline_orchestrator.triage_agent, "triage_batch", triage_batch)
+    monkeypatch.setattr(offline_orchestrator.matchmaker, "find_matches", find_matches)
+    inputs = [AgentInput(message="procuro parceiros de frete", user_id=user_id) for user_id in ("001", "999")]
+    outputs = await offline_orchestrator.run_batch(inputs, return_exceptions=True)
+    assert outputs[0].agent_workflow[-1].matches[0].id == "002"
+    assert isinstance(outputs[1], RuntimeError)
+    with pytest.raises(RuntimeError):
+        await offline_orchestrator.run_batch(inputs)
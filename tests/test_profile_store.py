@@ -0,0 +1,44 @@
+import os
+import pandas as pd
+
+# This will be handled by conftest.py
+from agents.profile_store import MerchantProfileStore
+
+MERCHANT_DATA_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data', 'fake_merchant_dataset.csv'))
+
+
+def load_df():
+    return pd.read_csv(MERCHANT_DATA_PATH, dtype={'merchant_id': str})
+
+
+def test_one_profile_per_merchant_matches_dataframe():
+    df = load_df()
+    profiles = MerchantProfileStore.build(df)
+    assert len(profiles) == df['merchant_id'].nunique()
+    for merchant_id, group in df.groupby('merchant_id', sort=False):
+        profile = profiles.get(merchant_id)
+        first = group.iloc[0]
+        assert profile['city'] == first['city']
+        assert profile['mcc_description'] == first['mcc_description']
+        assert profile['messages'] == [str(m) for m in group['message']]
+        assert profiles.rows_of(merchant_id).tolist() == group.index.tolist()
+        assert profiles.name(merchant_id) == first['mcc_description']
+
+
+def test_interleaved_rows_and_unknown_ids():
+    df = pd.DataFrame({
+        "merchant_id": ["002", "001", "002", "003"],
+        "city": ["Santos", None, "Bauru", "Campinas"],
+        "mcc_code": [5411, 5812, 5411, 5945],
+        "mcc_description": ["Grocery Stores, Supermarkets", "Eating Places, Restaurants", "ignored", None],
+        "message": ["primeira", "oi", "segunda", "terceira"],
+    })
+    profiles = MerchantProfileStore.build(df)
+    assert profiles.get("002")['messages'] == ["primeira", "segunda"]
+    assert profiles.get("002")['city'] == "Santos"
+    assert profiles.get("001")['city'] == ""
+    assert profiles.rows_for(["003", "002", "999"]).tolist() == [3, 0, 2]
+    # Missing description falls back to the id, unknown merchants have no rows
+    assert profiles.name("003") == "003"
+    assert profiles.get("999") is None and "999" not in profiles
+    assert profiles.rows_of("999").tolist() == []
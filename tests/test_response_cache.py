@@ -0,0 +1,110 @@
+import time
+import numpy as np
+import pytest
+
+# This will be handled by conftest.py
+from agents import router_agent
+from agents.response_cache import ResponseCache, response_cache, prompt_version
+from agents.router_agent import RouterAgent
+from agents.moderator_agent import ModeratorAgent
+
+AMBIGUOUS = "Qual foi o último jogo do Palmeiras?"
+
+
+def counting_llm(answer):
+    calls = []
+
+    async def generate(prompt, **options):
+        calls.append(prompt)
+        return answer
+
+    return generate, calls
+
+
+@pytest.mark.asyncio
+async def test_router_answers_repeated_messages_from_cache(monkeypatch):
+    router = RouterAgent()
+    generate, calls = counting_llm("fallback")
+    monkeypatch.setattr(router.llm, "generate", generate)
+    before = response_cache.stats()
+
+    assert await router.classify(AMBIGUOUS) == "fallback"
+    # Case and whitespace differences normalize to the same key
+    assert await router.classify("  qual foi o último   jogo do palmeiras? ") == "fallback"
+    assert len(calls) == 1
+    stats = response_cache.stats()
+    assert stats["hits"] == before["hits"] + 1
+    assert stats["misses"] == before["misses"] + 1
+
+
+@pytest.mark.asyncio
+async def test_prompt_change_invalidates_entries(monkeypatch):
+    router = RouterAgent()
+    generate, calls = counting_llm("fallback")
+    monkeypatch.setattr(router.llm, "generate", generate)
+
+    await router.classify(AMBIGUOUS)
+    monkeypatch.setattr(router_agent, "PROMPT_VERSION", prompt_version(router_agent.SYSTEM_PROMPT + "\nv2"))
+    await router.classify(AMBIGUOUS)
+    assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_cached_moderation_verdict_is_not_shared(monkeypatch):
+    moderator = ModeratorAgent()
+    generate, calls = counting_llm("flag: abuse")
+    monkeypatch.setattr(moderator.llm, "generate", generate)
+
+    first = await moderator.moderate("conteúdo ofensivo e abusivo")
+    first["reason"] = "changed by caller"
+    assert (await moderator.moderate("conteúdo ofensivo e abusivo"))["reason"] == "abuse"
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_errors_are_not_cached():
+    cache = ResponseCache()
+
+    async def broken():
+        raise RuntimeError("llm down")
+
+    async def working():
+        return "service_request"
+
+    with pytest.raises(RuntimeError):
+        await cache.get_or_compute("router", "v1", "m", "msg", broken)
+    assert await cache.get_or_compute("router", "v1", "m", "msg", working) == "service_request"
+
+
+@pytest.mark.asyncio
+async def test_ttl_and_lru_eviction(monkeypatch):
+    cache = ResponseCache(ttl=10, max_entries=2)
+    await cache.set("router", "v1", "m", "a", "x")
+    await cache.set("router", "v1", "m", "b", "y")
+    await cache.get("router", "v1", "m", "a")  # "a" is now the most recently used
+    await cache.set("router", "v1", "m", "c", "z")
+    assert (await cache.get("router", "v1", "m", "b")) == (False, None)
+    assert (await cache.get("router", "v1", "m", "a")) == (True, "x")
+
+    now = time.monotonic()
+    monkeypatch.setattr("agents.response_cache.time.monotonic", lambda: now + 11)
+    assert (await cache.get("router", "v1", "m", "a")) == (False, None)
+
+
+@pytest.mark.asyncio
+async def test_semantic_lookup_reuses_near_duplicates():
+    vectors = {
+        "preciso de um designer": [1.0, 0.0, 0.0],
+        "preciso de um designer gráfico": [0.98, 0.2, 0.0],
+        "vendo bolos caseiros": [0.0, 0.0, 1.0],
+    }
+    cache = ResponseCache(similarity_threshold=0.95, embed=lambda text: np.array(vectors[text]))
+    await cache.set("router", "v1", "m", "preciso de um designer", "service_request", 0.2)
+
+    assert await cache.get("router", "v1", "m", "preciso de um designer gráfico") == (True, "service_request")
+    assert await cache.get("router", "v1", "m", "vendo bolos caseiros") == (False, None)
+    # Other agents and prompt versions never match semantically
+    assert await cache.get("moderator", "v1", "m", "preciso de um designer gráfico") == (False, None)
+    stats = cache.stats()
+    assert stats["semantic_hits"] == 1
+    assert stats["latency_saved_ms"] == 200.0
@@ -0,0 +1,69 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+
+# This will be handled by conftest.py
+from agents.feature_store import MerchantFeatureStore, keyword_tokens, is_request_message
+from agents.scoring import score_rows, top_k_rows
+from benchmarks.stub_ollama import is_marketing_text
+from benchmarks.synthetic import make_merchant_frame
+
+MERCHANT_DATA_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data', 'fake_merchant_dataset.csv'))
+
+QUERIES = [
+    "quero divulgar promoções da minha loja",
+    "Tem alguém que faz doces para festas na zona leste?",
+    "preciso de fornecedores de embalagens na minha região",
+    "procuro parceiros de frete em Campinas",
+    "oi",
+]
+
+
+def reference_top_matches(df, user_id, message):
+    """The row-by-row scoring find_matches used before it was vectorized."""
+    user_city = df[df['merchant_id'] == user_id].iloc[0]['city']
+    is_marketing_related = is_marketing_text(message)
+    matches = []
+    for _, row in df.iterrows():
+        if row['merchant_id'] == user_id:
+            continue
+        merchant_message_lower = str(row['message']).lower()
+        score = 0
+        if is_marketing_related and is_marketing_text(str(row['message'])):
+            score += 10
+        if row['city'] == user_city:
+            score += 3
+        common_words = set(message.lower().split()) & set(merchant_message_lower.split())
+        common_words = {w for w in common_words if len(w) > 3 and w not in ['com', 'para', 'como', 'mais', 'muito']}
+        score += len(common_words) * 2
+        is_request = any(ind in message.lower() for ind in ['preciso', 'busco', 'procurando', 'quero', 'precisamos', 'precisava'])
+        is_offer = any(ind in merchant_message_lower for ind in ['ofereço', 'faço', 'presto', 'vendo', 'trabalho com', 'sou', 'sou de', 'atendo'])
+        if is_request and is_offer:
+            score += 5
+        if score >= 5:
+            matches.append({'merchant_id': row['merchant_id'], 'city': row['city'], 'message': str(row['message']), 'score': score})
+    matches.sort(key=lambda x: (-x['score'], 0 if x['city'] == user_city else 1))
+    return [(m['merchant_id'], m['message'], m['score']) for m in matches[:5]]
+
+
+def vectorized_top_matches(store, df, user_id, message):
+    user_city = df[df['merchant_id'] == user_id].iloc[0]['city']
+    candidates = np.flatnonzero(store.merchant_id != user_id)
+    marketing = None
+    if is_marketing_text(message):
+        marketing = np.array([is_marketing_text(m) for m in store.messages(range(len(store)))]) & (store.merchant_id != user_id)
+    scores, city_match = score_rows(store, user_city, store.query_token_ids(keyword_tokens(message)),
+                                    is_request_message(message), marketing)
+    return [(store.merchant_id[i], store.message(i), scores[i]) for i in top_k_rows(scores, city_match, candidates)]
+
+
+@pytest.mark.parametrize("df", [
+    pd.read_csv(MERCHANT_DATA_PATH, dtype={'merchant_id': str}),
+    make_merchant_frame(1500, seed=7),
+], ids=["dataset", "synthetic"])
+def test_vectorized_scoring_matches_row_loop(df):
+    store = MerchantFeatureStore.build(df)
+    for user_id in df['merchant_id'].unique()[:8]:
+        for message in QUERIES:
+            assert vectorized_top_matches(store, df, user_id, message) == reference_top_matches(df, user_id, message)
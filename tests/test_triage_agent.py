@@ -0,0 +1,107 @@
+import os
+import pytest
+
+# This will be handled by conftest.py
+from agents.triage_agent import TriageAgent, TriageParseError, parse_triage
+from agents.orchestrator import AgentOrchestrator, AgentInput
+from agents.matchmaker_agent import MatchmakerAgent
+from benchmarks.stub_ollama import stub_generate
+
+
+def test_parse_triage_valid_answer():
+    answer = 'Sure: {"route": "social_media_promotion", "moderation": "allow", "reason": ""}'
+    assert parse_triage(answer) == ("social_media_promotion", {"action": "allow"})
+    assert parse_triage('{"route": "moderation", "moderation": "flag", "reason": "Spam"}') == \
+        ("moderation", {"action": "flag", "reason": "spam"})
+    assert parse_triage('{"route": "fallback", "moderation": "warn"}') == \
+        ("fallback", {"action": "warn", "reason": "message too short"})
+    # Braces inside the reason do not cut the object short
+    assert parse_triage('{"route": "moderation", "moderation": "flag", "reason": "links {spam}"} ok') == \
+        ("moderation", {"action": "flag", "reason": "links {spam}"})
+
+
+@pytest.mark.parametrize("answer", [
+    "social_media_promotion",
+    '{"route": "social_media_promotion", "moderation": "allow"',
+    '{"route": "marketing", "moderation": "allow"}',
+    '{"route": "fallback", "moderation": "block"}',
+])
+def test_parse_triage_rejects_malformed_answers(answer):
+    with pytest.raises(TriageParseError):
+        parse_triage(answer)
+
+
+@pytest.mark.asyncio
+async def test_orchestrator_falls_back_to_split_triage(tmp_path, monkeypatch):
+    monkeypatch.setenv("FEATURE_STORE_DIR", str(tmp_path))
+    merchant_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data', 'fake_merchant_dataset.csv'))
+    orchestrator = AgentOrchestrator(merchant_path, triage_mode="combined")
+
+    async def broken_generate(prompt, **options):
+        return "I think this is a fallback message"
+
+    async def classify(message):
+        return "fallback"
+
+    async def moderate(message):
+        return {"action": "allow"}
+
+    monkeypatch.setattr(orchestrator.triage_agent.llm, "generate", broken_generate)
+    monkeypatch.setattr(orchestrator.router, "classify", classify)
+    monkeypatch.setattr(orchestrator.moderator, "moderate", moderate)
+    output = await orchestrator.run(AgentInput(message="Qual foi o último jogo do Palmeiras?", user_id="001"))
+    assert output.agent_workflow[0].classification == "fallback"
+    assert {"TriageAgent", "RouterAgent", "ModeratorAgent"} <= set(output.timings)
+
+
+@pytest.mark.asyncio
+async def test_triage_batch_uses_one_prompt_and_skips_bad_lines(monkeypatch):
+    agent = TriageAgent()
+    prompts = []
+
+    async def generate(prompt, **options):
+        prompts.append(prompt)
+        answer = stub_generate(prompt).splitlines()
+        answer[1] = "2: not json"
+        return "\n".join(answer)
+
+    monkeypatch.setattr(agent.llm, "generate", generate)
+    messages = ["Quero dividir frete para entregas em Campinas", "Tem alguém que faz doces?",
+                "Preciso de ajuda com divulgação no Instagram", "Quero dividir frete para entregas em Campinas"]
+    results = await agent.triage_batch(messages)
+    assert len(prompts) == 1
+    assert set(results) == {messages[0], messages[2]}
+    assert results[messages[0]] == parse_triage(stub_generate(
+        f"\nMessage: {messages[0]}\nTriage:"))
+
+    # Answered messages are cached; only the unparsed one is asked again
+    prompts.clear()
+    assert set(await agent.triage_batch(messages)) == {messages[0], messages[2]}
+    assert len(prompts) == 1 and messages[0] not in prompts[0]
+
+
+@pytest.mark.asyncio
+async def test_run_batch_deduplicates_and_keeps_input_order(tmp_path, llm_calls):
+    merchant_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data', 'fake_merchant_dataset.csv'))
+    matchmaker = MatchmakerAgent(merchant_path, feature_store_dir=str(tmp_path), build_index=False)
+    orchestrator = AgentOrchestrator(merchant_path, matchmaker=matchmaker)
+    inputs = [
+        AgentInput(message="Quero dividir frete para entregas em Campinas", user_id="001"),
+        AgentInput(message="Qual foi o último jogo do Palmeiras?", user_id="002"),
+        AgentInput(message="  quero dividir FRETE para entregas em campinas", user_id="001", feedback="thumbs-up"),
+        AgentInput(message="Quero dividir frete para entregas em Campinas", user_id="003"),
+    ]
+    outputs = await orchestrator.run_batch(inputs)
+    triage_prompts = [p for p in llm_calls if p.rstrip().endswith("Triages:")]
+    assert len(triage_prompts) == 1 and not any(p.rstrip().endswith("Classification:") for p in llm_calls)
+
+    assert [o.feedback for o in outputs] == [None, None, "thumbs-up", None]
+    assert outputs[0].response == outputs[2].response
+    assert "TriageAgent" in outputs[0].timings
+    assert len(orchestrator.feedback_memory) == 1
+
+    # Every item gets what a single run would have answered
+    for item, output in zip(inputs, outputs):
+        single = await orchestrator.run(AgentInput(message=item.message, user_id=item.user_id))
+        assert single.agent_workflow == output.agent_workflow
+        assert single.response == output.response
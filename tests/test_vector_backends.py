@@ -0,0 +1,148 @@
+import pytest
+
+# This will be handled by conftest.py
+from agents import vector_backends
+from agents.vector_backends import FaissIndex, get_embeddings, get_embedding
+from agents.embedding_cache import EmbeddingCache
+from benchmarks.stub_ollama import stub_embedding
+
+
+@pytest.fixture
+def embed_calls(monkeypatch):
+    calls = []
+
+    def fake_embed_batch(texts):
+        calls.append(list(texts))
+        return [stub_embedding(t) for t in texts]
+
+    monkeypatch.setattr(vector_backends.ollama_client, "embed_batch_sync", fake_embed_batch)
+    monkeypatch.setattr(vector_backends.ollama_client, "embed_sync", stub_embedding)
+    monkeypatch.setattr(vector_backends, "EMBEDDING_BATCH_SIZE", 2)
+    monkeypatch.setattr(vector_backends, "embedding_cache", EmbeddingCache(path=None))
+    return calls
+
+
+def test_get_embeddings_batches_unique_texts(embed_calls):
+    texts = ["oi td bom?", "como funciona?", "oi td bom?", "procuro fornecedores"]
+    embs = get_embeddings(texts)
+    assert embs.shape == (4, 384)
+    assert embs.dtype == "float32"
+    assert (embs[0] == embs[2]).all()
+    assert sorted(len(c) for c in embed_calls) == [1, 2]
+
+
+def test_faiss_add_batch_searchable(embed_calls):
+    index = FaissIndex()
+    index.add_batch(["001", "002", "003"], ["procuro fornecedores", "faço posts no instagram", "oi td bom?"])
+    assert index.index.ntotal == 3
+    assert index.search("faço posts no instagram", k=1) == ["002"]
+
+
+def test_embedding_cache_hits_across_calls(embed_calls):
+    get_embeddings(["oi td bom?", "como funciona?"])
+    get_embedding("oi td bom?")
+    get_embeddings(["como funciona?", "procuro fornecedores"])
+    assert [t for c in embed_calls for t in c] == ["oi td bom?", "como funciona?", "procuro fornecedores"]
+    stats = vector_backends.embedding_cache.stats()
+    assert stats["hits"] == 2
+    assert stats["misses"] == 3
+
+
+def test_embedding_cache_persists_to_disk(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite3")
+    EmbeddingCache(path).put_many("all-minilm", {"oi td bom?": [0.5, 0.25]})
+
+    restarted = EmbeddingCache(path)
+    vectors = restarted.get_or_compute("all-minilm", ["oi  td bom?"], lambda texts: pytest.fail("recomputed"))
+    assert vectors.tolist() == [[0.5, 0.25]]
+    assert restarted.stats()["disk_hits"] == 1
+    assert restarted.get_many("other-model", ["oi td bom?"]) == {}
+
+
+@pytest.mark.parametrize("restart", [False, True])
+def test_embedding_cache_returns_every_text_of_a_shared_key(tmp_path, restart):
+    path = str(tmp_path / "embeddings.sqlite3")
+    cache = EmbeddingCache(path)
+    cache.put_many("all-minilm", {"oi td bom?": [0.5, 0.25]})
+    if restart:
+        cache = EmbeddingCache(path)
+    texts = ["oi td bom?", "oi  td bom? ", "como funciona?"]
+    found = cache.get_many("all-minilm", texts)
+    assert {text: vector.tolist() for text, vector in found.items()} == {
+        "oi td bom?": [0.5, 0.25], "oi  td bom? ": [0.5, 0.25]}
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (2, 1)
+
+
+TEXTS = ["procuro fornecedores", "faço posts no instagram", "oi td bom?", "vendo bolos caseiros"]
+
+
+def test_faiss_snapshot_is_memory_mapped_and_copied_on_update(embed_calls, tmp_path):
+    path = str(tmp_path / "index.faiss")
+    index = FaissIndex()
+    index.add_batch(["001", "002", "003", "004"], TEXTS)
+    index.save(path)
+
+    loaded = FaissIndex.load(path)
+    assert loaded.mapped
+    assert loaded.search("faço posts no instagram", k=1) == ["002"]
+    loaded.remove([1])
+    loaded.add("005", "faço posts no instagram", vector_id=7)
+    assert not loaded.mapped
+    assert loaded.search("faço posts no instagram", k=1) == ["005"]
+    assert loaded.next_id == 8
+    # The snapshot on disk is untouched by updates
+    assert FaissIndex.load(path, mmap=False).search("faço posts no instagram", k=1) == ["002"]
+
+
+@pytest.mark.parametrize("index_type", ["ivf", "hnsw"])
+def test_approximate_index_types(embed_calls, index_type):
+    texts = [f"mensagem número {i} sobre produtos" for i in range(300)] + TEXTS
+    index = FaissIndex(index_type=index_type, nlist=8)
+    index.add_batch([str(i) for i in range(len(texts))], texts)
+    index.set_search_params(nprobe=8, ef_search=128)
+    assert index.index.ntotal == len(texts)
+    assert index.search("vendo bolos caseiros", k=1) == ["303"]
+
+    index.remove([303])
+    assert "303" not in index.search("vendo bolos caseiros", k=5)
+    assert len(index.search("vendo bolos caseiros", k=5)) == 5
+
+
+def test_pq_index_too_small_to_train_stays_exact(embed_calls):
+    index = FaissIndex(index_type="pq")
+    index.add_batch(["001", "002", "003", "004"], TEXTS)
+    assert index.index_type == "flat"
+    assert index.search("vendo bolos caseiros", k=1) == ["004"]
+
+
+def test_faiss_search_batch_matches_single_searches(embed_calls):
+    index = FaissIndex()
+    index.add_batch(["001", "002", "003", "004"], TEXTS)
+    embed_calls.clear()
+
+    results = index.search_batch(["vendo bolos caseiros", "procuro fornecedores"], k=3)
+    assert len(embed_calls) == 0  # both queries were already embedded during ingestion
+    assert [[m for m, _ in hits] for hits in results] == [index.search(q, k=3) for q in
+                                                          ["vendo bolos caseiros", "procuro fornecedores"]]
+    assert results[0][0] == ("004", 0.0)
+    assert all(a[1] <= b[1] for hits in results for a, b in zip(hits, hits[1:]))
+    assert index.search_batch([], k=3) == []
+
+
+def test_chromadb_search_batch_returns_distances(embed_calls, tmp_path):
+    from agents.vector_backends import ChromaDBIndex
+    index = ChromaDBIndex(collection_name=f"test-{tmp_path.name}", persist_directory=str(tmp_path))
+    index.add_batch(["001", "002", "003", "004"], TEXTS)
+
+    results = index.search_batch(["vendo bolos caseiros", "faço posts no instagram"], k=2)
+    assert [hits[0][0] for hits in results] == ["004", "002"]
+    assert results[0][0][1] == pytest.approx(0.0, abs=1e-5)
+
+
+def test_backend_without_search_vectors_fails_on_construction():
+    class Incomplete(vector_backends.VectorIndex):
+        def add(self, merchant_id, text):
+            pass
+
+    with pytest.raises(TypeError):
+        Incomplete()